@@ -9,6 +9,8 @@ from qtpy.QtWidgets import QApplication
 from .overlay import DrawingSignals, TransparentDrawingOverlay
 
 from core.logger import get_logger
+from core.metrics import INPUT_EVENTS_DROPPED, INPUT_EVENTS_RECEIVED, get_metrics
+from core.trace import EVENT_INPUT_SAMPLE, EVENT_STROKE_END, EVENT_STROKE_START, trace
 from ui.settings.settings import get_settings
 
 
@@ -39,6 +41,13 @@ class DrawingManager:
         self.last_move_time = 0
         self.move_throttle_ms = 5
 
+        metrics = get_metrics()
+        self._input_received = metrics.counter(INPUT_EVENTS_RECEIVED, "绘制时收到的鼠标移动事件数")
+        self._input_dropped = metrics.counter(INPUT_EVENTS_DROPPED, "绘制时因节流或坐标无效丢弃的鼠标移动事件数")
+
+        self.settings = get_settings()
+        self.settings.subscribe("brush", self._on_brush_settings_changed)
+
         self.logger.info("绘制模块初始化完成")
 
     def start(self):
@@ -49,30 +58,7 @@ class DrawingManager:
 
         self.logger.info("启动绘制功能")
 
-        try:
-            settings = get_settings()
-            if settings:
-                pen_width = settings.get("brush.pen_width")
-                if pen_width:
-                    self.overlay.set_pen_width(pen_width)
-                    self.logger.debug(f"从设置中加载笔尖粗细: {pen_width}")
-
-                pen_color = settings.get("brush.pen_color")
-                if pen_color:
-                    self.overlay.set_pen_color(pen_color)
-                    self.logger.debug(f"从设置中加载笔尖颜色: {pen_color}")
-
-                brush_type = settings.get("brush.brush_type", "pencil")
-                self.overlay.set_brush_type(brush_type)
-                self.logger.debug(f"从设置中加载画笔类型: {brush_type}")
-
-                force_topmost = settings.get("brush.force_topmost", True)
-                self.overlay.set_force_topmost(force_topmost)
-                self.logger.debug(f"从设置中加载强制置顶设置: {force_topmost}")
-            else:
-                self.logger.warning("未能获取设置实例，使用当前默认值")
-        except Exception as e:
-            self.logger.error(f"加载笔尖设置失败: {e}，使用当前设置")
+        self._apply_brush_settings(self.settings.snapshot())
 
         self._init_mouse_hook()
         self.is_active = True
@@ -81,32 +67,38 @@ class DrawingManager:
         return True
 
     def update_settings(self):
-        """更新设置参数"""
+        """按当前设置快照更新全部绘制参数"""
         self.logger.info("更新绘制参数")
+        return self._apply_brush_settings(self.settings.snapshot())
 
-        try:
-            settings = get_settings()
-            if not settings:
-                self.logger.warning("未能获取设置实例，无法更新设置")
-                return False
+    def _on_brush_settings_changed(self, snapshot, changed_keys):
+        """画笔设置变更回调，只应用发生变化的参数"""
+        self._apply_brush_settings(snapshot, changed_keys)
 
-            pen_width = settings.get("brush.pen_width")
-            if pen_width:
-                self.overlay.set_pen_width(pen_width)
-                self.logger.debug(f"已更新笔尖粗细: {pen_width}")
+    def _apply_brush_settings(self, snapshot, keys=None):
+        """将设置快照中的画笔参数应用到覆盖层，keys为None时应用全部参数"""
+        try:
+            if keys is None or "brush.pen_width" in keys:
+                pen_width = snapshot.get("brush.pen_width")
+                if pen_width:
+                    self.overlay.set_pen_width(pen_width)
+                    self.logger.debug("已更新笔尖粗细: %s", pen_width)
 
-            pen_color = settings.get("brush.pen_color")
-            if pen_color:
-                self.overlay.set_pen_color(pen_color)
-                self.logger.debug(f"已更新笔尖颜色: {pen_color}")
+            if keys is None or "brush.pen_color" in keys:
+                pen_color = snapshot.get("brush.pen_color")
+                if pen_color:
+                    self.overlay.set_pen_color(pen_color)
+                    self.logger.debug("已更新笔尖颜色: %s", pen_color)
 
-            brush_type = settings.get("brush.brush_type", "pencil")
-            self.overlay.set_brush_type(brush_type)
-            self.logger.debug(f"已更新画笔类型: {brush_type}")
+            if keys is None or "brush.brush_type" in keys:
+                brush_type = snapshot.get("brush.brush_type", "pencil")
+                self.overlay.set_brush_type(brush_type)
+                self.logger.debug("已更新画笔类型: %s", brush_type)
 
-            force_topmost = settings.get("brush.force_topmost", True)
-            self.overlay.set_force_topmost(force_topmost)
-            self.logger.debug(f"已更新强制置顶设置: {force_topmost}")
+            if keys is None or "brush.force_topmost" in keys:
+                force_topmost = snapshot.get("brush.force_topmost", True)
+                self.overlay.set_force_topmost(force_topmost)
+                self.logger.debug("已更新强制置顶设置: %s", force_topmost)
 
             return True
         except Exception as e:
@@ -146,15 +138,20 @@ class DrawingManager:
 
             def on_move(x, y):
                 if self.right_mouse_down:
+                    self._input_received.inc()
                     if x > 0 and y > 0:
                         current_time = time.time() * 1000
                         if current_time - self.last_move_time < self.move_throttle_ms:
+                            self._input_dropped.inc()
                             return
                         self.last_move_time = current_time
 
                         pressure = self._calculate_simulated_pressure(x, y)
+                        trace(EVENT_INPUT_SAMPLE, x, y)
                         self.signals.continue_drawing_signal.emit(x, y, pressure)
                         self.last_position = (x, y)
+                    else:
+                        self._input_dropped.inc()
 
             def on_click(x, y, button, pressed):
                 if button == mouse.Button.right:
@@ -164,13 +161,15 @@ class DrawingManager:
                             self.last_position = (x, y)
                             self.last_pressure_time = time.time()
                             self.simulated_pressure = 0.5
+                            trace(EVENT_STROKE_START, x, y)
                             self.signals.start_drawing_signal.emit(
                                 x, y, self.simulated_pressure
                             )
-                            self.logger.info(f"开始绘制，坐标: ({x}, {y})")
+                            self.logger.info("开始绘制，坐标: (%s, %s)", x, y)
                     else:
                         self.right_mouse_down = False
                         self.last_position = None
+                        trace(EVENT_STROKE_END, x, y)
                         self.signals.stop_drawing_signal.emit()
                         self.logger.info("停止绘制")
 
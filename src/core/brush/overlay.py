@@ -19,7 +19,9 @@ from qtpy.QtWidgets import QApplication, QWidget
 from .drawing import DrawingModule
 from .fading import FadingModule
 from core.logger import get_logger
+from core.metrics import OVERLAY_FRAME_SECONDS, get_metrics
 from core.path_analyzer import PathAnalyzer
+from core.trace import EVENT_FRAME_PAINTED, trace
 
 
 class DrawingSignals(QObject):
@@ -36,6 +38,7 @@ class TransparentDrawingOverlay(QWidget):
     def __init__(self):
         super().__init__()
         self.logger = get_logger("DrawingOverlay")
+        self._frame_time = get_metrics().histogram(OVERLAY_FRAME_SECONDS, "绘制覆盖层每帧的绘制耗时")
 
         self.drawing = False
         self.last_point = None
@@ -84,7 +87,7 @@ class TransparentDrawingOverlay(QWidget):
 
     def set_brush_type(self, brush_type):
         if self.drawing_module.set_brush_type(brush_type):
-            self.logger.debug(f"画笔类型已设置为: {brush_type}")
+            self.logger.debug("画笔类型已设置为: %s", brush_type)
             return True
         else:
             self.logger.warning(f"无效的画笔类型: {brush_type}")
@@ -98,7 +101,7 @@ class TransparentDrawingOverlay(QWidget):
 
     def set_force_topmost(self, enabled):
         self.force_topmost_enabled = enabled
-        self.logger.debug(f"强制置顶已设置为: {enabled}")
+        self.logger.debug("强制置顶已设置为: %s", enabled)
 
     def _force_window_topmost(self):
         if self.force_topmost_enabled and self.isVisible():
@@ -114,14 +117,14 @@ class TransparentDrawingOverlay(QWidget):
     def set_pen_width(self, width):
         if width > 0:
             self.pen_width = width
-            self.logger.debug(f"笔尖粗细已设置为: {width}")
+            self.logger.debug("笔尖粗细已设置为: %s", width)
 
     def set_pen_color(self, color):
-        if isinstance(color, list) and len(color) >= 3:
+        if isinstance(color, (list, tuple)) and len(color) >= 3:
             r, g, b = color[0], color[1], color[2]
             alpha = 255
             self.pen_color = QColor(r, g, b, alpha)
-            self.logger.debug(f"笔尖颜色已设置为: RGB({r},{g},{b})")
+            self.logger.debug("笔尖颜色已设置为: RGB(%s,%s,%s)", r, g, b)
             return True
         else:
             self.logger.warning(f"无效的颜色值: {color}")
@@ -168,7 +171,7 @@ class TransparentDrawingOverlay(QWidget):
         if x <= 0 or y <= 0:
             return
 
-        self.logger.debug(f"开始绘制，坐标: ({x}, {y}), 压力: {pressure}")
+        self.logger.debug("开始绘制，坐标: (%s, %s), 压力: %s", x, y, pressure)
 
         # 如果正在消失过程中，立即停止消失并清除
         if self.fading:
@@ -367,7 +370,7 @@ class TransparentDrawingOverlay(QWidget):
             try:
                 formatted_path = self.path_analyzer.format_raw_path(self.points)
                 if formatted_path and formatted_path.get('points'):
-                    self.logger.info(f"绘制完成，路径包含 {len(formatted_path.get('points', []))} 个关键点")
+                    self.logger.info("绘制完成，路径包含 %s 个关键点", len(formatted_path.get('points', [])))
                     try:
                         from core.gesture_executor import get_gesture_executor
                         executor = get_gesture_executor()
@@ -417,6 +420,12 @@ class TransparentDrawingOverlay(QWidget):
         if not self.image:
             return
 
+        with self._frame_time.time():
+            self._paint(event)
+
+    def _paint(self, event):
+
+        trace(EVENT_FRAME_PAINTED, event.rect().width(), event.rect().height())
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
 
@@ -0,0 +1,320 @@
+"""
+手势阈值校准模块
+
+离线为每个触发路径估计单独的识别阈值。全局阈值对所有路径相同：简单的路径（如直线）
+容易被随手的笔画误识别，复杂的路径又容易因为绘制得不够准确而被拒绝。
+
+校准时对每个路径的描述子施加随机的旋转、缩放、弹性形变、抖动和起止截断，再按识别时
+相同的方式归一化和重采样，生成模拟用户绘制的样本：
+- 真实样本：路径自身的样本与该路径的相似度，取低分位数作为应当接受的下限
+- 冒名样本：其他路径的样本和随机笔画中最匹配该路径的那些，取高分位数作为应当拒绝的上限
+阈值取两者的中点，margin 是阈值到两侧的距离，为负表示两者重叠、无法完全区分。
+
+结果写入触发路径条目的 calibration 字段，识别时直接读取，不增加识别开销。手势库变化后
+（尤其是添加了相似的路径）需要重新校准。
+
+命令行用法：python -m core.gesture_calibration [gestures.json | gestures.gkpack]
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from core.gesture_conflicts import similarity_scores
+from core.path_analyzer import DESCRIPTOR_POINTS, PathAnalyzer
+
+CALIBRATION_KEY = "calibration"
+
+# 每个路径生成的样本数和随机笔画数
+DEFAULT_SAMPLES = 32
+DEFAULT_BACKGROUND = 256
+
+# 样本的扰动幅度，坐标单位为描述子的归一化尺寸（最长边200）
+ROTATION_SIGMA = math.radians(8)
+SCALE_SIGMA = 0.12
+ELASTIC_SIGMA = 10.0
+ELASTIC_CONTROL_POINTS = 4
+JITTER_SIGMA = 1.5
+TRIM_FRACTION = 0.06
+
+# 真实样本取该分位数作为接受下限（约95%的真实样本被接受），冒名样本取该分位数作为拒绝上限
+GENUINE_QUANTILE = 0.05
+IMPOSTOR_QUANTILE = 0.95
+# 校准阈值的范围
+MIN_THRESHOLD = 0.50
+MAX_THRESHOLD = 0.95
+
+
+def calibrated_threshold(entry, default):
+    """触发路径的识别阈值：有校准结果时使用校准的阈值，否则使用 default"""
+    calibration = entry.get(CALIBRATION_KEY) if isinstance(entry, dict) else None
+    if isinstance(calibration, dict):
+        threshold = calibration.get("threshold")
+        if isinstance(threshold, (int, float)) and 0.0 < threshold <= 1.0:
+            return float(threshold)
+    return default
+
+
+def generate_samples(descriptor, count, rng, analyzer=None):
+    """对一个描述子施加随机扰动，返回 count 个模拟绘制的描述子（count × 点数 × 2）"""
+    analyzer = analyzer or PathAnalyzer()
+    descriptor = np.asarray(descriptor, dtype=float)
+    points = descriptor.shape[0]
+    center = descriptor.mean(axis=0)
+    positions = np.linspace(0.0, 1.0, points)
+    controls = np.linspace(0.0, 1.0, ELASTIC_CONTROL_POINTS)
+
+    samples = []
+    while len(samples) < count:
+        angle = rng.normal(0.0, ROTATION_SIGMA)
+        cos, sin = math.cos(angle), math.sin(angle)
+        scale = np.exp(rng.normal(0.0, SCALE_SIGMA, 2))
+        centered = (descriptor - center) * scale
+        pts = np.column_stack((centered[:, 0] * cos - centered[:, 1] * sin,
+                               centered[:, 0] * sin + centered[:, 1] * cos))
+
+        # 弹性形变：沿路径插值的平滑偏移，加上逐点的小幅抖动
+        offsets = rng.normal(0.0, ELASTIC_SIGMA, (ELASTIC_CONTROL_POINTS, 2))
+        pts[:, 0] += np.interp(positions, controls, offsets[:, 0])
+        pts[:, 1] += np.interp(positions, controls, offsets[:, 1])
+        pts += rng.normal(0.0, JITTER_SIGMA, pts.shape)
+
+        # 起止截断：沿路径重采样后去掉两端的一小段
+        dense = analyzer._resample_points(pts, points * 2)
+        head, tail = (rng.uniform(0.0, TRIM_FRACTION, 2) * len(dense)).astype(int)
+        trimmed = dense[head:len(dense) - tail]
+        if len(trimmed) < 2:
+            trimmed = dense
+
+        sample = analyzer.compute_descriptor({"points": trimmed.tolist()})
+        if sample is not None:
+            samples.append(sample)
+    return np.stack(samples) if samples else np.empty((0, points, 2))
+
+
+def generate_background(count, rng, analyzer=None):
+    """生成 count 个随机笔画（2到5段的折线）的描述子，模拟不想触发手势的随手笔画"""
+    analyzer = analyzer or PathAnalyzer()
+    samples = []
+    while len(samples) < count:
+        vertices = rng.uniform(0.0, 200.0, (rng.integers(3, 7), 2))
+        if np.linalg.norm(np.diff(vertices, axis=0), axis=1).sum() < 50.0:
+            continue
+        dense = analyzer._resample_points(vertices, DESCRIPTOR_POINTS)
+        sample = analyzer.compute_descriptor({"points": dense.tolist()})
+        if sample is not None:
+            samples.append(sample)
+    return np.stack(samples) if samples else np.empty((0, DESCRIPTOR_POINTS, 2))
+
+
+def choose_threshold(genuine, impostor):
+    """根据真实样本和冒名样本的得分选择阈值，返回校准结果字典"""
+    genuine = np.asarray(genuine, dtype=float)
+    impostor = np.asarray(impostor, dtype=float)
+    accept = float(np.quantile(genuine, GENUINE_QUANTILE)) if genuine.size else 1.0
+    reject = float(np.quantile(impostor, IMPOSTOR_QUANTILE)) if impostor.size else 0.0
+
+    if accept > reject or not impostor.size:
+        threshold = (accept + reject) / 2
+    else:
+        # 两者重叠时取使拒识率和误识率之和最小的得分
+        candidates = np.unique(np.concatenate((genuine, impostor)))
+        errors = [np.mean(genuine < t) + np.mean(impostor >= t) for t in candidates]
+        best = np.flatnonzero(np.isclose(errors, min(errors)))
+        threshold = float(candidates[best[len(best) // 2]])
+
+    threshold = min(max(threshold, MIN_THRESHOLD), MAX_THRESHOLD)
+    return {
+        "threshold": round(threshold, 3),
+        "margin": round(min(accept - threshold, threshold - reject), 3),
+        "genuine": round(accept, 3),
+        "impostor": round(reject, 3) if impostor.size else None,
+    }
+
+
+def calibrate(keys, descriptors, samples=DEFAULT_SAMPLES, background=DEFAULT_BACKGROUND, seed=0,
+              workers=None, progress=None, cancel=None):
+    """为每个描述子估计识别阈值
+
+    Args:
+        keys: 路径键列表，与 descriptors 一一对应
+        descriptors: N × 点数 × 2 的描述子数组
+        samples: 每个路径生成的样本数
+        background: 随机笔画数
+        seed: 随机数种子，相同的输入和种子得到相同的结果
+        workers / progress / cancel: 见 core.gesture_conflicts.similarity_scores
+
+    Returns:
+        {路径键: {"threshold", "margin", "genuine", "impostor", "confusion", "samples"}}，
+        confusion 是路径自身的样本被其他路径最佳匹配的比例，提高阈值无法改善
+    """
+    count = len(keys)
+    if count == 0:
+        return {}
+    analyzer = PathAnalyzer()
+    rng = np.random.default_rng(seed)
+    descriptors = np.asarray(descriptors, dtype=float)
+
+    sample_sets = [generate_samples(descriptor, samples, rng, analyzer) for descriptor in descriptors]
+    owners = np.concatenate([np.full(len(s), i) for i, s in enumerate(sample_sets)])
+    stacked = np.concatenate(sample_sets + [generate_background(background, rng, analyzer)])
+    owners = np.concatenate((owners, np.full(len(stacked) - len(owners), -1)))
+
+    scores = similarity_scores(stacked, descriptors, workers=workers, progress=progress, cancel=cancel)
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(scores)), best]
+
+    results = {}
+    for index, key in enumerate(keys):
+        own = owners == index
+        genuine = scores[own, index]
+        impostor = best_scores[(best == index) & ~own]
+        result = choose_threshold(genuine, impostor)
+        result["confusion"] = round(float(np.mean(best[own] != index)), 3) if own.any() else 0.0
+        result["samples"] = int(own.sum())
+        results[key] = result
+    return results
+
+
+def apply_calibration(trigger_paths, results):
+    """把校准结果写入触发路径条目，条目被替换而不是原地修改，返回变化的路径键"""
+    changed = []
+    for key, result in results.items():
+        entry = trigger_paths.get(key)
+        if entry is None or entry.get(CALIBRATION_KEY) == result:
+            continue
+        entry = dict(entry)
+        entry[CALIBRATION_KEY] = result
+        trigger_paths[key] = entry
+        changed.append(key)
+    return changed
+
+
+def clear_calibration(trigger_paths):
+    """删除全部触发路径的校准结果，返回变化的路径键"""
+    changed = []
+    for key, entry in list(trigger_paths.items()):
+        if CALIBRATION_KEY in entry:
+            entry = dict(entry)
+            del entry[CALIBRATION_KEY]
+            trigger_paths[key] = entry
+            changed.append(key)
+    return changed
+
+
+def calibrate_library(library=None, **kwargs):
+    """校准手势库中的全部触发路径（包含未保存的修改），结果写入条目，返回校准结果
+
+    只修改内存中的手势库并标记变更，由调用者决定是否保存。
+    """
+    if library is None:
+        from ui.gestures.gestures import get_gesture_library
+        library = get_gesture_library()
+    keys, descriptors = library.get_trigger_templates(use_saved=False)
+    results = calibrate(keys, descriptors, **kwargs)
+    changed = apply_calibration(library.trigger_paths, results)
+    if changed:
+        library.mark_data_changed("trigger_paths", *changed)
+    return results
+
+
+def format_results(results, names=None, limit=None):
+    """把校准结果格式化为文本，按阈值从高到低排列"""
+    names = names or {}
+    lines = []
+    ordered = sorted(results.items(), key=lambda item: -item[1]["threshold"])
+    for key, result in ordered[:limit]:
+        impostor = f"{result['impostor']:.1%}" if result["impostor"] is not None else "-"
+        line = (
+            f"  {names.get(key, key)}（{key}）: 阈值 {result['threshold']:.2f}，余量 {result['margin']:+.3f}，"
+            f"真实样本下限 {result['genuine']:.1%}，冒名样本上限 {impostor}"
+        )
+        if result["confusion"]:
+            line += f"，{result['confusion']:.0%} 的样本被识别为其他路径"
+        lines.append(line)
+    if limit is not None and len(ordered) > limit:
+        lines.append(f"  ……另有 {len(ordered) - limit} 个路径")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="为GestroKey手势库的每个触发路径估计识别阈值")
+    parser.add_argument("source", nargs="?", help="gestures.json 或 *.gkpack 文件，默认校准当前用户的手势库")
+    parser.add_argument("--output", help="写入另一个文件而不是覆盖 source（格式由扩展名决定）")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="每个路径生成的样本数")
+    parser.add_argument("--background", type=int, default=DEFAULT_BACKGROUND, help="随机笔画数")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--workers", type=int, default=None, help="并行线程数")
+    parser.add_argument("--top", type=int, default=None, help="最多显示的路径数量")
+    parser.add_argument("--dry-run", action="store_true", help="只显示结果，不写入")
+    parser.add_argument("--clear", action="store_true", help="删除全部校准结果，恢复使用全局阈值")
+    args = parser.parse_args(argv)
+
+    options = dict(samples=args.samples, background=args.background, seed=args.seed, workers=args.workers)
+    start_time = time.perf_counter()
+
+    if args.source:
+        from core.gesture_conflicts import collect_templates, read_library_file
+        from core.gesture_pack import PACK_SUFFIX, encode_pack
+        from core.persistence import atomic_write_bytes, atomic_write_json
+
+        data, descriptors = read_library_file(args.source)
+        trigger_paths = data.setdefault("trigger_paths", {})
+        names = {key: entry.get("name", key) for key, entry in trigger_paths.items()}
+
+        if args.clear:
+            results = {}
+            changed = clear_calibration(trigger_paths)
+        else:
+            keys, stacked = collect_templates(trigger_paths, descriptors)
+            results = calibrate(keys, stacked, **options)
+            changed = apply_calibration(trigger_paths, results)
+
+        target = args.output or args.source
+        if not args.dry_run and (changed or target != args.source):
+            if target.endswith(PACK_SUFFIX):
+                analyzer = PathAnalyzer()
+                atomic_write_bytes(target, encode_pack(data, analyzer.compute_descriptor, descriptors,
+                                                       DESCRIPTOR_POINTS))
+            else:
+                atomic_write_json(target, data)
+    else:
+        from ui.gestures.gestures import get_gesture_library
+
+        library = get_gesture_library()
+        names = {key: entry.get("name", key) for key, entry in library.trigger_paths.items()}
+        target = library._current_file()
+        if args.clear:
+            results = {}
+            changed = clear_calibration(library.trigger_paths)
+            if changed:
+                library.mark_data_changed("trigger_paths", *changed)
+        else:
+            keys, stacked = library.get_trigger_templates(use_saved=False)
+            results = calibrate(keys, stacked, **options)
+            changed = apply_calibration(library.trigger_paths, results)
+            if changed:
+                library.mark_data_changed("trigger_paths", *changed)
+        if not args.dry_run and changed and not library.save(wait=True):
+            print(f"写入 {target} 失败，详见日志", file=sys.stderr)
+            return 1
+
+    elapsed = time.perf_counter() - start_time
+    if args.clear:
+        print(f"已删除 {len(changed)} 个触发路径的校准结果")
+    else:
+        print(f"已校准 {len(results)} 个触发路径，耗时: {elapsed:.2f}s")
+        if results:
+            print(format_results(results, names, args.top))
+    if args.dry_run:
+        print("未写入（--dry-run）")
+    elif changed:
+        print(f"已写入 {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,493 @@
+"""
+手势冲突分析模块
+
+计算手势库中全部触发路径两两之间的相似度矩阵（与识别时的评分相同，包含正向和
+带惩罚的反向匹配），找出在识别阈值下会被互相识别的路径对，以及能把全部路径区分
+开的最低识别阈值。
+
+启用校准阈值（gesture.calibrated_thresholds）时，与识别一致，已校准的路径使用各自
+的校准阈值：一对路径中任一路径的阈值不高于两者的相似度，就可能被误识别为该路径，
+所以每对路径按两者中较低的阈值判断。
+
+计算方式：
+- 二维Procrustes旋转角可以由两条路径的2×2协方差矩阵直接得到（闭式解）。协方差和
+  方向得分都是逐点乘积之和，对一批路径用矩阵乘法一次算出
+- 形状得分需要逐点距离，按行分块计算，每块的元素数不超过 CHUNK_ELEMENTS
+- 相似度矩阵是对称的，只计算上三角；各块在线程池中并行计算，numpy 在计算时释放GIL
+
+命令行用法：python -m core.gesture_conflicts [gestures.json | gestures.gkpack]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+# 评分参数只在 core.path_analyzer 中定义，保证冲突分析与识别的评分一致
+from core.path_analyzer import DIRECTION_WEIGHT, REVERSE_PENALTY, SHAPE_SCALE, SHAPE_WEIGHT
+
+# 每块逐点计算的元素数上限（行数 × 列数 × 点数），float32下约16MB
+CHUNK_ELEMENTS = 1 << 22
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+# 最低安全阈值的精度，与设置中识别阈值的步长一致
+THRESHOLD_STEP = 0.01
+
+
+class AnalysisCancelled(Exception):
+    """分析被取消"""
+
+
+class _Templates:
+    """预处理后的模板：中心化的坐标和单位方向向量，正向和反向各一份"""
+
+    def __init__(self, descriptors):
+        points = np.asarray(descriptors, dtype=np.float64)
+        centered = points - points.mean(axis=1, keepdims=True)
+        diffs = np.diff(points, axis=1)
+        units = diffs / (np.linalg.norm(diffs, axis=2, keepdims=True) + 1e-9)
+
+        def split(array):
+            return (np.ascontiguousarray(array[..., 0], dtype=np.float32),
+                    np.ascontiguousarray(array[..., 1], dtype=np.float32))
+
+        self.count = points.shape[0]
+        self.points = points.shape[1]
+        self.forward = split(centered) + split(units)
+        # 反向路径的方向向量是原方向向量倒序取反
+        self.reverse = split(centered[:, ::-1]) + split(-units[:, ::-1])
+
+    def rows(self, start, stop):
+        return tuple(array[start:stop] for array in self.forward)
+
+    def columns(self, start, reverse=False):
+        return tuple(array[start:] for array in (self.reverse if reverse else self.forward))
+
+
+def _pair_scores(rows, columns):
+    """把每个行模板对齐到每个列模板后的得分（行数 × 列数），与 _compute_scores 相同"""
+    ax, ay, aux, auy = rows
+    bx, by, bux, buy = columns
+
+    c00 = ax @ bx.T
+    c01 = ax @ by.T
+    c10 = ay @ bx.T
+    c11 = ay @ by.T
+    theta = -np.arctan2(c01 - c10, c00 + c11)
+    cos = np.cos(theta)
+    sin = np.sin(theta)
+
+    # 旋转不改变长度，对齐后的单位方向向量与模板方向向量的点积之和可以先求和再旋转
+    dot = aux @ bux.T + auy @ buy.T
+    cross = aux @ buy.T - auy @ bux.T
+    direction = ((cos * dot + sin * cross) / aux.shape[1] + 1.0) / 2.0
+
+    cos = cos[:, :, None]
+    sin = sin[:, :, None]
+    dx = ax[:, None, :] * cos
+    dx -= ay[:, None, :] * sin
+    dx -= bx[None]
+    dy = ax[:, None, :] * sin
+    dy += ay[:, None, :] * cos
+    dy -= by[None]
+    dx *= dx
+    dy *= dy
+    dx += dy
+    np.sqrt(dx, out=dx)
+    shape = np.maximum(0.0, 1.0 - dx.mean(axis=2) / SHAPE_SCALE)
+
+    return SHAPE_WEIGHT * shape + DIRECTION_WEIGHT * direction
+
+
+def _score_block(rows, columns, start, stop, column_start=0):
+    selected = rows.rows(start, stop)
+    forward = _pair_scores(selected, columns.columns(column_start))
+    reverse = _pair_scores(selected, columns.columns(column_start, reverse=True))
+    return np.clip(np.maximum(forward, reverse * REVERSE_PENALTY), 0.0, 1.0)
+
+
+def _run_blocks(blocks, run, total, workers, progress, cancel):
+    """在线程池中执行各块，run(start, stop) 返回完成的行数"""
+    def run_block(block):
+        if cancel is not None and cancel.is_set():
+            raise AnalysisCancelled()
+        return run(*block)
+
+    done = 0
+    workers = max(1, workers or DEFAULT_WORKERS)
+    if workers == 1:
+        for block in blocks:
+            done += run_block(block)
+            if progress:
+                progress(done, total)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="GestureConflicts") as executor:
+        futures = [executor.submit(run_block, block) for block in blocks]
+        try:
+            for future in as_completed(futures):
+                done += future.result()
+                if progress:
+                    progress(done, total)
+        except AnalysisCancelled:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def similarity_matrix(descriptors, workers=None, progress=None, cancel=None):
+    """计算描述子两两之间的相似度矩阵（N × N，float32）
+
+    Args:
+        descriptors: N × 点数 × 2 的描述子数组
+        workers: 并行线程数，默认 DEFAULT_WORKERS
+        progress: 可选的回调 progress(已完成行数, 总行数)，在工作线程中调用
+        cancel: 可选的 threading.Event，被设置后抛出 AnalysisCancelled
+    """
+    templates = _Templates(descriptors)
+    count = templates.count
+    matrix = np.empty((count, count), dtype=np.float32)
+
+    # 上三角每行的列数递减，按元素数切分使各块的工作量接近
+    blocks = []
+    start = 0
+    while start < count:
+        rows = max(1, CHUNK_ELEMENTS // ((count - start) * templates.points))
+        blocks.append((start, min(count, start + rows)))
+        start += rows
+
+    def run(start, stop):
+        scores = _score_block(templates, templates, start, stop, start)
+        matrix[start:stop, start:] = scores
+        matrix[start:, start:stop] = scores.T
+        return stop - start
+
+    _run_blocks(blocks, run, count, workers, progress, cancel)
+    return matrix
+
+
+def similarity_scores(descriptors, templates, workers=None, progress=None, cancel=None):
+    """计算每个描述子与每个模板的相似度（M × N，float32），参数与 similarity_matrix 相同
+
+    与逐个调用 PathAnalyzer.calculate_descriptor_similarities 的结果相同，用于一次评分大量路径。
+    """
+    rows = _Templates(descriptors)
+    columns = _Templates(templates)
+    scores = np.empty((rows.count, columns.count), dtype=np.float32)
+    if columns.count == 0:
+        return scores
+
+    step = max(1, CHUNK_ELEMENTS // (columns.count * columns.points))
+    blocks = [(start, min(rows.count, start + step)) for start in range(0, rows.count, step)]
+
+    def run(start, stop):
+        scores[start:stop] = _score_block(rows, columns, start, stop)
+        return stop - start
+
+    _run_blocks(blocks, run, rows.count, workers, progress, cancel)
+    return scores
+
+
+def min_safe_threshold(max_similarity, step=THRESHOLD_STEP):
+    """能区分全部路径的最低识别阈值：比最高的路径间相似度大的最小步长倍数
+
+    识别要求相似度不低于阈值，所以阈值必须严格大于路径间相似度；结果达到1时返回None，
+    表示存在无法区分的路径（如完全相同的路径），阈值为1时几乎无法识别任何手势。
+    """
+    if max_similarity is None:
+        return 0.0
+    threshold = (math.floor(max_similarity / step + 1e-9) + 1) * step
+    threshold = round(threshold, 6)
+    return threshold if threshold < 1.0 else None
+
+
+class ConflictPair:
+    """一对相似的触发路径"""
+
+    __slots__ = ("key_a", "key_b", "name_a", "name_b", "similarity", "threshold")
+
+    def __init__(self, key_a, key_b, name_a, name_b, similarity, threshold):
+        self.key_a = key_a
+        self.key_b = key_b
+        self.name_a = name_a
+        self.name_b = name_b
+        self.similarity = similarity
+        # 判断这对路径是否冲突的阈值：两个路径识别阈值中较低的一个
+        self.threshold = threshold
+
+    @property
+    def is_conflict(self):
+        return self.similarity >= self.threshold
+
+    def to_dict(self):
+        return {
+            "path_a": {"key": self.key_a, "name": self.name_a},
+            "path_b": {"key": self.key_b, "name": self.name_b},
+            "similarity": round(self.similarity, 4),
+            "threshold": round(self.threshold, 4),
+        }
+
+
+class ConflictReport:
+    """冲突分析结果
+
+    pairs 是相似度不低于该对路径阈值 - margin 的路径对，按相似度从高到低排列；closest 是
+    相似度最高的一对（路径少于两个时为None）。thresholds 是已校准路径的 {路径键: 阈值}，
+    其余路径使用全局阈值 threshold；safe_closest 是至少包含一个未校准路径的最相似的一对，
+    只有这些路径对受全局阈值影响（全部路径都已校准时为None）。
+    """
+
+    def __init__(self, keys, names, matrix, threshold, margin, pairs, closest, elapsed,
+                 thresholds=None, safe_closest=None):
+        self.keys = keys
+        self.names = names
+        self.matrix = matrix
+        self.threshold = threshold
+        self.margin = margin
+        self.pairs = pairs
+        self.closest = closest
+        self.elapsed = elapsed
+        self.thresholds = thresholds or {}
+        self.safe_closest = safe_closest
+
+    @property
+    def calibrated(self):
+        """使用校准阈值的路径数"""
+        return len(self.thresholds)
+
+    @property
+    def all_calibrated(self):
+        return bool(self.keys) and self.calibrated >= len(self.keys)
+
+    @property
+    def max_similarity(self):
+        return self.closest.similarity if self.closest else None
+
+    @property
+    def min_safe_threshold(self):
+        """能区分未校准路径的最低全局阈值，全部路径都已校准时为0（全局阈值不影响识别）"""
+        return min_safe_threshold(self.safe_closest.similarity if self.safe_closest else None)
+
+    @property
+    def conflicts(self):
+        """在当前阈值（已校准的路径使用各自的阈值）下会被互相识别的路径对"""
+        return [pair for pair in self.pairs if pair.is_conflict]
+
+    def to_dict(self):
+        return {
+            "paths": len(self.keys),
+            "threshold": self.threshold,
+            "calibrated": self.calibrated,
+            "margin": self.margin,
+            "conflicts": len(self.conflicts),
+            "max_similarity": round(self.max_similarity, 4) if self.closest else None,
+            "min_safe_threshold": self.min_safe_threshold,
+            "closest": self.closest.to_dict() if self.closest else None,
+            "safe_closest": self.safe_closest.to_dict() if self.safe_closest else None,
+            "pairs": [pair.to_dict() for pair in self.pairs],
+            "elapsed_seconds": round(self.elapsed, 3),
+        }
+
+
+def analyze(keys, descriptors, threshold, names=None, margin=0.0, workers=None, progress=None, cancel=None,
+            thresholds=None):
+    """分析一组描述子之间的冲突
+
+    Args:
+        keys: 路径键列表，与 descriptors 一一对应
+        descriptors: N × 点数 × 2 的描述子数组
+        threshold: 识别阈值
+        names: 可选的 {路径键: 名称}
+        margin: 同时列出相似度低于阈值但相差不超过 margin 的路径对
+        thresholds: 可选的 {路径键: 校准阈值}，这些路径使用各自的阈值代替 threshold
+    """
+    start_time = time.perf_counter()
+    names = names or {}
+    thresholds = {key: thresholds[key] for key in keys if key in thresholds} if thresholds else {}
+    matrix = similarity_matrix(descriptors, workers=workers, progress=progress, cancel=cancel)
+    path_thresholds = np.array([thresholds.get(key, threshold) for key in keys], dtype=np.float64)
+
+    def make_pair(i, j):
+        return ConflictPair(keys[i], keys[j], names.get(keys[i], keys[i]), names.get(keys[j], keys[j]),
+                            float(matrix[i, j]), float(min(path_thresholds[i], path_thresholds[j])))
+
+    pairs = []
+    closest = None
+    safe_closest = None
+    if len(keys) >= 2:
+        upper = np.triu(matrix, 1)
+        # 先按最低的阈值筛选候选，再按每对路径的阈值过滤，避免构造 N × N 的阈值矩阵
+        rows, columns = np.nonzero(upper >= path_thresholds.min() - margin)
+        similarities = upper[rows, columns]
+        keep = (columns > rows) & (
+            similarities >= np.minimum(path_thresholds[rows], path_thresholds[columns]) - margin
+        )
+        rows, columns, similarities = rows[keep], columns[keep], similarities[keep]
+        order = np.argsort(-similarities, kind="stable")
+        pairs = [make_pair(rows[k], columns[k]) for k in order]
+        closest = make_pair(*np.unravel_index(np.argmax(upper), upper.shape))
+
+        if not thresholds:
+            safe_closest = closest
+        elif len(thresholds) < len(keys):
+            # 两个路径都已校准的路径对不受全局阈值影响
+            calibrated = np.array([key in thresholds for key in keys])
+            upper[np.ix_(calibrated, calibrated)] = -1.0
+            upper[np.tril_indices(len(keys))] = -1.0
+            safe_closest = make_pair(*np.unravel_index(np.argmax(upper), upper.shape))
+
+    return ConflictReport(list(keys), names, matrix, threshold, margin, pairs, closest,
+                          time.perf_counter() - start_time, thresholds, safe_closest)
+
+
+def calibrated_thresholds(trigger_paths):
+    """触发路径中已校准路径的 {路径键: 校准阈值}"""
+    from core.gesture_calibration import calibrated_threshold
+
+    thresholds = {}
+    for key, entry in list(trigger_paths.items()):
+        value = calibrated_threshold(entry, None)
+        if value is not None:
+            thresholds[key] = value
+    return thresholds
+
+
+def _use_calibration(use_calibration):
+    if use_calibration is None:
+        from ui.settings.settings import get_settings
+        use_calibration = get_settings().get("gesture.calibrated_thresholds", True)
+    return use_calibration
+
+
+def analyze_library(library=None, threshold=None, use_saved=True, use_calibration=None, **kwargs):
+    """分析手势库的冲突，threshold 默认使用设置中的识别阈值
+
+    use_saved=False 时分析包含未保存修改的触发路径（手势页面中正在编辑的内容）。
+    use_calibration 默认使用设置 gesture.calibrated_thresholds，启用时已校准的路径与识别
+    时一样使用各自的校准阈值。
+    """
+    if library is None:
+        from ui.gestures.gestures import get_gesture_library
+        library = get_gesture_library()
+    if threshold is None:
+        from ui.settings.settings import get_settings
+        threshold = get_settings().get("gesture.similarity_threshold", 0.70)
+    keys, descriptors = library.get_trigger_templates(use_saved)
+    paths = library.saved_trigger_paths if use_saved else library.trigger_paths
+    names = {key: entry.get("name", key) for key, entry in list(paths.items())}
+    thresholds = calibrated_thresholds(paths) if _use_calibration(use_calibration) else None
+    return analyze(keys, descriptors, threshold, names=names, thresholds=thresholds, **kwargs)
+
+
+def read_library_file(path):
+    """读取 gestures.json 或 *.gkpack 文件，返回 (数据字典, {路径键: 描述子})
+
+    JSON文件没有预先计算的描述子，返回空字典。
+    """
+    from core.gesture_pack import PACK_SUFFIX, read_pack
+
+    if path.endswith(PACK_SUFFIX):
+        return read_pack(path)
+    import json
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f), {}
+
+
+def collect_templates(trigger_paths, descriptors=None):
+    """取得触发路径的描述子，返回 (路径键列表, N×点数×2 数组)，缺少的描述子现场计算"""
+    from core.path_analyzer import DESCRIPTOR_POINTS, PathAnalyzer
+
+    descriptors = descriptors or {}
+    analyzer = PathAnalyzer()
+    keys = []
+    stacked = []
+    for key, entry in trigger_paths.items():
+        descriptor = descriptors.get(key)
+        if descriptor is None:
+            descriptor = analyzer.compute_descriptor(entry.get("path"))
+        if descriptor is not None:
+            keys.append(key)
+            stacked.append(descriptor)
+    array = np.stack(stacked) if stacked else np.empty((0, DESCRIPTOR_POINTS, 2))
+    return keys, array
+
+
+def format_report(report, limit=20):
+    """把分析结果格式化为文本"""
+    lines = [
+        f"触发路径: {len(report.keys)}，识别阈值: {report.threshold:.2f}，耗时: {report.elapsed:.2f}s",
+    ]
+    if report.closest is None:
+        lines.append("路径少于两个，无需分析")
+        return "\n".join(lines)
+
+    safe = report.min_safe_threshold
+    if report.calibrated:
+        lines.append(f"已校准的路径使用各自的阈值: {report.calibrated} 个")
+    lines.append(
+        f"最相似的路径: {report.closest.name_a} ↔ {report.closest.name_b}（{report.closest.similarity:.1%}）"
+    )
+    if report.all_calibrated:
+        lines.append("最低安全阈值: 不适用（全部路径都已校准）")
+    elif safe is None:
+        lines.append("最低安全阈值: 无（存在无法区分的路径）")
+    else:
+        lines.append(f"最低安全阈值{'（未校准的路径）' if report.calibrated else ''}: {safe:.2f}")
+    lines.append(f"冲突路径对: {len(report.conflicts)}")
+    for index, pair in enumerate(report.pairs[:limit], 1):
+        mark = "冲突" if pair.is_conflict else "接近"
+        lines.append(
+            f"  {index:>3}. [{mark}] {pair.name_a}（{pair.key_a}） ↔ {pair.name_b}（{pair.key_b}）"
+            f"  {pair.similarity:.1%}（阈值 {pair.threshold:.2f}）"
+        )
+    if len(report.pairs) > limit:
+        lines.append(f"  ……另有 {len(report.pairs) - limit} 对")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分析GestroKey手势库中容易混淆的触发路径")
+    parser.add_argument("source", nargs="?", help="gestures.json 或 *.gkpack 文件，默认分析当前用户的手势库")
+    parser.add_argument("--threshold", type=float, default=None, help="识别阈值，默认使用设置中的值")
+    parser.add_argument("--no-calibration", dest="calibration", action="store_false", default=None,
+                        help="忽略校准阈值，全部路径使用同一识别阈值")
+    parser.add_argument("--margin", type=float, default=0.0, help="同时列出低于阈值但相差不超过该值的路径对")
+    parser.add_argument("--top", type=int, default=20, help="最多显示的路径对数量")
+    parser.add_argument("--workers", type=int, default=None, help=f"并行线程数，默认 {DEFAULT_WORKERS}")
+    parser.add_argument("--json", dest="json_path", help="把结果写入JSON文件")
+    parser.add_argument("--matrix", help="把相似度矩阵写入 .npy 文件")
+    args = parser.parse_args(argv)
+
+    if args.source:
+        data, descriptors = read_library_file(args.source)
+        trigger_paths = data.get("trigger_paths") or {}
+        keys, descriptors = collect_templates(trigger_paths, descriptors)
+        names = {key: entry.get("name", key) for key, entry in trigger_paths.items()}
+        threshold = args.threshold
+        if threshold is None:
+            from ui.settings.settings import get_settings
+            threshold = get_settings().get("gesture.similarity_threshold", 0.70)
+        thresholds = calibrated_thresholds(trigger_paths) if _use_calibration(args.calibration) else None
+        report = analyze(keys, descriptors, threshold, names=names, margin=args.margin, workers=args.workers,
+                         thresholds=thresholds)
+    else:
+        report = analyze_library(threshold=args.threshold, use_calibration=args.calibration,
+                                 margin=args.margin, workers=args.workers)
+
+    print(format_report(report, args.top))
+
+    if args.json_path:
+        from core.persistence import atomic_write_json
+        atomic_write_json(args.json_path, report.to_dict(), indent=2)
+        print(f"已写入 {args.json_path}")
+    if args.matrix:
+        np.save(args.matrix, report.matrix)
+        print(f"已写入 {args.matrix}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import logging
 import os
 import re
 import sys
@@ -8,7 +9,12 @@ import traceback
 from pynput.keyboard import Controller, Key, KeyCode
 
 from core.logger import get_logger
+from core.metrics import (
+    EXECUTOR_QUEUE_DEPTH, GESTURES_RECOGNIZED, GESTURES_UNMATCHED, RECOGNITION_SECONDS, get_metrics
+)
+from core.trace import EVENT_KEY_INJECTED, EVENT_RECOGNITION_END, EVENT_RECOGNITION_START, trace
 from ui.gestures.gestures import get_gesture_library
+from ui.settings.settings import get_settings
 
 
 class GestureExecutor:
@@ -116,15 +122,34 @@ class GestureExecutor:
             self.gesture_library = None
             self.logger.error(f"手势库加载失败: {e}")
 
+        metrics = get_metrics()
+        self._recognized = metrics.counter(GESTURES_RECOGNIZED, "识别成功并执行的手势数")
+        self._unmatched = metrics.counter(GESTURES_UNMATCHED, "没有匹配到手势的绘制次数")
+        self._recognition_time = metrics.histogram(RECOGNITION_SECONDS, "手势识别耗时")
+        self._pending_keys = metrics.gauge(EXECUTOR_QUEUE_DEPTH, "等待完成的快捷键执行线程数")
+
+        settings = get_settings()
+        snapshot = settings.snapshot()
+        self.similarity_threshold = snapshot.get("gesture.similarity_threshold", 0.70)
+        self.use_calibration = snapshot.get("gesture.calibrated_thresholds", True)
+        settings.subscribe(
+            ("gesture.similarity_threshold", "gesture.calibrated_thresholds"), self._on_threshold_changed
+        )
+
         GestureExecutor._instance = self
 
+    def _on_threshold_changed(self, snapshot, changed_keys):
+        self.similarity_threshold = snapshot.get("gesture.similarity_threshold", 0.70)
+        self.use_calibration = snapshot.get("gesture.calibrated_thresholds", True)
+        self.logger.debug("相似度阈值已更新: %s，使用校准阈值: %s", self.similarity_threshold, self.use_calibration)
+
     def execute_gesture_by_path(self, drawn_path):
         """根据绘制路径执行对应的手势动作"""
         if not drawn_path or not drawn_path.get('points'):
             self.logger.debug("绘制路径为空，不执行任何动作")
             return False
 
-        self.logger.info(f"准备根据路径执行手势，路径点数: {len(drawn_path.get('points', []))}")
+        self.logger.info("准备根据路径执行手势，路径点数: %s", len(drawn_path.get('points', [])))
 
         if not self.gesture_library:
             self.logger.error("手势库未正确加载，无法执行手势")
@@ -133,26 +158,26 @@ class GestureExecutor:
         if not self.keyboard:
             self.logger.error("键盘控制器未正确加载，无法执行手势")
             return False
-        try:
-            from ui.settings.settings import get_settings
-            settings = get_settings()
-            similarity_threshold = settings.get("gesture.similarity_threshold", 0.70)
-        except Exception as e:
-            self.logger.warning(f"无法获取相似度阈值设置，使用默认值0.70: {e}")
-            similarity_threshold = 0.70
-
-        gesture_name, execute_action, similarity = self.gesture_library.get_gesture_by_path(drawn_path, similarity_threshold)
+        similarity_threshold = self.similarity_threshold
+        trace(EVENT_RECOGNITION_START, len(drawn_path['points']))
+        with self._recognition_time.time():
+            gesture_name, execute_action, similarity = self.gesture_library.get_gesture_by_path(
+                drawn_path, similarity_threshold, self.use_calibration
+            )
+        trace(EVENT_RECOGNITION_END, similarity, 1.0 if execute_action else 0.0)
 
         if not execute_action:
-            self.logger.info(f"未找到匹配的手势，最高相似度: {similarity:.3f}，阈值: {similarity_threshold}")
+            self._unmatched.inc()
+            self.logger.info("未找到匹配的手势，最高相似度: %.3f，阈值: %s", similarity, similarity_threshold)
             return False
 
-        self.logger.info(f"识别到手势: {gesture_name}，相似度: {similarity:.3f}")
+        self.logger.info("识别到手势: %s，相似度: %.3f", gesture_name, similarity)
+        self._recognized.inc()
 
         action_type = execute_action.get("type")
         action_value = execute_action.get("value")
 
-        self.logger.debug(f"手势动作类型: {action_type}, 值: {action_value}")
+        self.logger.debug("手势动作类型: %s, 值: %s", action_type, action_value)
 
         if action_type == "shortcut":
             return self._execute_shortcut(action_value)
@@ -162,7 +187,7 @@ class GestureExecutor:
 
     def _execute_shortcut(self, shortcut_str):
         """执行快捷键"""
-        self.logger.info(f"执行快捷键: {shortcut_str}")
+        self.logger.info("执行快捷键: %s", shortcut_str)
 
         if not shortcut_str:
             self.logger.warning("快捷键字符串为空")
@@ -175,10 +200,10 @@ class GestureExecutor:
         try:
             if " " in shortcut_str and "+" not in shortcut_str:
                 keys = shortcut_str.lower().split()
-                self.logger.debug(f"检测到macOS格式快捷键，解析为: {keys}")
+                self.logger.debug("检测到macOS格式快捷键，解析为: %s", keys)
             else:
                 keys = shortcut_str.lower().split("+")
-                self.logger.debug(f"解析标准格式快捷键: {keys}")
+                self.logger.debug("解析标准格式快捷键: %s", keys)
 
             modifier_keys = []
             regular_keys = []
@@ -187,29 +212,31 @@ class GestureExecutor:
                 key = key.strip()
                 if key in self.special_keys:
                     modifier_keys.append(self.special_keys[key])
-                    self.logger.debug(f"添加修饰键: {key}")
+                    self.logger.debug("添加修饰键: %s", key)
                 elif len(key) == 1:
                     regular_keys.append(key)
-                    self.logger.debug(f"添加普通键: {key}")
+                    self.logger.debug("添加普通键: %s", key)
                 elif re.match(r"^f\d+$", key):
                     if key in self.special_keys:
                         regular_keys.append(self.special_keys[key])
-                        self.logger.debug(f"添加函数键: {key}")
+                        self.logger.debug("添加函数键: %s", key)
                 else:
                     self.logger.warning(f"未知的键值: {key}")
                     return False
 
-            self.logger.debug(
-                f"修饰键: {[str(k) for k in modifier_keys]}, 普通键: {regular_keys}"
-            )
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    "修饰键: %s, 普通键: %s", [str(k) for k in modifier_keys], regular_keys
+                )
 
             thread = threading.Thread(
                 target=self._press_keys, args=(modifier_keys, regular_keys)
             )
             thread.daemon = True
+            self._pending_keys.inc()
             thread.start()
 
-            self.logger.info(f"快捷键 {shortcut_str} 执行线程已启动")
+            self.logger.info("快捷键 %s 执行线程已启动", shortcut_str)
             return True
 
         except Exception as e:
@@ -226,21 +253,22 @@ class GestureExecutor:
             for key in regular_keys:
                 if isinstance(key, str) and len(key) == 1 and key.isalpha():
                     processed_keys.append(key.lower())
-                    self.logger.debug(f"将字母键 {key} 转换为小写 {key.lower()}")
+                    self.logger.debug("将字母键 %s 转换为小写 %s", key, key.lower())
                 else:
                     processed_keys.append(key)
 
             for key in modifier_keys:
                 self.keyboard.press(key)
-                self.logger.debug(f"按下修饰键: {key}")
+                self.logger.debug("按下修饰键: %s", key)
 
             for key in processed_keys:
                 if isinstance(key, Key) or isinstance(key, KeyCode):
                     self.keyboard.press(key)
                 else:
                     self.keyboard.press(key)
-                self.logger.debug(f"按下普通键: {key}")
+                self.logger.debug("按下普通键: %s", key)
 
+            trace(EVENT_KEY_INJECTED, len(modifier_keys) + len(processed_keys))
             time.sleep(0.1)
 
             for key in reversed(processed_keys):
@@ -248,17 +276,19 @@ class GestureExecutor:
                     self.keyboard.release(key)
                 else:
                     self.keyboard.release(key)
-                self.logger.debug(f"释放普通键: {key}")
+                self.logger.debug("释放普通键: %s", key)
 
             for key in reversed(modifier_keys):
                 self.keyboard.release(key)
-                self.logger.debug(f"释放修饰键: {key}")
+                self.logger.debug("释放修饰键: %s", key)
 
             self.logger.info("快捷键执行完成")
 
         except Exception as e:
             self.logger.error(f"按键操作失败: {e}")
             self.logger.error(traceback.format_exc())
+        finally:
+            self._pending_keys.dec()
 
     def release_all_keys(self):
         """释放所有可能按下的键，用于程序退出前的清理操作"""
@@ -271,7 +301,7 @@ class GestureExecutor:
         try:
             for key in [Key.ctrl, Key.shift, Key.alt, Key.cmd]:
                 self.keyboard.release(key)
-                self.logger.debug(f"释放修饰键: {key}")
+                self.logger.debug("释放修饰键: %s", key)
 
             for key in [
                 Key.f1,
@@ -288,7 +318,7 @@ class GestureExecutor:
                 Key.f12,
             ]:
                 self.keyboard.release(key)
-                self.logger.debug(f"释放功能键: {key}")
+                self.logger.debug("释放功能键: %s", key)
 
             for key in [
                 Key.space,
@@ -308,15 +338,15 @@ class GestureExecutor:
                 Key.right,
             ]:
                 self.keyboard.release(key)
-                self.logger.debug(f"释放特殊键: {key}")
+                self.logger.debug("释放特殊键: %s", key)
 
             for char in "abcdefghijklmnopqrstuvwxyz":
                 self.keyboard.release(char)
-                self.logger.debug(f"释放字母键: {char}")
+                self.logger.debug("释放字母键: %s", char)
 
             for num in "0123456789":
                 self.keyboard.release(num)
-                self.logger.debug(f"释放数字键: {num}")
+                self.logger.debug("释放数字键: %s", num)
 
             self.logger.info("所有按键已释放")
 
@@ -0,0 +1,557 @@
+"""
+二进制手势库格式
+
+大型手势库（数千个模板）以JSON保存时，每个点都是嵌套列表，加载时要完整解析。
+二进制格式把数据拆成几个连续的数组，读取时映射文件后直接按偏移量取用，不需要
+解析文本：
+- 文件头：魔数、版本、描述子点数、各部分数量、文件头之后全部数据的CRC32，
+  以及各数据段的偏移量与长度
+- 字符串表：所有名称、键和操作值的UTF-8字节及偏移量
+- 点数组：全部触发路径的点，float32，形状 (N, 2)
+- 连线数组：全部触发路径的连线
+- 描述子：每条触发路径预先计算好的识别描述子，float32，形状 (路径数, 点数, 2)
+- 触发路径、执行操作和手势映射三张定长记录表
+
+不符合常规结构的条目（额外字段、非数字坐标等）以JSON字符串的形式保存在记录的
+extra 字段中，打包和解包不会丢失数据。非整数坐标按float32保存，精度约为7位有效数字。
+
+与JSON互相转换：
+    python -m core.gesture_pack pack <gestures.json> <gestures.gkpack>
+    python -m core.gesture_pack unpack <gestures.gkpack> <gestures.json>
+    python -m core.gesture_pack info <gestures.gkpack>
+"""
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+PACK_MAGIC = b"GKPK"
+PACK_VERSION = 2
+PACK_SUFFIX = ".gkpack"
+
+# 文件头：魔数、版本、描述子点数、路径数、操作数、映射数、数据CRC32，之后是各数据段的(偏移量, 长度)
+_SEGMENTS = (
+    "string_offsets",
+    "string_data",
+    "paths",
+    "points",
+    "connections",
+    "descriptors",
+    "actions",
+    "mappings",
+)
+_HEADER = struct.Struct("<4sHHIIII" + "QQ" * len(_SEGMENTS))
+# 版本1的文件头没有CRC32，仍然可以读取
+_HEADER_V1 = struct.Struct("<4sHHIII" + "QQ" * len(_SEGMENTS))
+_PREFIX = struct.Struct("<4sH")
+_ALIGNMENT = 8
+_NO_STRING = -1
+# float32 能精确表示的最大整数，超出时整数坐标无法无损保存
+_FLOAT32_EXACT_INT = 1 << 24
+
+# 记录中 flags 的位：字段存在；路径记录额外使用 GEOMETRY/INTEGRAL/DESCRIPTOR 三位
+_FLAG_NAME = 1 << 0
+_FLAG_GEOMETRY = 1 << 1
+_FLAG_INTEGRAL = 1 << 2
+_FLAG_DESCRIPTOR = 1 << 3
+_FLAG_TYPE = 1 << 1
+_FLAG_VALUE = 1 << 2
+_FLAG_TRIGGER_ID = 1 << 1
+_FLAG_ACTION_ID = 1 << 2
+
+PATH_DTYPE = np.dtype([
+    ("key", "<i4"),
+    ("name", "<i4"),
+    ("extra", "<i4"),
+    ("flags", "<u4"),
+    ("point_start", "<u4"),
+    ("point_count", "<u4"),
+    ("connection_start", "<u4"),
+    ("connection_count", "<u4"),
+])
+CONNECTION_DTYPE = np.dtype([
+    ("from", "<i4"),
+    ("to", "<i4"),
+    ("type", "<i4"),
+])
+ACTION_DTYPE = np.dtype([
+    ("key", "<i4"),
+    ("name", "<i4"),
+    ("type", "<i4"),
+    ("value", "<i4"),
+    ("extra", "<i4"),
+    ("flags", "<u4"),
+])
+MAPPING_DTYPE = np.dtype([
+    ("key", "<i4"),
+    ("name", "<i4"),
+    ("trigger_path_id", "<i8"),
+    ("execute_action_id", "<i8"),
+    ("extra", "<i4"),
+    ("flags", "<u4"),
+])
+
+
+class GesturePackError(ValueError):
+    """二进制手势库文件损坏或版本不受支持"""
+
+
+class _StringTable:
+    def __init__(self):
+        self._index = {}
+        self._encoded = []
+
+    def add(self, text):
+        index = self._index.get(text)
+        if index is None:
+            index = len(self._encoded)
+            self._index[text] = index
+            self._encoded.append(text.encode("utf-8"))
+        return index
+
+    def to_arrays(self):
+        lengths = np.fromiter((len(item) for item in self._encoded), dtype=np.uint32, count=len(self._encoded))
+        offsets = np.zeros(len(self._encoded) + 1, dtype="<u4")
+        np.cumsum(lengths, out=offsets[1:])
+        return offsets, np.frombuffer(b"".join(self._encoded), dtype=np.uint8)
+
+
+def _extra_json(strings, entry, known_fields):
+    extra = {key: value for key, value in entry.items() if key not in known_fields}
+    if not extra:
+        return _NO_STRING
+    return strings.add(json.dumps(extra, ensure_ascii=False, separators=(",", ":")))
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _pack_geometry(path, strings):
+    """把 path 字典转换为点数组和连线数组，结构不常规时返回 None"""
+    if not isinstance(path, dict) or set(path) != {"points", "connections"}:
+        return None
+    points, connections = path["points"], path["connections"]
+    if not isinstance(points, list) or not isinstance(connections, list):
+        return None
+
+    integral = True
+    for point in points:
+        if not isinstance(point, (list, tuple)) or len(point) != 2:
+            return None
+        for value in point:
+            if _is_int(value):
+                continue
+            if not isinstance(value, float):
+                return None
+            integral = False
+    try:
+        point_array = np.array(points, dtype="<f4").reshape(-1, 2)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if integral and np.any(np.abs(point_array) > _FLOAT32_EXACT_INT):
+        return None
+
+    connection_array = np.zeros(len(connections), dtype=CONNECTION_DTYPE)
+    for i, connection in enumerate(connections):
+        if not isinstance(connection, dict) or set(connection) != {"from", "to", "type"}:
+            return None
+        if not _is_int(connection["from"]) or not _is_int(connection["to"]) or not isinstance(connection["type"], str):
+            return None
+        connection_array[i] = (connection["from"], connection["to"], strings.add(connection["type"]))
+
+    return point_array, connection_array, integral
+
+
+def encode_pack(data, compute_descriptor=None, descriptors=None, descriptor_points=64):
+    """把手势库字典编码为二进制格式
+
+    Args:
+        data: 包含 trigger_paths / execute_actions / gesture_mappings 的字典
+        compute_descriptor: 可选，接收 path 字典返回 (descriptor_points, 2) 数组或 None
+        descriptors: 可选，已经计算好的描述子，{路径键: 数组}
+        descriptor_points: 描述子的点数
+
+    Returns:
+        bytes
+    """
+    descriptors = descriptors or {}
+    strings = _StringTable()
+
+    trigger_paths = data.get("trigger_paths", {}) or {}
+    path_records = np.zeros(len(trigger_paths), dtype=PATH_DTYPE)
+    descriptor_array = np.zeros((len(trigger_paths), descriptor_points, 2), dtype="<f4")
+    point_chunks, connection_chunks = [], []
+    point_total = connection_total = 0
+
+    for i, (key, entry) in enumerate(trigger_paths.items()):
+        record = path_records[i]
+        record["key"] = strings.add(key)
+        flags = 0
+        known = set()
+        if isinstance(entry.get("name"), str):
+            record["name"] = strings.add(entry["name"])
+            flags |= _FLAG_NAME
+            known.add("name")
+
+        geometry = _pack_geometry(entry.get("path"), strings) if "path" in entry else None
+        if geometry is not None:
+            point_array, connection_array, integral = geometry
+            record["point_start"], record["point_count"] = point_total, len(point_array)
+            record["connection_start"], record["connection_count"] = connection_total, len(connection_array)
+            point_chunks.append(point_array)
+            connection_chunks.append(connection_array)
+            point_total += len(point_array)
+            connection_total += len(connection_array)
+            flags |= _FLAG_GEOMETRY | (_FLAG_INTEGRAL if integral else 0)
+            known.add("path")
+
+            descriptor = descriptors.get(key)
+            if descriptor is None and compute_descriptor is not None:
+                descriptor = compute_descriptor(entry["path"])
+            if descriptor is not None and np.shape(descriptor) == (descriptor_points, 2):
+                descriptor_array[i] = descriptor
+                flags |= _FLAG_DESCRIPTOR
+
+        record["extra"] = _extra_json(strings, entry, known)
+        record["flags"] = flags
+
+    execute_actions = data.get("execute_actions", {}) or {}
+    action_records = np.zeros(len(execute_actions), dtype=ACTION_DTYPE)
+    for i, (key, entry) in enumerate(execute_actions.items()):
+        record = action_records[i]
+        record["key"] = strings.add(key)
+        flags = 0
+        known = set()
+        for field, flag in (("name", _FLAG_NAME), ("type", _FLAG_TYPE), ("value", _FLAG_VALUE)):
+            if isinstance(entry.get(field), str):
+                record[field] = strings.add(entry[field])
+                flags |= flag
+                known.add(field)
+        record["extra"] = _extra_json(strings, entry, known)
+        record["flags"] = flags
+
+    gesture_mappings = data.get("gesture_mappings", {}) or {}
+    mapping_records = np.zeros(len(gesture_mappings), dtype=MAPPING_DTYPE)
+    for i, (key, entry) in enumerate(gesture_mappings.items()):
+        record = mapping_records[i]
+        record["key"] = strings.add(key)
+        flags = 0
+        known = set()
+        if isinstance(entry.get("name"), str):
+            record["name"] = strings.add(entry["name"])
+            flags |= _FLAG_NAME
+            known.add("name")
+        for field, flag in (("trigger_path_id", _FLAG_TRIGGER_ID), ("execute_action_id", _FLAG_ACTION_ID)):
+            value = entry.get(field)
+            if _is_int(value) and -(1 << 63) <= value < (1 << 63):
+                record[field] = value
+                flags |= flag
+                known.add(field)
+        record["extra"] = _extra_json(strings, entry, known)
+        record["flags"] = flags
+
+    string_offsets, string_data = strings.to_arrays()
+    points = np.concatenate(point_chunks) if point_chunks else np.zeros((0, 2), dtype="<f4")
+    connections = np.concatenate(connection_chunks) if connection_chunks else np.zeros(0, dtype=CONNECTION_DTYPE)
+
+    segments = {
+        "string_offsets": string_offsets,
+        "string_data": string_data,
+        "paths": path_records,
+        "points": points,
+        "connections": connections,
+        "descriptors": descriptor_array,
+        "actions": action_records,
+        "mappings": mapping_records,
+    }
+
+    body = bytearray()
+    layout = []
+    offset = _HEADER.size
+    for name in _SEGMENTS:
+        padding = -offset % _ALIGNMENT
+        body += b"\0" * padding
+        offset += padding
+        raw = np.ascontiguousarray(segments[name]).tobytes()
+        layout.extend((offset, len(raw)))
+        body += raw
+        offset += len(raw)
+
+    header = _HEADER.pack(
+        PACK_MAGIC, PACK_VERSION, descriptor_points,
+        len(trigger_paths), len(execute_actions), len(gesture_mappings),
+        zlib.crc32(body),
+        *layout,
+    )
+    return header + bytes(body)
+
+
+class GesturePack:
+    """只读的二进制手势库
+
+    文件通过 mmap 映射，各数据段是直接指向映射内存的 NumPy 数组，打开时校验
+    文件头、数据的CRC32和数据段边界；解码字符串时发现的错误同样以 GesturePackError
+    抛出。用完后应调用 close()（或使用 with 语句），Windows 上映射中的文件无法被替换。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise GesturePackError(f"文件为空: {path}") from e
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        size = len(self._mmap)
+        if size < _PREFIX.size:
+            raise GesturePackError("文件过短，不是有效的手势库文件")
+
+        magic, version = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != PACK_MAGIC:
+            raise GesturePackError("文件标识不匹配，不是有效的手势库文件")
+        header = {1: _HEADER_V1, PACK_VERSION: _HEADER}.get(version)
+        if header is None:
+            raise GesturePackError(f"不支持的手势库文件版本: {version}")
+        if size < header.size:
+            raise GesturePackError("文件过短，不是有效的手势库文件")
+
+        fields = header.unpack_from(self._mmap, 0)
+        self.version = version
+        self.descriptor_points, n_paths, n_actions, n_mappings = fields[2:6]
+        if version >= 2:
+            with memoryview(self._mmap) as view, view[header.size:] as payload:
+                if zlib.crc32(payload) != fields[6]:
+                    raise GesturePackError("数据校验失败（CRC32不匹配），文件已损坏")
+            fields = fields[:6] + fields[7:]
+
+        layout = dict(zip(_SEGMENTS, zip(fields[6::2], fields[7::2])))
+        buffer = np.frombuffer(self._mmap, dtype=np.uint8)
+
+        def segment(name, dtype, count=None):
+            offset, length = layout[name]
+            if offset + length > size:
+                raise GesturePackError(f"数据段越界: {name}")
+            dtype = np.dtype(dtype)
+            if length % dtype.itemsize or (count is not None and length != count * dtype.itemsize):
+                raise GesturePackError(f"数据段长度不正确: {name}")
+            return buffer[offset:offset + length].view(dtype)
+
+        self.string_offsets = segment("string_offsets", "<u4")
+        self.string_data = segment("string_data", np.uint8)
+        self.paths = segment("paths", PATH_DTYPE, n_paths)
+        self.points = segment("points", "<f4").reshape(-1, 2)
+        self.connections = segment("connections", CONNECTION_DTYPE)
+        self.descriptors = segment("descriptors", "<f4", n_paths * self.descriptor_points * 2).reshape(
+            n_paths, self.descriptor_points, 2
+        )
+        self.actions = segment("actions", ACTION_DTYPE, n_actions)
+        self.mappings = segment("mappings", MAPPING_DTYPE, n_mappings)
+        del buffer
+
+        if len(self.string_offsets) == 0 or self.string_offsets[-1] > len(self.string_data):
+            raise GesturePackError("字符串表损坏")
+        if np.any(np.diff(self.string_offsets.astype(np.int64)) < 0):
+            raise GesturePackError("字符串表损坏")
+        string_count = len(self.string_offsets) - 1
+        for table, fields_ in ((self.paths, ("key", "name", "extra")),
+                               (self.actions, ("key", "name", "type", "value", "extra")),
+                               (self.mappings, ("key", "name", "extra")),
+                               (self.connections, ("type",))):
+            for field in fields_:
+                if len(table) and (table[field].max() >= string_count or table[field].min() < _NO_STRING):
+                    raise GesturePackError("字符串索引越界")
+        point_end = self.paths["point_start"].astype(np.int64) + self.paths["point_count"]
+        connection_end = self.paths["connection_start"].astype(np.int64) + self.paths["connection_count"]
+        if len(self.paths) and (point_end.max() > len(self.points) or connection_end.max() > len(self.connections)):
+            raise GesturePackError("路径数据越界")
+
+    def close(self):
+        """释放文件映射"""
+        for name in ("string_offsets", "string_data", "paths", "points", "connections",
+                     "descriptors", "actions", "mappings"):
+            self.__dict__.pop(name, None)
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # 仍有数组引用映射内存（例如解析失败时的异常栈），交给垃圾回收释放
+                pass
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def string(self, index):
+        if index == _NO_STRING:
+            return None
+        start, end = self.string_offsets[index], self.string_offsets[index + 1]
+        try:
+            return self.string_data[start:end].tobytes().decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise GesturePackError(f"字符串表损坏: {e}") from e
+
+    def _strings(self):
+        offsets = self.string_offsets.tolist()
+        data = self.string_data.tobytes()
+        try:
+            return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+        except UnicodeDecodeError as e:
+            raise GesturePackError(f"字符串表损坏: {e}") from e
+
+    def path_keys(self):
+        """按存储顺序返回触发路径的键"""
+        return [self.string(index) for index in self.paths["key"].tolist()]
+
+    def descriptor_for(self, index):
+        """返回第 index 条触发路径的预计算描述子（复制），没有时返回 None"""
+        if not self.paths[index]["flags"] & _FLAG_DESCRIPTOR:
+            return None
+        return np.array(self.descriptors[index], dtype=np.float64)
+
+    def to_dict(self):
+        """解码为与 gestures.json 相同结构的字典"""
+        strings = self._strings()
+
+        def text(index):
+            return strings[index] if index != _NO_STRING else None
+
+        def entry_with_extra(entry, extra_index):
+            if extra_index != _NO_STRING:
+                try:
+                    extra = json.loads(strings[extra_index])
+                except ValueError as e:
+                    raise GesturePackError(f"条目的额外字段损坏: {e}") from e
+                if not isinstance(extra, dict):
+                    raise GesturePackError("条目的额外字段损坏: 不是JSON对象")
+                entry.update(extra)
+            return entry
+
+        trigger_paths = {}
+        points = self.points
+        connections = self.connections
+        for record in self.paths.tolist():
+            key, name, extra, flags, point_start, point_count, connection_start, connection_count = record
+            entry = {}
+            if flags & _FLAG_NAME:
+                entry["name"] = strings[name]
+            if flags & _FLAG_GEOMETRY:
+                path_points = points[point_start:point_start + point_count]
+                if flags & _FLAG_INTEGRAL:
+                    path_points = path_points.astype(np.int64)
+                entry["path"] = {
+                    "points": path_points.tolist(),
+                    "connections": [
+                        {"from": start, "to": end, "type": strings[kind]}
+                        for start, end, kind in connections[connection_start:connection_start + connection_count].tolist()
+                    ],
+                }
+            trigger_paths[strings[key]] = entry_with_extra(entry, extra)
+
+        execute_actions = {}
+        for key, name, kind, value, extra, flags in self.actions.tolist():
+            entry = {}
+            if flags & _FLAG_NAME:
+                entry["name"] = text(name)
+            if flags & _FLAG_TYPE:
+                entry["type"] = text(kind)
+            if flags & _FLAG_VALUE:
+                entry["value"] = text(value)
+            execute_actions[strings[key]] = entry_with_extra(entry, extra)
+
+        gesture_mappings = {}
+        for key, name, trigger_path_id, execute_action_id, extra, flags in self.mappings.tolist():
+            entry = {}
+            if flags & _FLAG_NAME:
+                entry["name"] = text(name)
+            if flags & _FLAG_TRIGGER_ID:
+                entry["trigger_path_id"] = trigger_path_id
+            if flags & _FLAG_ACTION_ID:
+                entry["execute_action_id"] = execute_action_id
+            gesture_mappings[strings[key]] = entry_with_extra(entry, extra)
+
+        return {
+            "trigger_paths": trigger_paths,
+            "execute_actions": execute_actions,
+            "gesture_mappings": gesture_mappings,
+        }
+
+
+def read_pack(path):
+    """读取二进制手势库，返回 (数据字典, {路径键: 描述子})，读取后立即释放文件映射
+
+    文件损坏时只抛出 GesturePackError，调用方不需要处理解码过程中的其他异常。
+    """
+    with GesturePack(path) as pack:
+        try:
+            data = pack.to_dict()
+            descriptors = {}
+            for index, key in enumerate(pack.path_keys()):
+                descriptor = pack.descriptor_for(index)
+                if descriptor is not None:
+                    descriptors[key] = descriptor
+        except GesturePackError:
+            raise
+        except (ValueError, IndexError, TypeError, KeyError) as e:
+            raise GesturePackError(f"解码手势库失败: {e}") from e
+        return data, descriptors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GestroKey手势库JSON与二进制格式互相转换")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = subparsers.add_parser("pack", help="JSON转换为二进制格式")
+    pack_parser.add_argument("source", help="gestures.json")
+    pack_parser.add_argument("target", help=f"输出的 *{PACK_SUFFIX} 文件")
+
+    unpack_parser = subparsers.add_parser("unpack", help="二进制格式转换为JSON")
+    unpack_parser.add_argument("source", help=f"*{PACK_SUFFIX} 文件")
+    unpack_parser.add_argument("target", help="输出的JSON文件")
+
+    info_parser = subparsers.add_parser("info", help="显示二进制手势库的摘要")
+    info_parser.add_argument("source", help=f"*{PACK_SUFFIX} 文件")
+
+    args = parser.parse_args(argv)
+
+    from core.persistence import atomic_write_bytes, atomic_write_json
+
+    if args.command == "pack":
+        from core.path_analyzer import DESCRIPTOR_POINTS, PathAnalyzer
+
+        with open(args.source, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        analyzer = PathAnalyzer()
+        atomic_write_bytes(args.target, encode_pack(data, analyzer.compute_descriptor, descriptor_points=DESCRIPTOR_POINTS))
+        print(f"已写入 {args.target}")
+    elif args.command == "unpack":
+        data, _descriptors = read_pack(args.source)
+        atomic_write_json(args.target, data)
+        print(f"已写入 {args.target}")
+    else:
+        with GesturePack(args.source) as pack:
+            described = int(np.count_nonzero(pack.paths["flags"] & _FLAG_DESCRIPTOR))
+            print(f"版本: {pack.version}")
+            print(f"触发路径: {len(pack.paths)}（{len(pack.points)} 个点，{described} 个预计算描述子）")
+            print(f"执行操作: {len(pack.actions)}")
+            print(f"手势映射: {len(pack.mappings)}")
+            print(f"字符串: {len(pack.string_offsets) - 1}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,51 +1,297 @@
+import atexit
+import gzip
 import logging
+import logging.handlers
 import os
+import queue
+import re
+import shutil
 import sys
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
+
+from core.metrics import LOG_QUEUE_DEPTH, LOG_RECORDS_DROPPED, get_metrics
 from version import APP_NAME, AUTHOR
 
+# 日志队列容量，超出后按溢出策略处理，调用线程永远不会等待磁盘
+LOG_QUEUE_SIZE = 10000
+# 单个日志文件的最大字节数，超出后滚动为新文件
+LOG_MAX_FILE_SIZE = 5 * 1024 * 1024
+# 日志目录的最大总字节数，超出后从最旧的文件开始删除
+LOG_MAX_TOTAL_SIZE = 50 * 1024 * 1024
+# 启动后首次清理的延迟，以及之后的清理间隔（秒）
+LOG_PRUNE_DELAY = 120
+LOG_PRUNE_INTERVAL = 3600
 
-class Logger:
-    def __init__(self, module_name=None):
-        self.module_name = module_name if module_name else APP_NAME
-        self.logger = None
-        self.setup_logger()
+_LOG_FILE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}(\.\d+)?\.log(\.gz)?$")
 
-    def setup_logger(self):
-        if sys.platform.startswith("win"):
-            log_dir = os.path.join(os.path.expanduser("~"), f".{AUTHOR}", APP_NAME.lower(), "log")
-        elif sys.platform.startswith("darwin"):
-            user_dir = os.path.expanduser("~")
-            log_dir = os.path.join(user_dir, "Library", "Application Support", f"{AUTHOR}", APP_NAME, "log")
-        else:
-            xdg_config_home = os.environ.get("XDG_CONFIG_HOME", os.path.join(os.path.expanduser("~"), ".config"))
-            log_dir = os.path.join(xdg_config_home, f"{AUTHOR}", APP_NAME, "log")
+_backend = None
+_backend_lock = threading.Lock()
 
-        os.makedirs(log_dir, exist_ok=True)
+# 模块日志级别，由设置中的 logging 部分配置；未配置前所有模块记录DEBUG
+_module_levels = {}
+_default_level = logging.DEBUG
+_verbose = False
 
-        today = datetime.now().strftime("%Y-%m-%d")
-        log_file = os.path.join(log_dir, f"{today}.log")
 
-        self.logger = logging.getLogger(self.module_name)
-        self.logger.setLevel(logging.DEBUG)
+def get_log_dir():
+    """获取日志目录路径"""
+    if sys.platform.startswith("win"):
+        return os.path.join(os.path.expanduser("~"), f".{AUTHOR}", APP_NAME.lower(), "log")
+    elif sys.platform.startswith("darwin"):
+        user_dir = os.path.expanduser("~")
+        return os.path.join(user_dir, "Library", "Application Support", f"{AUTHOR}", APP_NAME, "log")
+    else:
+        xdg_config_home = os.environ.get("XDG_CONFIG_HOME", os.path.join(os.path.expanduser("~"), ".config"))
+        return os.path.join(xdg_config_home, f"{AUTHOR}", APP_NAME, "log")
 
-        if self.logger.handlers:
+
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    """非阻塞的队列处理器
+
+    溢出策略：队列已满时，WARNING以下的记录直接丢弃；WARNING及以上的记录
+    挤掉队列中最旧的一条后入队。丢弃数量由后台写入线程汇总输出。
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._dropped_total = get_metrics().counter(LOG_RECORDS_DROPPED, "日志队列已满时丢弃的日志条数")
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
             return
+        except queue.Full:
+            pass
+
+        if record.levelno >= logging.WARNING:
+            try:
+                self.queue.get_nowait()
+                self._count_dropped()
+                self.queue.put_nowait(record)
+                return
+            except (queue.Empty, queue.Full):
+                pass
+
+        self._count_dropped()
+
+    def _count_dropped(self):
+        with self._dropped_lock:
+            self.dropped += 1
+        self._dropped_total.inc()
+
+    def take_dropped(self):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class _LogListener(logging.handlers.QueueListener):
+    """后台写入线程，负责把队列中的记录写入文件和控制台"""
+
+    def __init__(self, log_queue, queue_handler, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+
+    def enqueue_sentinel(self):
+        # 默认实现使用 put_nowait，队列已满时会抛出 queue.Full；写入线程正在消费队列，阻塞等待不会死锁
+        self.queue.put(self._sentinel)
+
+    def handle(self, record):
+        if self.queue_handler.dropped:
+            dropped = self.queue_handler.take_dropped()
+            if dropped:
+                notice = logging.makeLogRecord({
+                    "name": "Logger",
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"日志队列已满，已丢弃 {dropped} 条日志",
+                })
+                super().handle(notice)
+        super().handle(record)
+
+
+class _LogMaintenance(threading.Thread):
+    """日志维护线程：压缩滚动出的文件，并定期清理超出总大小的旧文件"""
+
+    def __init__(self, log_dir):
+        super().__init__(name="LogMaintenance", daemon=True)
+        self.log_dir = log_dir
+        self.active_file = None
+        self.tasks = queue.SimpleQueue()
+        self.next_prune = time.monotonic() + LOG_PRUNE_DELAY
+        self._stop_event = threading.Event()
+
+    def compress_later(self, path):
+        self.tasks.put(path)
+
+    def stop(self):
+        self._stop_event.set()
+        self.tasks.put(None)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            timeout = max(0.0, self.next_prune - time.monotonic())
+            try:
+                path = self.tasks.get(timeout=timeout)
+            except queue.Empty:
+                path = None
+
+            if self._stop_event.is_set():
+                break
+
+            if path:
+                self._compress(path)
+            elif time.monotonic() >= self.next_prune:
+                self.prune()
+                self.next_prune = time.monotonic() + LOG_PRUNE_INTERVAL
+
+    def _compress(self, path):
+        if not os.path.exists(path):
+            return
+        target = path + ".gz"
+        temp = target + ".tmp"
+        try:
+            with open(path, "rb") as src, gzip.open(temp, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(temp, target)
+            os.remove(path)
+        except OSError as e:
+            print(f"压缩日志文件失败: {path}, {e}")
+
+    def prune(self):
+        """压缩遗留的未压缩日志，并按修改时间删除最旧的文件直到总大小达标"""
+        try:
+            names = os.listdir(self.log_dir)
+        except OSError:
+            return
+
+        active = os.path.basename(self.active_file) if self.active_file else None
+        for name in names:
+            path = os.path.join(self.log_dir, name)
+            if name.endswith(".gz.tmp"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            elif name != active and name.endswith(".log") and _LOG_FILE_PATTERN.match(name):
+                self._compress(path)
+
+        entries = []
+        total = 0
+        for name in os.listdir(self.log_dir):
+            if name == active or not _LOG_FILE_PATTERN.match(name):
+                continue
+            path = os.path.join(self.log_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if self.active_file and os.path.exists(self.active_file):
+            total += os.path.getsize(self.active_file)
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= LOG_MAX_TOTAL_SIZE:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class _RotatingLogFileHandler(logging.FileHandler):
+    """按日期命名并按大小滚动的日志文件处理器
+
+    当天文件写满后重命名为 日期.序号.log，跨天后切换到新日期的文件，
+    旧文件交给维护线程在后台压缩为 .gz。
+    """
+
+    def __init__(self, log_dir, maintenance):
+        self.log_dir = log_dir
+        self.maintenance = maintenance
+        self.current_date = datetime.now().strftime("%Y-%m-%d")
+        self.next_day = self._compute_next_day()
+        super().__init__(self._path_for(self.current_date), encoding="utf-8")
+        self.maintenance.active_file = self.baseFilename
+
+    def _path_for(self, date):
+        return os.path.join(self.log_dir, f"{date}.log")
+
+    def _compute_next_day(self):
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime(tomorrow.year, tomorrow.month, tomorrow.day).timestamp()
+
+    def emit(self, record):
+        try:
+            if record.created >= self.next_day:
+                self._roll_day()
+            elif self.stream is not None and self.stream.tell() >= LOG_MAX_FILE_SIZE:
+                self._roll_size()
+        except Exception:
+            self.handleError(record)
+        super().emit(record)
+
+    def _close_stream(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+    def _roll_size(self):
+        self._close_stream()
+        index = 1
+        while True:
+            rolled = os.path.join(self.log_dir, f"{self.current_date}.{index}.log")
+            if not os.path.exists(rolled) and not os.path.exists(rolled + ".gz"):
+                break
+            index += 1
+        os.replace(self.baseFilename, rolled)
+        self.maintenance.compress_later(rolled)
+
+    def _roll_day(self):
+        self._close_stream()
+        previous = self.baseFilename
+        self.current_date = datetime.now().strftime("%Y-%m-%d")
+        self.next_day = self._compute_next_day()
+        self.baseFilename = self._path_for(self.current_date)
+        self.maintenance.active_file = self.baseFilename
+        if previous != self.baseFilename:
+            self.maintenance.compress_later(previous)
+
+
+class _LogBackend:
+    """进程内共享的日志后端：一个有界队列 + 一个后台写入线程"""
+
+    def __init__(self):
+        self.log_dir = get_log_dir()
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        self.log_file = os.path.join(self.log_dir, f"{today}.log")
+        self.maintenance = _LogMaintenance(self.log_dir)
 
-        handlers = []
         formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] [%(name)s] - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+        handlers = []
 
-        file_writable = os.access(log_dir, os.W_OK)
-        if os.path.exists(log_file):
-            file_writable = os.access(log_file, os.W_OK)
+        self.file_writable = os.access(self.log_dir, os.W_OK)
+        if os.path.exists(self.log_file):
+            self.file_writable = os.access(self.log_file, os.W_OK)
 
-        if file_writable:
+        if self.file_writable:
             try:
-                file_handler = logging.FileHandler(log_file, encoding="utf-8")
+                file_handler = _RotatingLogFileHandler(self.log_dir, self.maintenance)
                 file_handler.setLevel(logging.DEBUG)
                 file_handler.setFormatter(formatter)
                 handlers.append(file_handler)
             except Exception as e:
+                self.file_writable = False
                 print(f"无法写入日志文件: {e}")
 
         console_handler = logging.StreamHandler()
@@ -53,32 +299,159 @@ class Logger:
         console_handler.setFormatter(formatter)
         handlers.append(console_handler)
 
-        for handler in handlers:
-            self.logger.addHandler(handler)
+        self.handlers = handlers
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.queue_handler = _BoundedQueueHandler(self.queue)
+        get_metrics().gauge(LOG_QUEUE_DEPTH, "等待写入的日志条数", self.queue.qsize)
+        self.listener = _LogListener(self.queue, self.queue_handler, *handlers)
+        self.listener.start()
+        if self.file_writable:
+            self.maintenance.start()
+
+    def shutdown(self):
+        """停止后台线程，写出队列中剩余的全部记录"""
+        if self.listener is None:
+            return
+        try:
+            self.listener.stop()
+            self.maintenance.stop()
+        finally:
+            self.listener = None
+            for handler in self.handlers:
+                try:
+                    handler.flush()
+                    handler.close()
+                except Exception:
+                    pass
 
-        if file_writable:
-            self.logger.info(f"日志记录器初始化完成，日志保存在: {log_file}")
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _LogBackend()
+                atexit.register(shutdown_logging)
+    return _backend
+
+
+def shutdown_logging():
+    """刷新并关闭日志后端，程序退出时调用"""
+    if _backend is not None:
+        _backend.shutdown()
+
+
+class Logger:
+    """模块日志记录器
+
+    消息支持%风格的延迟格式化，如 logger.debug("按下按键: %s", key)，
+    级别未启用时不会进行任何字符串拼接。
+    """
+
+    def __init__(self, module_name=None):
+        self.module_name = module_name if module_name else APP_NAME
+        self.logger = None
+        self.setup_logger()
+
+    def setup_logger(self):
+        backend = _get_backend()
+
+        self.logger = logging.getLogger(self.module_name)
+        self.logger.setLevel(_level_for(self.module_name))
+
+        if self.logger.handlers:
+            return
+
+        self.logger.addHandler(backend.queue_handler)
+        self.logger.propagate = False
+
+        if backend.file_writable:
+            self.logger.info("日志记录器初始化完成，日志保存在: %s", backend.log_file)
         else:
-            self.logger.warning(f"无法写入日志文件，仅输出到控制台")
+            self.logger.warning("无法写入日志文件，仅输出到控制台")
+
+    def isEnabledFor(self, level):
+        """判断指定级别是否会被记录，用于跳过昂贵的日志参数计算"""
+        return self.logger.isEnabledFor(level)
+
+    def debug(self, message, *args, **kwargs):
+        self.logger.debug(message, *args, **kwargs)
+
+    def info(self, message, *args, **kwargs):
+        self.logger.info(message, *args, **kwargs)
 
-    def debug(self, message):
-        self.logger.debug(message)
+    def warning(self, message, *args, **kwargs):
+        self.logger.warning(message, *args, **kwargs)
 
-    def info(self, message):
-        self.logger.info(message)
+    def error(self, message, *args, **kwargs):
+        self.logger.error(message, *args, **kwargs)
 
-    def warning(self, message):
-        self.logger.warning(message)
+    def critical(self, message, *args, **kwargs):
+        self.logger.critical(message, *args, **kwargs)
 
-    def error(self, message):
-        self.logger.error(message)
+    def exception(self, message, *args, **kwargs):
+        self.logger.exception(message, *args, **kwargs)
 
-    def critical(self, message):
-        self.logger.critical(message)
 
-    def exception(self, message):
-        self.logger.exception(message)
+_loggers = {}
+_loggers_lock = threading.Lock()
 
 
 def get_logger(module_name=None):
-    return Logger(module_name)
\ No newline at end of file
+    """获取模块日志记录器，同名模块返回同一个缓存实例"""
+    name = module_name if module_name else APP_NAME
+    logger = _loggers.get(name)
+    if logger is None:
+        with _loggers_lock:
+            logger = _loggers.get(name)
+            if logger is None:
+                logger = Logger(name)
+                _loggers[name] = logger
+    return logger
+
+
+def _level_for(module_name):
+    if _verbose:
+        return logging.DEBUG
+    return _module_levels.get(module_name, _default_level)
+
+
+def _parse_level(level):
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    return value if isinstance(value, int) else None
+
+
+def apply_log_levels(levels, verbose=False):
+    """应用模块日志级别配置，立即对已创建的记录器生效
+
+    Args:
+        levels: 模块名到级别名的映射，如 {"PathAnalyzer": "WARNING"}，
+            键 "default" 表示未列出模块的级别
+        verbose: 为True时忽略配置，所有模块输出DEBUG日志，用于排查问题
+    """
+    global _default_level, _verbose
+
+    parsed = {}
+    invalid = []
+    for module_name, level in (levels or {}).items():
+        value = _parse_level(level)
+        if value is None:
+            invalid.append(module_name)
+        elif module_name == "default":
+            _default_level = value
+        else:
+            parsed[module_name] = value
+
+    _module_levels.clear()
+    _module_levels.update(parsed)
+    _verbose = bool(verbose)
+
+    with _loggers_lock:
+        loggers = list(_loggers.values())
+    for logger in loggers:
+        logger.logger.setLevel(_level_for(logger.module_name))
+
+    if invalid:
+        get_logger("Logger").warning("无效的日志级别配置: %s", ", ".join(invalid))
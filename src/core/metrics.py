@@ -0,0 +1,274 @@
+"""
+进程内指标模块
+
+提供计数器（Counter）、仪表（Gauge）和直方图（Histogram）三种指标。各模块在热路径上
+只做一次加锁累加；界面和导出端通过 snapshot() 一次取得全部指标的不可变快照，
+速率和分位数由两次快照的差值计算，不需要逐个模块轮询。
+
+指标名称采用Prometheus风格：小写下划线，计数器以 _total 结尾，耗时以秒为单位。
+"""
+
+import bisect
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+def exponential_buckets(start, factor, count):
+    """生成按倍数递增的直方图桶上界"""
+    return tuple(start * factor ** i for i in range(count))
+
+
+# 50微秒到约10秒，每个桶是上一个的1.25倍，分位数的估算误差不超过桶宽
+LATENCY_BUCKETS = exponential_buckets(0.00005, 1.25, 56)
+
+
+class Counter:
+    """只增不减的计数器"""
+
+    kind = COUNTER
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def value(self):
+        return self._value
+
+
+class Gauge:
+    """可增可减的数值；设置了 function 时在取快照时调用它获取当前值"""
+
+    kind = GAUGE
+
+    def __init__(self, name, help_text="", function=None):
+        self.name = name
+        self.help = help_text
+        self.function = function
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function):
+        self.function = function
+
+    def value(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return math.nan
+        return self._value
+
+
+class HistogramSnapshot:
+    """直方图快照，counts[i] 是落在第i个桶（上界 bounds[i]，最后一个桶无上界）的次数"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds, counts, total, count):
+        self.bounds = bounds
+        self.counts = counts
+        self.sum = total
+        self.count = count
+
+    def __sub__(self, older):
+        """两次快照之间的观测值"""
+        return HistogramSnapshot(
+            self.bounds,
+            tuple(a - b for a, b in zip(self.counts, older.counts)),
+            self.sum - older.sum,
+            self.count - older.count,
+        )
+
+    def percentile(self, q):
+        """估算分位数（0-100），在桶内线性插值；没有观测值时返回None"""
+        if self.count <= 0:
+            return None
+        rank = q / 100.0 * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                if index >= len(self.bounds):
+                    return lower
+                upper = self.bounds[index]
+                return lower + (upper - lower) * max(rank - cumulative, 0) / bucket_count
+            cumulative += bucket_count
+        return self.bounds[-1]
+
+    def mean(self):
+        return self.sum / self.count if self.count > 0 else None
+
+
+class Histogram:
+    """固定桶直方图"""
+
+    kind = HISTOGRAM
+
+    def __init__(self, name, help_text="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.bounds = tuple(buckets)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self):
+        """记录代码块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def value(self):
+        with self._lock:
+            return HistogramSnapshot(self.bounds, tuple(self._counts), self._sum, self._count)
+
+
+class MetricsSnapshot:
+    """全部指标在某一时刻的值"""
+
+    __slots__ = ("time", "values")
+
+    def __init__(self, timestamp, values):
+        self.time = timestamp
+        self.values = values
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def rate(self, name, older):
+        """计数器在两次快照之间的每秒增量"""
+        elapsed = self.time - older.time
+        if elapsed <= 0:
+            return 0.0
+        return (self.values.get(name, 0) - older.values.get(name, 0)) / elapsed
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = cls(name, *args, **kwargs)
+                    self._metrics[name] = metric
+        if not isinstance(metric, cls):
+            raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+        return metric
+
+    def counter(self, name, help_text=""):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text="", function=None):
+        gauge = self._get_or_create(Gauge, name, help_text)
+        if function is not None:
+            gauge.set_function(function)
+        return gauge
+
+    def histogram(self, name, help_text="", buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets)
+
+    def metrics(self):
+        """按名称排序返回全部指标对象"""
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def snapshot(self):
+        return MetricsSnapshot(time.monotonic(), {metric.name: metric.value() for metric in self.metrics()})
+
+
+class MetricsWindow:
+    """保存最近一段时间的快照，用于计算窗口内的速率和分位数"""
+
+    def __init__(self, duration=60.0):
+        self.duration = duration
+        self._snapshots = deque()
+
+    def add(self, snapshot):
+        self._snapshots.append(snapshot)
+        while len(self._snapshots) > 2 and snapshot.time - self._snapshots[1].time >= self.duration:
+            self._snapshots.popleft()
+
+    def clear(self):
+        self._snapshots.clear()
+
+    def _ends(self):
+        if len(self._snapshots) < 2:
+            return None
+        return self._snapshots[0], self._snapshots[-1]
+
+    def rate(self, name):
+        """窗口内计数器的每秒增量，快照不足时返回None"""
+        ends = self._ends()
+        return ends[1].rate(name, ends[0]) if ends else None
+
+    def histogram(self, name):
+        """窗口内的直方图观测值，快照不足时返回None"""
+        ends = self._ends()
+        if not ends or name not in ends[1].values:
+            return None
+        # 窗口开始后才创建的直方图，全部观测值都在窗口内
+        if name not in ends[0].values:
+            return ends[1].values[name]
+        return ends[1].values[name] - ends[0].values[name]
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    """获取全局指标注册表"""
+    return _registry
+
+
+# 各模块共用的指标名称
+GESTURES_RECOGNIZED = "gestures_recognized_total"
+GESTURES_UNMATCHED = "gestures_unmatched_total"
+RECOGNITION_SECONDS = "recognition_duration_seconds"
+INPUT_EVENTS_RECEIVED = "input_events_received_total"
+INPUT_EVENTS_DROPPED = "input_events_dropped_total"
+OVERLAY_FRAME_SECONDS = "overlay_frame_duration_seconds"
+LOG_QUEUE_DEPTH = "log_queue_depth"
+LOG_RECORDS_DROPPED = "log_records_dropped_total"
+EXECUTOR_QUEUE_DEPTH = "executor_queue_depth"
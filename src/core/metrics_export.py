@@ -0,0 +1,306 @@
+"""
+指标导出模块
+
+把 core.metrics 中的指标和 SystemMonitor 的系统资源数据导出给外部监控使用，两种方式
+可以分别开启（设置中的 metrics 部分）：
+- Prometheus：在 127.0.0.1 上提供 HTTP 接口 /metrics，返回Prometheus文本格式
+- JSON快照：按固定间隔把全部指标原子写入一个JSON文件
+
+系统资源只在被抓取或写快照时采样一次，不单独定时采集；HTTP线程在没有请求时阻塞在
+accept 上，没有抓取端连接时除了一个空闲线程外没有任何开销。
+"""
+
+import math
+import os
+import threading
+from datetime import datetime
+
+from core.logger import get_log_dir, get_logger
+from core.metrics import COUNTER, GAUGE, HISTOGRAM, HistogramSnapshot, get_metrics
+
+PROMETHEUS_HOST = "127.0.0.1"
+PROMETHEUS_NAMESPACE = "gestrokey"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# SystemMonitor.sample() 的字段 -> (指标名称, 说明)
+SYSTEM_METRICS = (
+    ("cpu_percent", "system_cpu_percent", "系统CPU使用率（%）"),
+    ("memory_percent", "system_memory_percent", "系统内存使用率（%）"),
+    ("memory_used", "system_memory_used_bytes", "系统已用内存（字节）"),
+    ("memory_total", "system_memory_total_bytes", "系统内存总量（字节）"),
+    ("process_cpu", "process_cpu_percent", "进程CPU使用率（%，按核心数平均）"),
+    ("process_memory", "process_memory_percent", "进程内存占系统内存的比例（%）"),
+    ("process_rss", "process_resident_memory_bytes", "进程常驻内存（字节）"),
+    ("runtime_seconds", "process_uptime_seconds", "程序运行时间（秒）"),
+)
+
+# JSON快照中直方图输出的分位数
+SNAPSHOT_PERCENTILES = (50, 90, 99)
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _append_metric(lines, name, kind, help_text, value):
+    name = f"{PROMETHEUS_NAMESPACE}_{name}"
+    if help_text:
+        lines.append(f"# HELP {name} {_escape_help(help_text)}")
+    lines.append(f"# TYPE {name} {kind}")
+    if kind != HISTOGRAM:
+        lines.append(f"{name} {_format_value(value)}")
+        return
+
+    cumulative = 0
+    for bound, count in zip(value.bounds, value.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{le="+Inf"}} {value.count}')
+    lines.append(f"{name}_sum {_format_value(value.sum)}")
+    lines.append(f"{name}_count {value.count}")
+
+
+def render_prometheus(registry, system_data=None):
+    """把注册表中的指标和系统资源数据转换为Prometheus文本格式"""
+    lines = []
+    try:
+        from version import VERSION
+        lines.append(f"# TYPE {PROMETHEUS_NAMESPACE}_build_info gauge")
+        lines.append(f'{PROMETHEUS_NAMESPACE}_build_info{{version="{VERSION}"}} 1')
+    except ImportError:
+        pass
+
+    for metric in registry.metrics():
+        _append_metric(lines, metric.name, metric.kind, metric.help, metric.value())
+
+    if system_data:
+        for key, name, help_text in SYSTEM_METRICS:
+            if key in system_data:
+                _append_metric(lines, name, GAUGE, help_text, system_data[key])
+
+    lines.append("")
+    return "\n".join(lines)
+
+
+def build_json_snapshot(registry, snapshot, previous=None, system_data=None):
+    """生成JSON快照；提供上一次快照时附带两次快照之间的速率和分位数"""
+    elapsed = snapshot.time - previous.time if previous else 0.0
+    data = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "interval_seconds": round(elapsed, 3) if previous else None,
+        "system": {name: system_data[key] for key, name, _ in SYSTEM_METRICS if key in system_data}
+        if system_data else {},
+        "counters": {},
+        "rates": {},
+        "gauges": {},
+        "histograms": {},
+    }
+    try:
+        from version import VERSION
+        data["app_version"] = VERSION
+    except ImportError:
+        pass
+
+    kinds = {metric.name: metric.kind for metric in registry.metrics()}
+    for name, value in snapshot.values.items():
+        kind = kinds.get(name)
+        if kind == COUNTER:
+            data["counters"][name] = value
+            if previous and elapsed > 0:
+                data["rates"][name] = round(snapshot.rate(name, previous), 6)
+        elif kind == GAUGE:
+            data["gauges"][name] = None if isinstance(value, float) and math.isnan(value) else value
+        elif kind == HISTOGRAM and isinstance(value, HistogramSnapshot):
+            entry = {"count": value.count, "sum": value.sum}
+            older = previous.get(name) if previous else None
+            window = value - older if older is not None else value
+            entry["interval_count"] = window.count
+            for q in SNAPSHOT_PERCENTILES:
+                entry[f"p{q}"] = window.percentile(q)
+            data["histograms"][name] = entry
+    return data
+
+
+class MetricsExporter:
+    """指标导出器
+
+    根据设置启动或停止Prometheus接口和JSON快照线程，设置变更时自动重新应用。
+    """
+
+    def __init__(self, registry=None):
+        self.logger = get_logger("MetricsExporter")
+        self.registry = registry or get_metrics()
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+        self._server = None
+        self._server_thread = None
+        self._json_stop = None
+        self._json_config = None
+        self._prometheus_config = None
+        self._subscribed = False
+
+    def start(self, settings=None):
+        """按设置启动导出，并订阅设置变更"""
+        if settings is None:
+            from ui.settings.settings import get_settings
+            settings = get_settings()
+        if not self._subscribed:
+            settings.subscribe("metrics", lambda snapshot, changed: self.apply(snapshot))
+            self._subscribed = True
+        self.apply(settings)
+
+    def apply(self, settings):
+        """根据设置启动、重启或停止各导出方式，settings 可以是设置管理器或设置快照"""
+        prometheus_config = (
+            int(settings.get("metrics.prometheus_port", 0))
+            if settings.get("metrics.prometheus_enabled", False) else None
+        )
+        if prometheus_config != self._prometheus_config:
+            self._stop_prometheus()
+            if prometheus_config is not None:
+                self._start_prometheus(prometheus_config)
+
+        json_config = (
+            (settings.get("metrics.json_path", "") or None, max(float(settings.get("metrics.json_interval", 60)), 1.0))
+            if settings.get("metrics.json_enabled", False) else None
+        )
+        if json_config != self._json_config:
+            self._stop_json()
+            if json_config is not None:
+                self._start_json(*json_config)
+
+    def stop(self):
+        self._stop_prometheus()
+        self._stop_json()
+
+    def is_active(self):
+        return self._server is not None or self._json_stop is not None
+
+    def sample_system(self):
+        """采样一次系统资源，复用 SystemMonitor 的采集逻辑"""
+        with self._monitor_lock:
+            if self._monitor is None:
+                from core.system_monitor import SystemMonitor
+                self._monitor = SystemMonitor()
+            return self._monitor.sample()
+
+    def render_prometheus(self):
+        return render_prometheus(self.registry, self.sample_system())
+
+    def _start_prometheus(self, port):
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+        exporter = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                try:
+                    body = exporter.render_prometheus().encode("utf-8")
+                except Exception as e:
+                    exporter.logger.error(f"生成指标数据失败: {e}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                exporter.logger.debug(f"指标请求: {self.address_string()} {format % args}")
+
+        try:
+            server = HTTPServer((PROMETHEUS_HOST, port), _Handler)
+        except OSError as e:
+            self.logger.error(f"启动Prometheus指标接口失败（端口 {port}）: {e}")
+            return
+
+        # 没有请求时线程阻塞在 select 上，不定时唤醒；停止时由 _stop_prometheus 连接一次唤醒
+        server.timeout = None
+        self._server = server
+        self._prometheus_config = port
+        self._server_thread = threading.Thread(
+            target=self._serve, args=(server,), name="MetricsExporter", daemon=True
+        )
+        self._server_thread.start()
+        self.logger.info(f"Prometheus指标接口已启动: http://{PROMETHEUS_HOST}:{server.server_address[1]}/metrics")
+
+    def _serve(self, server):
+        while self._server is server:
+            try:
+                server.handle_request()
+            except Exception as e:
+                self.logger.error(f"处理指标请求时发生错误: {e}")
+
+    def _stop_prometheus(self):
+        server, self._server = self._server, None
+        self._prometheus_config = None
+        if server is None:
+            return
+
+        import socket
+        try:
+            socket.create_connection(server.server_address, timeout=1.0).close()
+        except OSError:
+            pass
+        if self._server_thread is not None:
+            self._server_thread.join(timeout=2.0)
+            self._server_thread = None
+        server.server_close()
+        self.logger.info("Prometheus指标接口已停止")
+
+    def _start_json(self, path, interval):
+        self._json_config = (path, interval)
+        path = path or os.path.join(get_log_dir(), "metrics.json")
+        stop_event = threading.Event()
+        self._json_stop = stop_event
+        thread = threading.Thread(
+            target=self._run_json, args=(stop_event, path, interval), name="MetricsSnapshot", daemon=True
+        )
+        thread.start()
+        self.logger.info(f"指标快照将每 {interval:g} 秒写入: {path}")
+
+    def _run_json(self, stop_event, path, interval):
+        from core.persistence import atomic_write_json
+
+        previous = None
+        self.sample_system()  # 以开始时刻为CPU占用率的基准
+        while not stop_event.wait(interval):
+            snapshot = self.registry.snapshot()
+            try:
+                data = build_json_snapshot(self.registry, snapshot, previous, self.sample_system())
+                atomic_write_json(path, data, indent=2)
+            except Exception as e:
+                self.logger.error(f"写入指标快照失败: {path}, {e}")
+            previous = snapshot
+
+    def _stop_json(self):
+        stop_event, self._json_stop = self._json_stop, None
+        self._json_config = None
+        if stop_event is not None:
+            stop_event.set()
+            self.logger.info("指标快照已停止")
+
+
+_exporter = None
+
+
+def get_metrics_exporter():
+    """获取全局指标导出器"""
+    global _exporter
+    if _exporter is None:
+        _exporter = MetricsExporter()
+    return _exporter
@@ -1,3 +1,4 @@
+import logging
 import math
 import sys
 import os
@@ -6,6 +7,18 @@ import numpy as np
 from numpy.linalg import svd, norm
 from core.logger import get_logger
 
+# 识别描述子（归一化并重采样后的路径）的点数
+DESCRIPTOR_POINTS = 64
+
+# 相似度评分参数，冲突分析（core.gesture_conflicts）和阈值校准使用同一组参数
+# 相似度 = 形状得分 × SHAPE_WEIGHT + 方向得分 × DIRECTION_WEIGHT
+SHAPE_WEIGHT = 0.55
+DIRECTION_WEIGHT = 0.45
+# 形状得分 = 1 - 平均点距 / SHAPE_SCALE（不低于0）
+SHAPE_SCALE = 175.0
+# 反向匹配（路径方向相反）的得分乘以该系数
+REVERSE_PENALTY = 0.25
+
 
 class PathAnalyzer:
     """路径分析器，用于格式化原始鼠标/触摸板绘制路径，并计算路径间的相似度"""
@@ -57,7 +70,7 @@ class PathAnalyzer:
                 )
                 for x, y in coords
             ]
-            self.logger.info(f"路径预处理缩放：从 {current_size:.1f}px 放大至 {target_size:.1f}px。")
+            self.logger.info("路径预处理缩放：从 %.1fpx 放大至 %.1fpx。", current_size, target_size)
             return scaled_coords
         
         return coords
@@ -121,40 +134,84 @@ class PathAnalyzer:
 
     def calculate_similarity(self, path1: Dict, path2: Dict) -> float:
         """计算两条格式化路径的相似度，结果范围 [0, 1]，值越大越相似"""
-        if not all([path1, path2, path1.get("points", []), path2.get("points", [])]) or \
-           len(path1["points"]) < 2 or len(path2["points"]) < 2:
+        pts1 = self.compute_descriptor(path1)
+        pts2 = self.compute_descriptor(path2)
+        if pts1 is None or pts2 is None:
             return 0.0
-        
+        return self.calculate_descriptor_similarity(pts1, pts2)
+
+    def compute_descriptor(self, path: Dict) -> np.ndarray | None:
+        """计算路径的识别描述子（归一化并重采样后的点），模板的描述子可以预先计算并重复使用"""
+        points = path.get("points") if isinstance(path, dict) else None
+        if not isinstance(points, (list, tuple, np.ndarray)) or len(points) < 2:
+            return None
         try:
-            pts1 = self._preprocess_for_comparison(path1)
-            pts2 = self._preprocess_for_comparison(path2)
-        except (ValueError, IndexError) as e:
+            return self._preprocess_for_comparison(path, resample_n=DESCRIPTOR_POINTS)
+        except (ValueError, IndexError, TypeError) as e:
             self.logger.error(f"路径预处理失败: {e}")
-            return 0.0
+            return None
 
-        if pts1 is None or pts2 is None:
-            return 0.0
-        
+    def calculate_descriptor_similarity(self, pts1: np.ndarray, pts2: np.ndarray) -> float:
+        """计算两个识别描述子的相似度，结果范围 [0, 1]"""
         shape_fwd, dir_fwd = self._compute_scores(pts1, pts2)
-        sim_forward = 0.55 * shape_fwd + 0.45 * dir_fwd
+        sim_forward = SHAPE_WEIGHT * shape_fwd + DIRECTION_WEIGHT * dir_fwd
 
         pts2_rev = np.flipud(pts2)
         shape_rev, dir_rev = self._compute_scores(pts1, pts2_rev)
-        sim_reverse_raw = 0.55 * shape_rev + 0.45 * dir_rev
-        REVERSE_PENALTY = 0.25
+        sim_reverse_raw = SHAPE_WEIGHT * shape_rev + DIRECTION_WEIGHT * dir_rev
         sim_reverse = sim_reverse_raw * REVERSE_PENALTY
         final_sim = max(sim_forward, sim_reverse)
         final_sim = np.clip(final_sim, 0.0, 1.0)
-        if final_sim > 0.1:
+        if final_sim > 0.1 and self.logger.isEnabledFor(logging.DEBUG):
             match_type = "Forward" if abs(final_sim - sim_forward) < 1e-6 else "Reverse (Penalized)"
             shape, direction = (shape_fwd, dir_fwd) if match_type == "Forward" else (shape_rev, dir_rev)
             self.logger.debug(
-                f"[Similarity] Match: {match_type}. Score: {final_sim:.3f} "
-                f"(Shape: {shape:.3f}, Dir: {direction:.3f})"
+                "[Similarity] Match: %s. Score: %.3f (Shape: %.3f, Dir: %.3f)",
+                match_type, final_sim, shape, direction
             )
             
         return float(final_sim)
 
+    def calculate_descriptor_similarities(self, pts: np.ndarray, templates: np.ndarray) -> np.ndarray:
+        """计算一个描述子与一组模板描述子（N × 点数 × 2）的相似度，结果与逐个调用
+        calculate_descriptor_similarity 相同，但对全部模板一次完成向量化计算"""
+        templates = np.asarray(templates, dtype=float)
+        if templates.shape[0] == 0:
+            return np.zeros(0)
+        shape_fwd, dir_fwd = self._compute_batch_scores(pts, templates)
+        shape_rev, dir_rev = self._compute_batch_scores(pts, templates[:, ::-1])
+        sim_forward = SHAPE_WEIGHT * shape_fwd + DIRECTION_WEIGHT * dir_fwd
+        sim_reverse = (SHAPE_WEIGHT * shape_rev + DIRECTION_WEIGHT * dir_rev) * REVERSE_PENALTY
+        return np.clip(np.maximum(sim_forward, sim_reverse), 0.0, 1.0)
+
+    def _compute_batch_scores(self, pts: np.ndarray, templates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """_compute_scores 的批量版本，二维Procrustes旋转直接由闭式解得到，不需要逐个做SVD"""
+        centered = pts - pts.mean(axis=0)
+        template_means = templates.mean(axis=1, keepdims=True)
+        templates_centered = templates - template_means
+
+        # 2×2 矩阵 C 的SVD得到的旋转角为 atan2(C01 - C10, C00 + C11)；_procrustes_align 中
+        # 乘的是这个旋转的转置，这里取相反的角度，保证得分与逐个计算完全一致
+        C = np.einsum("pi,npj->nij", centered, templates_centered)
+        theta = -np.arctan2(C[:, 0, 1] - C[:, 1, 0], C[:, 0, 0] + C[:, 1, 1])
+        cos = np.cos(theta)[:, None]
+        sin = np.sin(theta)[:, None]
+        aligned = np.stack(
+            (centered[:, 0] * cos - centered[:, 1] * sin, centered[:, 0] * sin + centered[:, 1] * cos), axis=2
+        ) + template_means
+
+        shape_dist = np.mean(norm(aligned - templates, axis=2), axis=1)
+        shape_score = np.maximum(0.0, 1.0 - shape_dist / SHAPE_SCALE)
+
+        vec1 = np.diff(aligned, axis=1)
+        vec2 = np.diff(templates, axis=1)
+        norm_vec1 = vec1 / (norm(vec1, axis=2, keepdims=True) + 1e-9)
+        norm_vec2 = vec2 / (norm(vec2, axis=2, keepdims=True) + 1e-9)
+        cosines = np.sum(norm_vec1 * norm_vec2, axis=2)
+        direction_score = np.mean(np.clip((cosines + 1) / 2, 0, 1), axis=1)
+
+        return shape_score, direction_score
+
     def _preprocess_for_comparison(self, path: Dict, target_size: int = 200, resample_n: int = 64) -> np.ndarray | None:
         """为相似度计算准备路径：归一化 + 重采样"""
         norm_path = self.normalize_path_scale(path, target_size)
@@ -181,8 +238,7 @@ class PathAnalyzer:
         """计算两条点集的形状得分和方向得分"""
         aligned_pts1 = self._procrustes_align(pts1, pts2)
         shape_dist = np.mean(norm(aligned_pts1 - pts2, axis=1))
-        shape_scale_boundary = 175.0
-        shape_score = max(0.0, 1.0 - shape_dist / shape_scale_boundary)
+        shape_score = max(0.0, 1.0 - shape_dist / SHAPE_SCALE)
 
         vec1 = np.diff(aligned_pts1, axis=0)
         vec2 = np.diff(pts2, axis=0)
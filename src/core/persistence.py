@@ -0,0 +1,343 @@
+"""
+配置文件持久化模块
+
+提供原子写入、后台防抖写入和配置文档缓存：
+- 原子写入：先写同目录下的临时文件并fsync，再用 os.replace 替换目标文件，
+  写入过程中崩溃只会留下临时文件，目标文件始终是完整的旧版本或新版本
+- 防抖写入：同一文件在短时间内的多次保存会被合并为一次，格式化和磁盘IO
+  都在后台线程完成，界面线程只复制一份数据作为快照
+- 文档缓存：JSON配置文件每次启动只读取和解析一次，设置、手势库和自检共用
+  同一份解析结果；文件的修改时间或大小变化后才重新读取
+"""
+
+import atexit
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from core.logger import get_logger
+
+# 最后一次保存请求之后等待的时间（秒），期间的新请求会被合并
+SAVE_DEBOUNCE_DELAY = 0.3
+# 连续保存时最长的等待时间（秒），避免频繁保存导致一直不写盘
+SAVE_MAX_DELAY = 2.0
+
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    """原子写入文本文件"""
+    atomic_write_bytes(path, text.encode(encoding))
+
+
+def atomic_write_bytes(path, data):
+    """原子写入二进制文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+    if hasattr(os, "O_DIRECTORY"):
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+
+def atomic_write_json(path, data, indent=4):
+    """原子写入JSON文件，格式与原先的 json.dump(indent=4, ensure_ascii=False) 一致"""
+    atomic_write_text(path, json.dumps(data, indent=indent, ensure_ascii=False))
+
+
+class DebouncedWriter:
+    """后台防抖写入器
+
+    每个路径只保留最新的一次保存请求，在最后一次请求 SAVE_DEBOUNCE_DELAY 秒后
+    （最长不超过首次请求后 SAVE_MAX_DELAY 秒）由后台线程原子写入。
+    """
+
+    def __init__(self, delay=SAVE_DEBOUNCE_DELAY, max_delay=SAVE_MAX_DELAY):
+        self.logger = get_logger("Persistence")
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending = {}
+        self._writing = set()
+        self._errors = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, path, render, on_written=None):
+        """提交保存请求
+
+        Args:
+            path: 目标文件路径
+            render: 无参可调用对象，在后台线程中调用，返回要写入的文本或字节
+            on_written: 可选，写入成功后在后台线程中调用的无参可调用对象；
+                请求被同一路径的新请求替换时不会调用
+        """
+        now = time.monotonic()
+        with self._condition:
+            previous = self._pending.get(path)
+            first_time = previous[2] if previous else now
+            deadline = min(now + self.delay, first_time + self.max_delay)
+            self._pending[path] = (render, deadline, first_time, on_written)
+            self._ensure_thread()
+            self._condition.notify_all()
+
+    def submit_json(self, path, data, on_written=None):
+        """提交JSON保存请求
+
+        在调用线程上深拷贝 data 作为快照，之后调用方可以继续修改 data；
+        序列化只在后台线程做一次。
+        """
+        snapshot = copy.deepcopy(data)
+        self.submit(path, lambda: json.dumps(snapshot, indent=4, ensure_ascii=False), on_written)
+
+    def flush(self, path=None, timeout=10.0):
+        """立即写入等待中的请求并等待完成，path为None时写入全部文件
+
+        读取文件之前应先调用，保证读到的是最新保存的内容。超时或文件最近一次写入
+        失败时返回False，失败原因可以通过 get_errors() 获取。
+        """
+        end = time.monotonic() + timeout
+        with self._condition:
+            now = time.monotonic()
+            for key, (render, _deadline, first_time, on_written) in list(self._pending.items()):
+                if path is None or key == path:
+                    self._pending[key] = (render, now, first_time, on_written)
+            self._condition.notify_all()
+
+            while self._has_work(path):
+                remaining = end - time.monotonic()
+                if remaining <= 0 or self._thread is None:
+                    return False
+                self._condition.wait(remaining)
+            return not self._get_errors(path)
+
+    def get_errors(self, path=None):
+        """返回最近一次写入失败的文件及原因 {路径: 错误信息}，path为None时返回全部文件
+
+        文件之后写入成功时清除对应的记录。
+        """
+        with self._condition:
+            return self._get_errors(path)
+
+    def _get_errors(self, path):
+        if path is None:
+            return dict(self._errors)
+        return {path: self._errors[path]} if path in self._errors else {}
+
+    def has_pending(self, path=None):
+        with self._condition:
+            return self._has_work(path)
+
+    def stop(self):
+        """写入全部等待中的请求并停止后台线程"""
+        self.flush()
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def _has_work(self, path):
+        if path is None:
+            return bool(self._pending or self._writing)
+        return path in self._pending or path in self._writing
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="DebouncedWriter", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped and not self._pending:
+                        return
+                    now = time.monotonic()
+                    due = [key for key, job in self._pending.items() if job[1] <= now]
+                    if due:
+                        break
+                    timeout = min((job[1] for job in self._pending.values()), default=None)
+                    self._condition.wait(None if timeout is None else max(0.0, timeout - now))
+
+                jobs = []
+                for key in due:
+                    render, _deadline, _first_time, on_written = self._pending.pop(key)
+                    jobs.append((key, render, on_written))
+                self._writing.update(key for key, _, _ in jobs)
+
+            for path, render, on_written in jobs:
+                try:
+                    data = render()
+                    if isinstance(data, bytes):
+                        atomic_write_bytes(path, data)
+                    else:
+                        atomic_write_text(path, data)
+                except Exception as e:
+                    self.logger.error(f"写入文件失败: {path}, {e}")
+                    with self._condition:
+                        self._errors[path] = str(e)
+                else:
+                    with self._condition:
+                        self._errors.pop(path, None)
+                    if on_written is not None:
+                        try:
+                            on_written()
+                        except Exception as e:
+                            self.logger.error(f"写入完成回调执行失败: {path}, {e}")
+                finally:
+                    with self._condition:
+                        self._writing.discard(path)
+                        self._condition.notify_all()
+
+
+class ConfigDocument:
+    """一次读取的JSON配置文件
+
+    data 是解析结果，由多个使用者共用，不能原地修改：需要修改的使用者应先复制，
+    或者只替换其中的条目。文件不存在时 exists 为False；解析失败时 data 为None，
+    error 为错误信息，content 保留原始字节用于备份。
+    """
+
+    __slots__ = ("path", "data", "error", "content", "fingerprint", "_stat")
+
+    def __init__(self, path, data=None, error=None, content=None, fingerprint=None, stat=None):
+        self.path = path
+        self.data = data
+        self.error = error
+        self.content = content
+        self.fingerprint = fingerprint
+        self._stat = stat
+
+    @property
+    def exists(self):
+        return self.fingerprint is not None
+
+
+def _fingerprint(content, stat):
+    return {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": hashlib.sha256(content).hexdigest(),
+    }
+
+
+def file_fingerprint(path):
+    """计算非JSON文件（如二进制手势库）的指纹，格式与 ConfigDocument.fingerprint 相同，文件不存在时返回None"""
+    try:
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    return _fingerprint(content, stat)
+
+
+class DocumentCache:
+    """配置文档缓存
+
+    get() 先检查文件的修改时间和大小，与缓存一致时直接返回缓存的文档，
+    否则重新读取和解析。可以在多个线程中使用。
+    """
+
+    def __init__(self):
+        self.logger = get_logger("Persistence")
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """获取文档，文件未变化时不读取文件"""
+        path = str(path)
+        try:
+            stat = os.stat(path)
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stat_key = None
+
+        with self._lock:
+            document = self._documents.get(path)
+            if document is not None and document._stat == stat_key:
+                return document
+
+            document = self._read(path) if stat_key is not None else ConfigDocument(path)
+            self._documents[path] = document
+            return document
+
+    def put(self, path, data, content):
+        """记录刚写入文件的内容，之后的 get() 直接返回 data 而不再读取文件"""
+        path = str(path)
+        stat = os.stat(path)
+        with self._lock:
+            self._documents[path] = ConfigDocument(
+                path, data=data, fingerprint=_fingerprint(content, stat),
+                stat=(stat.st_mtime_ns, stat.st_size),
+            )
+
+    def invalidate(self, path=None):
+        """丢弃缓存，path为None时丢弃全部文档"""
+        with self._lock:
+            if path is None:
+                self._documents.clear()
+            else:
+                self._documents.pop(str(path), None)
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            content = f.read()
+        fingerprint = _fingerprint(content, stat)
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        try:
+            data = json.loads(content.decode("utf-8"))
+        except ValueError as e:
+            return ConfigDocument(path, error=str(e), content=content, fingerprint=fingerprint, stat=stat_key)
+        self.logger.debug(f"已读取配置文件: {path}")
+        return ConfigDocument(path, data=data, fingerprint=fingerprint, stat=stat_key)
+
+
+def write_document(path, data, indent=4):
+    """原子写入JSON文件并更新文档缓存"""
+    content = json.dumps(data, indent=indent, ensure_ascii=False).encode("utf-8")
+    atomic_write_bytes(path, content)
+    _documents.put(path, data, content)
+
+
+_writer = DebouncedWriter()
+_documents = DocumentCache()
+
+
+def get_writer():
+    """获取全局防抖写入器"""
+    return _writer
+
+
+def get_documents():
+    """获取全局配置文档缓存"""
+    return _documents
+
+
+atexit.register(_writer.stop)
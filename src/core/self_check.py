@@ -1,8 +1,11 @@
 import base64
 import copy
+import hashlib
+import itertools
 import json
 import os
 import sys
+import threading
 import traceback
 from pathlib import Path
 from typing import Dict, Any, List, Tuple, Optional
@@ -12,35 +15,384 @@ src_dir = current_dir.parent
 if str(src_dir) not in sys.path:
     sys.path.insert(0, str(src_dir))
 
-from core.logger import get_logger
+from qtpy.QtCore import QObject, Signal
+
+from core.gesture_pack import PACK_SUFFIX, GesturePackError, encode_pack, read_pack
+from core.logger import _parse_level, get_logger
+from core.path_analyzer import DESCRIPTOR_POINTS
+from core.persistence import atomic_write_bytes, file_fingerprint, get_documents, get_writer, write_document
 from ui.gestures.gestures import get_gesture_library
 from ui.settings.settings import get_settings
 
+# 检查逻辑变化时递增，使旧的检查记录失效
+SELF_CHECK_VERSION = 3
+STATE_FILE_NAME = "self_check_state.json"
+
+
+def _fingerprint_matches(fingerprint: Optional[Dict], recorded: Optional[Dict]) -> bool:
+    """文件指纹是否与记录的指纹一致，只比较大小和内容哈希"""
+    if fingerprint is None or recorded is None:
+        return fingerprint is None and recorded is None
+    return fingerprint["size"] == recorded.get("size") and fingerprint["sha256"] == recorded.get("sha256")
+
+
+_MISSING = object()
+_SECTIONS = ("trigger_paths", "execute_actions", "gesture_mappings")
+_VALID_CONNECTION_TYPES = frozenset(("line", "curve", "arc"))
+_DEFAULT_CONNECTION = {"from": 0, "to": 1, "type": "line"}
+
+
+def _is_log_level(value) -> bool:
+    return isinstance(value, (str, int)) and not isinstance(value, bool) and _parse_level(value) is not None
+
+
+# 键由用户自由添加的设置部分 -> 值的校验函数；只删除值无效的键，默认设置中没有的键予以保留
+_FREE_FORM_SETTINGS = {
+    "logging.levels": _is_log_level,
+}
+
+
+def _is_str(value) -> bool:
+    return isinstance(value, str)
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int)
+
+
+def _to_int_or_one(value) -> int:
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 1
+
+
+# 条目字段规则：(字段, 检查函数, 缺失时的值, 类型错误时的值, 缺失时的修复说明, 类型错误时的修复说明)
+# 值函数的参数为 (条目键, 原值, 默认样例)；trigger_paths 的 path 字段结构较深，单独处理
+_ENTRY_RULES = {
+    "trigger_paths": (
+        ("name", _is_str,
+         lambda key, value, sample: f"路径{key}",
+         lambda key, value, sample: f"路径{key}",
+         "修复trigger_paths[{key}].name", "修复trigger_paths[{key}].name"),
+    ),
+    "execute_actions": tuple(
+        (field, _is_str,
+         lambda key, value, sample, field=field: sample.get(field, ""),
+         (lambda key, value, sample: f"操作{key}") if field == "name" else (lambda key, value, sample: str(value)),
+         "添加execute_actions[{key}].{field}", "修复execute_actions[{key}].{field}类型")
+        for field in ("name", "type", "value")
+    ),
+    "gesture_mappings": (
+        ("name", _is_str,
+         lambda key, value, sample: f"手势{key}",
+         lambda key, value, sample: f"手势{key}",
+         "添加gesture_mappings[{key}].{field}", "修复gesture_mappings[{key}].{field}类型"),
+    ) + tuple(
+        (field, _is_int,
+         lambda key, value, sample: 1,
+         lambda key, value, sample: _to_int_or_one(value),
+         "添加gesture_mappings[{key}].{field}", "修复gesture_mappings[{key}].{field}类型")
+        for field in ("trigger_path_id", "execute_action_id")
+    ),
+}
+_REFERENCE_FIELDS = (("trigger_path_id", "trigger_paths"), ("execute_action_id", "execute_actions"))
+
+
+class _GestureValidator:
+    """手势库单遍校验器
+
+    按 触发路径 -> 执行操作 -> 手势映射 的顺序只遍历一次条目，结构、类型和引用
+    检查都在这一遍中完成；映射的引用在遍历映射时对照已检查过的路径和操作。
+    采用写时复制：没有问题的字典和列表原样复用，只在发现问题时复制被修改的层级，
+    完全没有问题时返回原对象。只有键的顺序不同不算问题。
+    """
+
+    def __init__(self, default_data: Dict, repairs: List[str]):
+        self.default_data = default_data
+        self.repairs = repairs
+        self.samples = {
+            section: next(iter(default_data[section].values()))
+            for section in _SECTIONS
+            if isinstance(default_data.get(section), dict) and default_data[section]
+        }
+
+    def validate(self, user_data: Any) -> Dict:
+        if not isinstance(user_data, dict):
+            self.repairs.append("修复手势库整体格式")
+            user_data, changed = {}, True
+        else:
+            changed = False
+        
+        sections = {}
+        for section in self.default_data:
+            value = user_data.get(section, _MISSING)
+            if value is _MISSING:
+                self.repairs.append(f"添加缺失的手势库主键: {section}")
+                value, changed = {}, True
+            elif not isinstance(value, dict):
+                self.repairs.append(f"修复手势库主键类型: {section}")
+                value, changed = {}, True
+            sections[section] = value
+        
+        for key in user_data:
+            if key not in self.default_data:
+                self.repairs.append(f"删除无效的手势库主键: {key}")
+                changed = True
+        
+        # 映射的引用对照重新编号之前的路径和操作检查，再按 key_maps 更新为新编号
+        checked_sections = {}
+        key_maps = {}
+        for section in _SECTIONS:
+            if section not in sections:
+                continue
+            checked = self._validate_section(section, sections[section], checked_sections, key_maps)
+            checked_sections[section] = checked
+            validated, key_maps[section] = self._renumber(section, checked)
+            if validated is not sections[section]:
+                sections[section] = validated
+                changed = True
+        
+        return sections if changed else user_data
+
+    def _validate_section(self, section: str, entries: Dict, checked_sections: Dict, key_maps: Dict) -> Dict:
+        sample = self.samples.get(section)
+        if sample is None:
+            # 默认数据中没有样例时不检查条目
+            return entries
+        
+        result = None
+        next_id = None
+        for index, (key, entry) in enumerate(entries.items()):
+            new_key = key
+            if not key.isdigit():
+                if next_id is None:
+                    next_id = max((int(k) for k in entries if k.isdigit()), default=0) + 1
+                new_key = str(next_id)
+                next_id += 1
+                self.repairs.append(f"修复{section}键格式: {key} -> {new_key}")
+            
+            new_entry = self._validate_entry(section, new_key, entry, sample)
+            if section == "gesture_mappings":
+                new_entry = self._check_references(new_key, new_entry, entry, checked_sections, key_maps)
+            
+            if result is None and (new_key != key or new_entry is not entry):
+                result = dict(itertools.islice(entries.items(), index))
+            if result is not None and new_entry is not None:
+                result[new_key] = new_entry
+        
+        return result if result is not None else entries
+
+    def _validate_entry(self, section: str, key: str, entry: Any, sample: Dict) -> Dict:
+        if not isinstance(entry, dict):
+            self.repairs.append(f"修复{section}[{key}]整体格式")
+            return copy.deepcopy(sample)
+        
+        fixed = None
+        for field, check, fix_missing, fix_invalid, missing_message, invalid_message in _ENTRY_RULES[section]:
+            value = entry.get(field, _MISSING)
+            if value is _MISSING:
+                new_value, message = fix_missing(key, value, sample), missing_message
+            elif check(value):
+                continue
+            else:
+                new_value, message = fix_invalid(key, value, sample), invalid_message
+            if fixed is None:
+                fixed = dict(entry)
+            fixed[field] = new_value
+            self.repairs.append(message.format(key=key, field=field))
+        
+        if section == "trigger_paths":
+            path = entry.get("path")
+            if not isinstance(path, dict):
+                new_path = copy.deepcopy(sample["path"])
+                self.repairs.append(f"修复trigger_paths[{key}].path")
+            else:
+                new_path = self._validate_path(key, path, sample["path"])
+            if new_path is not path:
+                if fixed is None:
+                    fixed = dict(entry)
+                fixed["path"] = new_path
+        
+        return fixed if fixed is not None else entry
+
+    def _validate_path(self, key: str, path: Dict, default_path: Dict) -> Dict:
+        fixed = None
+        if not isinstance(path.get("points"), list):
+            fixed = dict(path)
+            fixed["points"] = copy.deepcopy(default_path["points"])
+            self.repairs.append(f"修复trigger_paths[{key}].path.points")
+        
+        connections = path.get("connections")
+        if not isinstance(connections, list):
+            new_connections = copy.deepcopy(default_path["connections"])
+            self.repairs.append(f"修复trigger_paths[{key}].path.connections")
+        else:
+            new_connections = None
+            for i, connection in enumerate(connections):
+                new_connection = self._validate_connection(key, i, connection)
+                if new_connection is not connection:
+                    if new_connections is None:
+                        new_connections = list(connections)
+                    new_connections[i] = new_connection
+        
+        if new_connections is not None:
+            if fixed is None:
+                fixed = dict(path)
+            fixed["connections"] = new_connections
+        return fixed if fixed is not None else path
+
+    def _validate_connection(self, key: str, index: int, connection: Any) -> Dict:
+        prefix = f"修复trigger_paths[{key}].path.connections[{index}]"
+        if not isinstance(connection, dict):
+            self.repairs.append(f"{prefix}格式")
+            return dict(_DEFAULT_CONNECTION)
+        
+        fixed = None
+        for field, valid, default in (
+            ("type", connection.get("type") in _VALID_CONNECTION_TYPES, "line"),
+            ("from", isinstance(connection.get("from"), int), 0),
+            ("to", isinstance(connection.get("to"), int), 1),
+        ):
+            if not valid:
+                if fixed is None:
+                    fixed = dict(connection)
+                fixed[field] = default
+                self.repairs.append(f"{prefix}.{field}")
+        return fixed if fixed is not None else connection
+
+    def _check_references(self, key: str, entry: Dict, original: Any, checked_sections: Dict, key_maps: Dict) -> Optional[Dict]:
+        """检查映射引用的路径和操作是否存在，并按重新编号的结果更新引用；返回None表示删除映射"""
+        for field, target_section in _REFERENCE_FIELDS:
+            target = checked_sections.get(target_section, {})
+            target_id = entry.get(field)
+            new_id = target_id
+            
+            if target_id is not None and str(target_id) not in target:
+                if not target:
+                    self.repairs.append(f"删除无效的gesture_mappings[{key}]（无可用的{target_section[:-1]}）")
+                    return None
+                new_id = int(next(iter(target)))
+                self.repairs.append(f"修复gesture_mappings[{key}].{field}引用: {target_id} -> {new_id}")
+            
+            renumbered_id = key_maps.get(target_section, {}).get(new_id, new_id)
+            if renumbered_id != new_id:
+                self.repairs.append(f"更新gesture_mappings[{key}].{field}: {new_id} -> {renumbered_id}")
+            
+            if renumbered_id != target_id:
+                if entry is original:
+                    entry = dict(entry)
+                entry[field] = renumbered_id
+        return entry
+
+    def _renumber(self, section: str, entries: Dict) -> Tuple[Dict, Dict]:
+        """键不是从1开始的连续编号时重新编号，返回 (条目, {旧编号: 新编号})"""
+        count = len(entries)
+        canonical = all(
+            key.isdigit() and 1 <= int(key) <= count and str(int(key)) == key
+            for key in entries
+        )
+        if canonical:
+            return entries, {}
+        
+        ordered = sorted(entries.items(), key=lambda item: int(item[0]) if item[0].isdigit() else 0)
+        renumbered = {}
+        key_map = {}
+        for new_id, (old_key, entry) in enumerate(ordered, 1):
+            renumbered[str(new_id)] = entry
+            if old_key != str(new_id):
+                old_id = int(old_key)
+                key_map[old_id] = new_id
+                self.repairs.append(f"重新排序{section}: {old_key} -> {new_id}")
+        self.repairs.append(f"修复{section}序号连续性")
+        return renumbered, key_map
+
 
 class SelfChecker:
+    """配置文件自检器
+
+    检查分为两步：collect() 只计算需要的修复，可以在后台线程运行；apply() 写入修复
+    并让手势库和设置重新加载，必须在界面线程运行。检查通过后记录文件指纹和检查规则
+    版本，下次启动时文件未变化即可跳过（is_up_to_date）。
+
+    检查的是手势库和设置加载时已经解析过的文档（见 core.persistence.get_documents），
+    修复写入后更新文档缓存，手势库和设置重新加载时直接使用修复后的数据，不再读取文件。
+    """
+
     def __init__(self):
         self.logger = get_logger("SelfChecker")
         self.errors = []
         self.warnings = []
         self.repairs = []
         self.corrupted_data = []
+        self.pending_repairs = []
         
         self.src_dir = Path(__file__).parent.parent
         self.gestures_dir = self.src_dir / "ui" / "gestures"
         self.settings_dir = self.src_dir / "ui" / "settings"
 
+        self.gesture_library = get_gesture_library()
+        self.settings = get_settings()
+        if self.gesture_library.library_format == "pack":
+            self.gestures_file = Path(self.gesture_library.pack_file)
+        else:
+            self.gestures_file = Path(self.gesture_library.gestures_file)
+        self.settings_file = Path(self.settings.settings_file)
+        self.state_file = self.settings_file.parent / STATE_FILE_NAME
+        self.documents = get_documents()
+        self._schema = None
+        # 检查期间在后台线程计算的二进制文件指纹，记录检查状态时按修改时间和大小复用
+        self._pack_fingerprints = {}
+
     def run_full_check(self) -> bool:
+        """在当前线程完成检查和修复"""
+        self.collect()
+        return self.apply()
+
+    def collect(self):
+        """读取并检查配置文件，把需要写入的修复记录到 pending_repairs，不修改任何文件"""
         self.logger.info("开始程序自检...")
         
         try:
             self._check_and_repair_gestures()
             self._check_and_repair_settings()
+        except Exception as e:
+            self.errors.append(f"自检过程中发生异常: {e}")
+            self.logger.error(traceback.format_exc())
+
+    def apply(self) -> bool:
+        """写入修复、重新加载数据并输出结果，返回是否通过
+
+        检查期间数据有未保存的修改或等待写入的保存请求时跳过修复：重新加载会丢弃未保存的修改，
+        等待中的保存请求会在重新加载前写入并覆盖修复。跳过修复时不记录检查状态，下次启动重新检查。
+        """
+        try:
+            skipped = False
+            for file_path, data, data_type, fingerprint, target, reset in self.pending_repairs:
+                if target.has_changes() or get_writer().has_pending(str(file_path)):
+                    self.warnings.append(f"{data_type}在自检期间被修改且尚未写入，跳过修复: {file_path}")
+                    skipped = True
+                    continue
+                if not _fingerprint_matches(self._fingerprint(file_path, fingerprint), fingerprint):
+                    self.warnings.append(f"{data_type}文件在自检期间被修改，跳过修复: {file_path}")
+                    skipped = True
+                    continue
+                
+                if reset:
+                    self._backup_and_reset(file_path, data, data_type)
+                else:
+                    self._save_repaired_data(file_path, data, data_type)
+                target.load()
+                self.logger.info(f"已重新加载{data_type}")
+            
             self._output_check_results()
             
             if self.errors:
                 self.logger.error(f"自检发现 {len(self.errors)} 个错误")
                 return False
             
+            if not skipped:
+                self._record_state()
             self.logger.info("自检完成，所有检查通过")
             return True
             
@@ -49,18 +401,90 @@ class SelfChecker:
             self.logger.error(traceback.format_exc())
             return False
 
+    def _checked_files(self) -> List[Path]:
+        return [self.gestures_file, self.settings_file]
+
+    def _fingerprint(self, file_path: Path, known: Optional[Dict] = None) -> Optional[Dict]:
+        """获取文件指纹
+
+        JSON文件的指纹来自文档缓存。二进制手势库不经过文档缓存，修改时间和大小与 known
+        （或本次检查计算过的指纹）一致时直接复用，否则读取文件计算内容哈希。
+        """
+        if file_path.suffix != PACK_SUFFIX:
+            return self.documents.get(file_path).fingerprint
+        known = known or self._pack_fingerprints.get(str(file_path))
+        if known is not None:
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                return None
+            if (stat.st_mtime_ns, stat.st_size) == (known.get("mtime_ns"), known.get("size")):
+                return known
+        return file_fingerprint(file_path)
+
+    def _schema_version(self) -> str:
+        """检查规则版本：检查器版本号和默认文件内容的哈希，默认结构变化时重新检查"""
+        if self._schema is None:
+            digest = hashlib.sha256(str(SELF_CHECK_VERSION).encode())
+            for default_file in (self.gestures_dir / "default_gestures.json", self.settings_dir / "default_settings.json"):
+                try:
+                    fingerprint = self.documents.get(default_file).fingerprint
+                except OSError:
+                    fingerprint = None
+                digest.update(fingerprint["sha256"].encode() if fingerprint else b"missing")
+            self._schema = digest.hexdigest()
+        return self._schema
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def is_up_to_date(self) -> bool:
+        """上次检查通过后，配置文件和检查规则都没有变化时返回True"""
+        state = self._load_state()
+        if state.get("schema") != self._schema_version():
+            return False
+        
+        files = state.get("files")
+        if not isinstance(files, dict):
+            return False
+        try:
+            return all(
+                _fingerprint_matches(
+                    self._fingerprint(file_path, files.get(str(file_path))), files.get(str(file_path))
+                )
+                for file_path in self._checked_files()
+            )
+        except OSError:
+            return False
+
+    def _record_state(self):
+        """记录本次检查通过时的文件指纹"""
+        try:
+            files = {}
+            for file_path in self._checked_files():
+                get_writer().flush(str(file_path))
+                files[str(file_path)] = self._fingerprint(file_path)
+            
+            get_writer().submit_json(str(self.state_file), {"schema": self._schema_version(), "files": files})
+        except OSError as e:
+            self.logger.warning(f"记录自检状态失败: {e}")
+
     def _load_default_data(self, file_path: Path, data_type: str) -> Optional[Dict]:
         try:
-            if not file_path.exists():
+            document = self.documents.get(file_path)
+            if not document.exists:
                 self.errors.append(f"默认{data_type}文件不存在: {file_path}")
                 return None
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            if document.error:
+                self.errors.append(f"默认{data_type}文件JSON格式错误: {document.error}")
+                return None
+            return document.data
                 
-        except json.JSONDecodeError as e:
-            self.errors.append(f"默认{data_type}文件JSON格式错误: {e}")
-            return None
         except Exception as e:
             self.errors.append(f"读取默认{data_type}文件时出错: {e}")
             return None
@@ -73,313 +497,62 @@ class SelfChecker:
         if not default_data:
             return
         
-        gesture_lib = get_gesture_library()
-        user_file = Path(gesture_lib.gestures_file)
+        user_file = self.gestures_file
         
         if not user_file.exists():
             self.logger.debug("用户手势库不存在，将使用默认手势库")
             return
         
+        if user_file.suffix == PACK_SUFFIX:
+            self._check_and_repair_pack(user_file, default_data)
+            return
+        
         try:
-            with open(user_file, 'r', encoding='utf-8') as f:
-                user_data = json.load(f)
+            document = self.documents.get(user_file)
+            fingerprint = document.fingerprint
+            if document.error:
+                self.warnings.append(f"用户手势库JSON格式错误: {document.error}")
+                self._backup_corrupted_file(user_file, "手势库", document.content)
+                self.pending_repairs.append((user_file, default_data, "手势库", fingerprint, self.gesture_library, True))
+                return
+            user_data = document.data
             
             repaired_data = self._repair_gesture_data(user_data, default_data)
             
-            if repaired_data != user_data:
-                self._save_repaired_data(user_file, repaired_data, "手势库")
-                gesture_lib.load()
-                gesture_lib.save()
-                self.logger.info("已重新加载并保存手势库")
+            if repaired_data is not user_data:
+                self.pending_repairs.append((user_file, repaired_data, "手势库", fingerprint, self.gesture_library, False))
                 
-        except json.JSONDecodeError as e:
-            self.warnings.append(f"用户手势库JSON格式错误: {e}")
-            self._backup_and_reset(user_file, default_data, "手势库")
-            gesture_lib.load()
-            gesture_lib.save()
-            self.logger.info("已重新加载并保存重置的手势库")
         except Exception as e:
             self.warnings.append(f"检查用户手势库时出错: {e}")
 
-    def _repair_gesture_data(self, user_data: Dict, default_data: Dict) -> Dict:
-        repaired = copy.deepcopy(user_data)
-        
-        # 1. 检查和修复主键结构
-        for main_key in default_data:
-            if main_key not in repaired:
-                repaired[main_key] = {}
-                self.repairs.append(f"添加缺失的手势库主键: {main_key}")
-            
-            if not isinstance(repaired[main_key], dict):
-                repaired[main_key] = {}
-                self.repairs.append(f"修复手势库主键类型: {main_key}")
-        
-        for key in list(repaired.keys()):
-            if key not in default_data:
-                del repaired[key]
-                self.repairs.append(f"删除无效的手势库主键: {key}")
-        
-        # 2. 检查和修复各部分的详细格式
-        repaired = self._repair_trigger_paths(repaired, default_data)
-        repaired = self._repair_execute_actions(repaired, default_data)
-        repaired = self._repair_gesture_mappings(repaired, default_data)
-        
-        # 3. 检查和修复引用完整性
-        repaired = self._repair_reference_integrity(repaired)
-        
-        # 4. 检查和修复顺序
-        repaired = self._repair_data_order(repaired)
-        
-        return repaired
+    def _check_and_repair_pack(self, user_file: Path, default_data: Dict):
+        """按JSON格式的规则检查二进制手势库的内容；文件结构已在手势库加载时校验
 
-    def _repair_trigger_paths(self, user_data: Dict, default_data: Dict) -> Dict:
-        if "trigger_paths" not in default_data or not default_data["trigger_paths"]:
-            return user_data
-        
-        default_sample = next(iter(default_data["trigger_paths"].values()))
-        trigger_paths = user_data["trigger_paths"]
-        
-        for path_key, path_data in list(trigger_paths.items()):
-            # 检查键格式（应为数字字符串）
-            if not path_key.isdigit():
-                new_key = str(len(trigger_paths) + 1)
-                trigger_paths[new_key] = trigger_paths.pop(path_key)
-                self.repairs.append(f"修复trigger_paths键格式: {path_key} -> {new_key}")
-                path_key = new_key
-                path_data = trigger_paths[path_key]
-            
-            # 检查必要字段
-            if not isinstance(path_data, dict):
-                trigger_paths[path_key] = copy.deepcopy(default_sample)
-                self.repairs.append(f"修复trigger_paths[{path_key}]整体格式")
-                continue
-            
-            # 检查name字段
-            if "name" not in path_data or not isinstance(path_data["name"], str):
-                path_data["name"] = f"路径{path_key}"
-                self.repairs.append(f"修复trigger_paths[{path_key}].name")
-            
-            # 检查path字段
-            if "path" not in path_data or not isinstance(path_data["path"], dict):
-                path_data["path"] = copy.deepcopy(default_sample["path"])
-                self.repairs.append(f"修复trigger_paths[{path_key}].path")
+        优先复用手势库加载时的解码结果，文件之后被重新写入过才重新读取。
+        """
+        try:
+            fingerprint = file_fingerprint(user_file)
+            self._pack_fingerprints[str(user_file)] = fingerprint
+            loaded = self.gesture_library.take_loaded_pack()
+            if loaded is not None and fingerprint and loaded[0] == (fingerprint["mtime_ns"], fingerprint["size"]):
+                user_data = loaded[1]
             else:
-                path_data["path"] = self._repair_path_structure(path_data["path"], default_sample["path"], path_key)
-        
-        return user_data
-
-    def _repair_path_structure(self, path_data: Dict, default_path: Dict, path_key: str) -> Dict:
-        # 检查points字段
-        if "points" not in path_data or not isinstance(path_data["points"], list):
-            path_data["points"] = copy.deepcopy(default_path["points"])
-            self.repairs.append(f"修复trigger_paths[{path_key}].path.points")
-        
-        # 检查connections字段
-        if "connections" not in path_data or not isinstance(path_data["connections"], list):
-            path_data["connections"] = copy.deepcopy(default_path["connections"])
-            self.repairs.append(f"修复trigger_paths[{path_key}].path.connections")
-        else:
-            # 检查连线类型
-            valid_types = {"line", "curve", "arc"}  # 允许的连线类型
-            for i, connection in enumerate(path_data["connections"]):
-                if not isinstance(connection, dict):
-                    path_data["connections"][i] = {"from": 0, "to": 1, "type": "line"}
-                    self.repairs.append(f"修复trigger_paths[{path_key}].path.connections[{i}]格式")
-                    continue
-                
-                # 检查连线类型
-                if "type" not in connection or connection["type"] not in valid_types:
-                    connection["type"] = "line"
-                    self.repairs.append(f"修复trigger_paths[{path_key}].path.connections[{i}].type")
-                
-                # 检查from和to字段
-                if "from" not in connection or not isinstance(connection["from"], int):
-                    connection["from"] = 0
-                    self.repairs.append(f"修复trigger_paths[{path_key}].path.connections[{i}].from")
-                
-                if "to" not in connection or not isinstance(connection["to"], int):
-                    connection["to"] = 1
-                    self.repairs.append(f"修复trigger_paths[{path_key}].path.connections[{i}].to")
-        
-        return path_data
-
-    def _repair_execute_actions(self, user_data: Dict, default_data: Dict) -> Dict:
-        if "execute_actions" not in default_data or not default_data["execute_actions"]:
-            return user_data
-        
-        default_sample = next(iter(default_data["execute_actions"].values()))
-        execute_actions = user_data["execute_actions"]
-        
-        for action_key, action_data in list(execute_actions.items()):
-            # 检查键格式（应为数字字符串）
-            if not action_key.isdigit():
-                new_key = str(len(execute_actions) + 1)
-                execute_actions[new_key] = execute_actions.pop(action_key)
-                self.repairs.append(f"修复execute_actions键格式: {action_key} -> {new_key}")
-                action_key = new_key
-                action_data = execute_actions[action_key]
-            
-            # 检查必要字段
-            if not isinstance(action_data, dict):
-                execute_actions[action_key] = copy.deepcopy(default_sample)
-                self.repairs.append(f"修复execute_actions[{action_key}]整体格式")
-                continue
-            
-            # 检查各个字段
-            required_fields = ["name", "type", "value"]
-            for field in required_fields:
-                if field not in action_data:
-                    action_data[field] = default_sample.get(field, "")
-                    self.repairs.append(f"添加execute_actions[{action_key}].{field}")
-                elif field == "name" and not isinstance(action_data[field], str):
-                    action_data[field] = f"操作{action_key}"
-                    self.repairs.append(f"修复execute_actions[{action_key}].{field}类型")
-                elif field in ["type", "value"] and not isinstance(action_data[field], str):
-                    action_data[field] = str(action_data[field])
-                    self.repairs.append(f"修复execute_actions[{action_key}].{field}类型")
-        
-        return user_data
-
-    def _repair_gesture_mappings(self, user_data: Dict, default_data: Dict) -> Dict:
-        if "gesture_mappings" not in default_data or not default_data["gesture_mappings"]:
-            return user_data
-        
-        default_sample = next(iter(default_data["gesture_mappings"].values()))
-        gesture_mappings = user_data["gesture_mappings"]
-        
-        for mapping_key, mapping_data in list(gesture_mappings.items()):
-            # 检查键格式（应为数字字符串）
-            if not mapping_key.isdigit():
-                new_key = str(len(gesture_mappings) + 1)
-                gesture_mappings[new_key] = gesture_mappings.pop(mapping_key)
-                self.repairs.append(f"修复gesture_mappings键格式: {mapping_key} -> {new_key}")
-                mapping_key = new_key
-                mapping_data = gesture_mappings[mapping_key]
-            
-            # 检查必要字段
-            if not isinstance(mapping_data, dict):
-                gesture_mappings[mapping_key] = copy.deepcopy(default_sample)
-                self.repairs.append(f"修复gesture_mappings[{mapping_key}]整体格式")
-                continue
-            
-            # 检查各个字段
-            required_fields = ["name", "trigger_path_id", "execute_action_id"]
-            for field in required_fields:
-                if field not in mapping_data:
-                    if field == "name":
-                        mapping_data[field] = f"手势{mapping_key}"
-                    elif field in ["trigger_path_id", "execute_action_id"]:
-                        mapping_data[field] = 1
-                    self.repairs.append(f"添加gesture_mappings[{mapping_key}].{field}")
-                elif field == "name" and not isinstance(mapping_data[field], str):
-                    mapping_data[field] = f"手势{mapping_key}"
-                    self.repairs.append(f"修复gesture_mappings[{mapping_key}].{field}类型")
-                elif field in ["trigger_path_id", "execute_action_id"] and not isinstance(mapping_data[field], int):
-                    try:
-                        mapping_data[field] = int(mapping_data[field])
-                    except (ValueError, TypeError):
-                        mapping_data[field] = 1
-                    self.repairs.append(f"修复gesture_mappings[{mapping_key}].{field}类型")
-        
-        return user_data
-
-    def _repair_reference_integrity(self, user_data: Dict) -> Dict:
-        trigger_paths = user_data.get("trigger_paths", {})
-        execute_actions = user_data.get("execute_actions", {})
-        gesture_mappings = user_data.get("gesture_mappings", {})
-        
-        # 检查映射中的引用完整性
-        for mapping_key, mapping_data in list(gesture_mappings.items()):
-            if not isinstance(mapping_data, dict):
-                continue
-            
-            # 检查trigger_path_id引用
-            trigger_path_id = mapping_data.get("trigger_path_id")
-            if trigger_path_id is not None and str(trigger_path_id) not in trigger_paths:
-                # 找一个存在的trigger_path_id，如果没有则删除映射
-                if trigger_paths:
-                    new_id = int(next(iter(trigger_paths.keys())))
-                    mapping_data["trigger_path_id"] = new_id
-                    self.repairs.append(f"修复gesture_mappings[{mapping_key}].trigger_path_id引用: {trigger_path_id} -> {new_id}")
-                else:
-                    del gesture_mappings[mapping_key]
-                    self.repairs.append(f"删除无效的gesture_mappings[{mapping_key}]（无可用的trigger_path）")
-                    continue
-            
-            # 检查execute_action_id引用
-            execute_action_id = mapping_data.get("execute_action_id")
-            if execute_action_id is not None and str(execute_action_id) not in execute_actions:
-                # 找一个存在的execute_action_id，如果没有则删除映射
-                if execute_actions:
-                    new_id = int(next(iter(execute_actions.keys())))
-                    mapping_data["execute_action_id"] = new_id
-                    self.repairs.append(f"修复gesture_mappings[{mapping_key}].execute_action_id引用: {execute_action_id} -> {new_id}")
-                else:
-                    del gesture_mappings[mapping_key]
-                    self.repairs.append(f"删除无效的gesture_mappings[{mapping_key}]（无可用的execute_action）")
-                    continue
+                user_data, _descriptors = read_pack(user_file)
+        except GesturePackError as e:
+            # 手势库加载时会把损坏的文件移动为 *.corrupted 并告知用户，这里不重复处理
+            self.warnings.append(f"二进制手势库文件损坏: {e}")
+            return
+        except Exception as e:
+            self.warnings.append(f"检查用户手势库时出错: {e}")
+            return
         
-        return user_data
+        repaired_data = self._repair_gesture_data(user_data, default_data)
+        if repaired_data is not user_data:
+            self.pending_repairs.append((user_file, repaired_data, "手势库", fingerprint, self.gesture_library, False))
 
-    def _repair_data_order(self, user_data: Dict) -> Dict:
-        # 修复各部分的顺序
-        for section_name in ["trigger_paths", "execute_actions", "gesture_mappings"]:
-            section_data = user_data.get(section_name, {})
-            if not section_data:
-                continue
-            
-            # 获取所有数字键并排序
-            numeric_keys = []
-            non_numeric_data = {}
-            
-            for key, value in section_data.items():
-                if key.isdigit():
-                    numeric_keys.append(int(key))
-                else:
-                    non_numeric_data[key] = value
-            
-            # 如果没有数字键，跳过
-            if not numeric_keys:
-                continue
-            
-            # 按数字排序
-            numeric_keys.sort()
-            
-            # 创建连续的序号映射
-            old_data = copy.deepcopy(section_data)
-            section_data.clear()
-            key_mapping = {}
-            
-            # 先处理数字键，按连续序号重新排列
-            for i, old_id in enumerate(numeric_keys):
-                new_id = i + 1
-                old_key = str(old_id)
-                new_key = str(new_id)
-                
-                if old_key in old_data:
-                    section_data[new_key] = old_data[old_key]
-                    if old_id != new_id:
-                        key_mapping[old_id] = new_id
-                        self.repairs.append(f"重新排序{section_name}: {old_key} -> {new_key}")
-            
-            # 如果原来的序号不连续，添加修复日志
-            expected_keys = list(range(1, len(numeric_keys) + 1))
-            if numeric_keys != expected_keys:
-                self.repairs.append(f"修复{section_name}序号连续性")
-                
-                # 如果是trigger_paths或execute_actions被重新排序，需要更新gesture_mappings中的引用
-                if section_name in ["trigger_paths", "execute_actions"] and key_mapping:
-                    field_name = f"{section_name[:-1]}_id"  # trigger_path_id 或 execute_action_id
-                    
-                    for mapping_key, mapping_data in user_data.get("gesture_mappings", {}).items():
-                        if isinstance(mapping_data, dict) and field_name in mapping_data:
-                            old_id = mapping_data[field_name]
-                            if old_id in key_mapping:
-                                new_id = key_mapping[old_id]
-                                mapping_data[field_name] = new_id
-                                self.repairs.append(f"更新gesture_mappings[{mapping_key}].{field_name}: {old_id} -> {new_id}")
-        
-        return user_data
+    def _repair_gesture_data(self, user_data: Dict, default_data: Dict) -> Dict:
+        """修复手势库数据，没有发现问题时原样返回 user_data"""
+        return _GestureValidator(default_data, self.repairs).validate(user_data)
 
     def _check_and_repair_settings(self):
         self.logger.info("检查设置...")
@@ -389,68 +562,85 @@ class SelfChecker:
         if not default_data:
             return
         
-        settings = get_settings()
-        user_file = Path(settings.settings_file)
+        user_file = self.settings_file
         
         if not user_file.exists():
             self.logger.debug("用户设置不存在，将使用默认设置")
             return
         
         try:
-            with open(user_file, 'r', encoding='utf-8') as f:
-                user_data = json.load(f)
+            document = self.documents.get(user_file)
+            fingerprint = document.fingerprint
+            if document.error:
+                self.warnings.append(f"用户设置JSON格式错误: {document.error}")
+                self._backup_corrupted_file(user_file, "设置", document.content)
+                self.pending_repairs.append((user_file, default_data, "设置", fingerprint, self.settings, True))
+                return
+            user_data = document.data
             
             repaired_data = self._repair_settings_data(user_data, default_data)
             
-            if repaired_data != user_data:
-                self._save_repaired_data(user_file, repaired_data, "设置")
-                settings.load()
-                settings.save()
-                self.logger.info("已重新加载并保存设置")
+            if repaired_data is not user_data:
+                self.pending_repairs.append((user_file, repaired_data, "设置", fingerprint, self.settings, False))
                 
-        except json.JSONDecodeError as e:
-            self.warnings.append(f"用户设置JSON格式错误: {e}")
-            self._backup_and_reset(user_file, default_data, "设置")
-            settings.load()
-            settings.save()
-            self.logger.info("已重新加载并保存重置的设置")
         except Exception as e:
             self.warnings.append(f"检查用户设置时出错: {e}")
 
     def _repair_settings_data(self, user_data: Dict, default_data: Dict) -> Dict:
-        repaired = copy.deepcopy(user_data)
-        
-        def repair_nested(current: Dict, template: Dict, path: str = ""):
+        """按默认设置的结构修复，只复制被修改的层级，没有发现问题时原样返回 user_data"""
+        def repair_nested(current: Dict, template: Dict, path: str = "") -> Dict:
+            fixed = None
             for key, default_value in template.items():
                 current_path = f"{path}.{key}" if path else key
+                value = current.get(key, _MISSING)
                 
-                if key not in current:
-                    current[key] = copy.deepcopy(default_value)
+                if value is _MISSING:
+                    new_value = copy.deepcopy(default_value)
                     self.repairs.append(f"添加缺失的设置键: {current_path}")
                 elif isinstance(default_value, dict):
-                    if not isinstance(current[key], dict):
-                        current[key] = copy.deepcopy(default_value)
+                    if not isinstance(value, dict):
+                        new_value = copy.deepcopy(default_value)
                         self.repairs.append(f"修复设置键类型: {current_path}")
                     else:
-                        repair_nested(current[key], default_value, current_path)
-                elif type(current[key]) != type(default_value):
-                    if not (isinstance(current[key], (int, float)) and isinstance(default_value, (int, float))):
-                        current[key] = copy.deepcopy(default_value)
-                        self.repairs.append(f"修复设置值类型: {current_path}")
+                        new_value = repair_nested(value, default_value, current_path)
+                        if new_value is value:
+                            continue
+                elif type(value) != type(default_value) and not (
+                    isinstance(value, (int, float)) and isinstance(default_value, (int, float))
+                ):
+                    new_value = copy.deepcopy(default_value)
+                    self.repairs.append(f"修复设置值类型: {current_path}")
+                else:
+                    continue
+                
+                if fixed is None:
+                    fixed = dict(current)
+                fixed[key] = new_value
             
-            for key in list(current.keys()):
-                if key not in template:
-                    del current[key]
-                    current_path = f"{path}.{key}" if path else key
-                    self.repairs.append(f"删除无效的设置键: {current_path}")
+            is_valid = _FREE_FORM_SETTINGS.get(path)
+            for key, value in current.items():
+                if key in template or (is_valid is not None and is_valid(value)):
+                    continue
+                if fixed is None:
+                    fixed = dict(current)
+                del fixed[key]
+                current_path = f"{path}.{key}" if path else key
+                self.repairs.append(f"删除无效的设置键: {current_path}")
+            
+            return fixed if fixed is not None else current
         
-        repair_nested(repaired, default_data)
-        return repaired
+        if not isinstance(user_data, dict):
+            self.repairs.append("修复设置整体格式")
+            return copy.deepcopy(default_data)
+        return repair_nested(user_data, default_data)
 
     def _save_repaired_data(self, file_path: Path, data: Dict, data_type: str):
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            if file_path.suffix == PACK_SUFFIX:
+                compute_descriptor = self.gesture_library.path_analyzer.compute_descriptor
+                atomic_write_bytes(file_path, encode_pack(data, compute_descriptor, None, DESCRIPTOR_POINTS))
+            else:
+                write_document(file_path, data)
             
             self.logger.info(f"已修复{data_type}文件: {file_path}")
             
@@ -458,23 +648,17 @@ class SelfChecker:
             self.errors.append(f"保存修复的{data_type}文件失败: {e}")
 
     def _backup_and_reset(self, file_path: Path, default_data: Dict, data_type: str):
-        self._backup_corrupted_file(file_path, data_type.lower())
-        
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(default_data, f, ensure_ascii=False, indent=4)
+            write_document(file_path, default_data)
             
             self.logger.warning(f"已重置{data_type}为默认值: {file_path}")
             
         except Exception as e:
             self.errors.append(f"重置{data_type}文件失败: {e}")
 
-    def _backup_corrupted_file(self, file_path: Path, file_type: str):
+    def _backup_corrupted_file(self, file_path: Path, file_type: str, content: bytes):
         try:
-            if file_path.exists():
-                with open(file_path, 'rb') as f:
-                    content = f.read()
-                
+            if content:
                 encoded_content = base64.b64encode(content).decode('utf-8')
                 
                 self.corrupted_data.append({
@@ -518,6 +702,45 @@ class SelfChecker:
             print("=" * 60)
 
 
-def run_self_check() -> bool:
+class SelfCheckRunner(QObject):
+    """启动时的自检调度器
+
+    配置文件自上次检查通过后没有变化时直接跳过；否则在后台线程读取和检查文件，
+    检查结果通过信号回到界面线程写入修复并发出 finished(passed, repaired)。
+    """
+
+    finished = Signal(bool, bool)
+    _collected = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.logger = get_logger("SelfChecker")
+        self._collected.connect(self._apply)
+
+    def start(self) -> bool:
+        """开始自检，返回False表示文件未变化、已跳过"""
+        checker = SelfChecker()
+        if checker.is_up_to_date():
+            self.logger.info("配置文件自上次自检后未变化，跳过自检")
+            return False
+        
+        thread = threading.Thread(target=self._collect, args=(checker,), name="SelfCheck", daemon=True)
+        thread.start()
+        return True
+
+    def _collect(self, checker: SelfChecker):
+        checker.collect()
+        self._collected.emit(checker)
+
+    def _apply(self, checker: SelfChecker):
+        passed = checker.apply()
+        self.finished.emit(passed, bool(checker.pending_repairs))
+
+
+def run_self_check(force: bool = False) -> bool:
+    """在当前线程运行自检，force为False时文件未变化则跳过"""
     checker = SelfChecker()
-    return checker.run_full_check()
\ No newline at end of file
+    if not force and checker.is_up_to_date():
+        checker.logger.info("配置文件自上次自检后未变化，跳过自检")
+        return True
+    return checker.run_full_check()
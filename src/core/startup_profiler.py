@@ -0,0 +1,297 @@
+"""
+启动阶段分析模块
+
+用 perf_counter 记录启动过程中各阶段（导入、自检、设置和手势库加载、界面创建、
+托盘、绘制管理器等）的开始时间和耗时，可选记录与 -X importtime 相同口径的模块
+导入耗时，启动完成后写入JSON报告，用于发现和定位冷启动变慢的原因。
+
+未启用时 phase/mark 只做一次布尔判断，可以常驻在启动代码中。
+
+启用方式：
+    python main.py --profile-startup [报告路径] [--profile-imports]
+
+查看或对比报告：
+    python -m core.startup_profiler <report.json> [--baseline <old.json>] [--top N]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_VERSION = 1
+
+# 模块导入时的时间作为启动计时起点，main.py 应尽早导入本模块
+_START = time.perf_counter()
+
+
+def _elapsed_ms(t):
+    return round((t - _START) * 1000, 3)
+
+
+class _ImportTimer:
+    """记录模块导入耗时，口径与 -X importtime 一致（自身耗时和累计耗时，单位微秒）
+
+    通过替换 importlib._bootstrap._find_and_load 实现，import 语句和
+    importlib.import_module 都会经过这个函数；替换失败时不记录导入耗时。
+    """
+
+    def __init__(self):
+        self.records = []
+        self._local = threading.local()
+        self._original = None
+
+    def install(self):
+        try:
+            import importlib._bootstrap as bootstrap
+        except ImportError:
+            return False
+        if self._original is not None or not hasattr(bootstrap, "_find_and_load"):
+            return False
+
+        self._original = bootstrap._find_and_load
+        original = self._original
+
+        def _timed_find_and_load(name, import_):
+            stack = getattr(self._local, "stack", None)
+            if stack is None:
+                stack = self._local.stack = []
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return original(name, import_)
+            finally:
+                cumulative = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += cumulative
+                self.records.append({
+                    "module": name,
+                    "self_us": int((cumulative - nested) * 1e6),
+                    "cumulative_us": int(cumulative * 1e6),
+                    "depth": len(stack),
+                    "start_ms": _elapsed_ms(start),
+                })
+
+        bootstrap._find_and_load = _timed_find_and_load
+        return True
+
+    def uninstall(self):
+        if self._original is None:
+            return
+        import importlib._bootstrap as bootstrap
+        bootstrap._find_and_load = self._original
+        self._original = None
+
+
+class StartupProfiler:
+    """启动阶段分析器"""
+
+    def __init__(self):
+        self.enabled = False
+        self.report_path = None
+        self.phases = []
+        self.marks = []
+        self._import_timer = None
+        self._local = threading.local()
+        self._finished = False
+
+    def enable(self, report_path=None, capture_imports=False):
+        """启用分析；report_path 为空时报告写入日志目录"""
+        self.enabled = True
+        self.report_path = report_path or None
+        if capture_imports and self._import_timer is None:
+            timer = _ImportTimer()
+            if timer.install():
+                self._import_timer = timer
+
+    def configure_from_argv(self, argv):
+        """从命令行参数启用分析，需要在导入其他模块之前调用才能记录全部导入"""
+        parser = argparse.ArgumentParser(add_help=False)
+        parser.add_argument("--profile-startup", nargs="?", const="", default=None)
+        parser.add_argument("--profile-imports", action="store_true")
+        args, _ = parser.parse_known_args(argv[1:])
+        if args.profile_startup is not None:
+            self.enable(args.profile_startup, args.profile_imports)
+        return self.enabled
+
+    @contextmanager
+    def phase(self, name):
+        """记录一个阶段的耗时，阶段可以嵌套"""
+        if not self.enabled or self._finished:
+            yield
+            return
+
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._local.depth = depth
+            self.phases.append({
+                "name": name,
+                "start_ms": _elapsed_ms(start),
+                "duration_ms": round((end - start) * 1000, 3),
+                "depth": depth,
+                "thread": threading.current_thread().name,
+            })
+
+    def mark(self, name):
+        """记录一个时间点"""
+        if self.enabled and not self._finished:
+            self.marks.append({"name": name, "at_ms": _elapsed_ms(time.perf_counter())})
+
+    def build_report(self):
+        now = time.perf_counter()
+        report = {
+            "report_version": REPORT_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "argv": sys.argv,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "process_start_offset_ms": _process_start_offset_ms(),
+            "total_ms": _elapsed_ms(now),
+            "phases": sorted(self.phases, key=lambda p: p["start_ms"]),
+            "marks": list(self.marks),
+        }
+        try:
+            from version import VERSION
+            report["app_version"] = VERSION
+        except ImportError:
+            pass
+
+        if self._import_timer is not None:
+            imports = list(self._import_timer.records)
+            report["imports"] = imports
+            report["import_summary"] = {
+                "count": len(imports),
+                "total_ms": round(sum(r["cumulative_us"] for r in imports if r["depth"] == 0) / 1000, 3),
+            }
+        return report
+
+    def finish(self):
+        """结束分析并写入报告，返回报告路径；未启用或已结束时返回None"""
+        if not self.enabled or self._finished:
+            return None
+        self._finished = True
+        if self._import_timer is not None:
+            self._import_timer.uninstall()
+
+        from core.logger import get_log_dir, get_logger
+        from core.persistence import atomic_write_json
+
+        logger = get_logger("StartupProfiler")
+        report = self.build_report()
+        path = self.report_path
+        if not path:
+            file_name = f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+            path = os.path.join(get_log_dir(), file_name)
+
+        try:
+            atomic_write_json(path, report, indent=2)
+        except OSError as e:
+            logger.error(f"写入启动分析报告失败: {e}")
+            return None
+
+        logger.info(f"启动分析报告已写入: {path}，总耗时 {report['total_ms']:.1f}ms")
+        return path
+
+
+def _process_start_offset_ms():
+    """解释器进程启动到本模块导入之间的时间，无法获取时返回None"""
+    try:
+        import psutil
+        created = psutil.Process(os.getpid()).create_time()
+    except Exception:
+        return None
+    offset = time.time() - (time.perf_counter() - _START) - created
+    return round(max(offset, 0.0) * 1000, 3)
+
+
+_profiler = StartupProfiler()
+
+
+def get_startup_profiler():
+    """获取全局启动分析器"""
+    return _profiler
+
+
+def _phase_totals(report):
+    totals = {}
+    for phase in report.get("phases", []):
+        totals[phase["name"]] = totals.get(phase["name"], 0.0) + phase["duration_ms"]
+    return totals
+
+
+def format_report(report, baseline=None, top=15):
+    """把报告转换为可读文本；提供 baseline 时显示各阶段的变化"""
+    lines = [
+        f"版本: {report.get('app_version', '-')}  Python: {report.get('python', '-')}  "
+        f"创建时间: {report.get('created', '-')}",
+        f"总耗时: {report['total_ms']:.1f}ms"
+        + (f"（进程启动到分析开始: {report['process_start_offset_ms']:.1f}ms）"
+           if report.get("process_start_offset_ms") is not None else ""),
+        "",
+        "阶段:",
+    ]
+
+    base_totals = _phase_totals(baseline) if baseline else {}
+    for phase in report.get("phases", []):
+        line = f"  {phase['start_ms']:9.1f}ms  {'  ' * phase['depth']}{phase['name']:<28} {phase['duration_ms']:9.1f}ms"
+        if baseline is not None and phase["depth"] == 0:
+            base = base_totals.get(phase["name"])
+            line += "        (新增)" if base is None else f"  {phase['duration_ms'] - base:+9.1f}ms"
+        lines.append(line)
+
+    if baseline is not None:
+        missing = sorted(set(base_totals) - set(_phase_totals(report)))
+        if missing:
+            lines.append(f"  基线中存在但本次缺少的阶段: {', '.join(missing)}")
+        lines.append(f"  总耗时变化: {report['total_ms'] - baseline['total_ms']:+.1f}ms")
+
+    if report.get("marks"):
+        lines.append("")
+        lines.append("时间点:")
+        for mark in report["marks"]:
+            lines.append(f"  {mark['at_ms']:9.1f}ms  {mark['name']}")
+
+    imports = report.get("imports")
+    if imports:
+        summary = report.get("import_summary", {})
+        lines.append("")
+        lines.append(f"导入耗时最多的模块（共 {summary.get('count', len(imports))} 个，"
+                     f"顶层累计 {summary.get('total_ms', 0):.1f}ms）:")
+        lines.append(f"  {'自身(us)':>10} {'累计(us)':>10}  模块")
+        for record in sorted(imports, key=lambda r: r["self_us"], reverse=True)[:top]:
+            lines.append(f"  {record['self_us']:>10} {record['cumulative_us']:>10}  {record['module']}")
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查看GestroKey启动分析报告")
+    parser.add_argument("path", help="startup-*.json 报告文件")
+    parser.add_argument("--baseline", default=None, help="用于对比的旧报告")
+    parser.add_argument("--top", type=int, default=15, help="显示导入耗时最多的N个模块")
+    args = parser.parse_args(argv)
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(format_report(report, baseline, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
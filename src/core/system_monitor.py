@@ -1,14 +1,31 @@
 import os
-import time
+import threading
 from datetime import datetime
 
 import psutil
-from qtpy.QtCore import QObject, QTimer, Signal
+from qtpy.QtCore import QObject, Signal
 
 from core.logger import get_logger
 
 
+def _cpu_busy_and_total(times):
+    """从 psutil.cpu_times() 计算 (忙碌时间, 总时间)，与 psutil.cpu_percent 的算法一致"""
+    # Linux 上 guest 时间已包含在 user/nice 中
+    total = sum(times) - getattr(times, "guest", 0.0) - getattr(times, "guest_nice", 0.0)
+    busy = total - times.idle - getattr(times, "iowait", 0.0)
+    return busy, total
+
+
 class SystemMonitor(QObject):
+    """系统资源监测器
+
+    采样在后台线程进行，结果通过 dataUpdated 信号回到界面线程。stop() 后采样线程
+    立即退出，不再有任何定时唤醒；CPU核心数等不变的值只获取一次。
+    不需要定时采样的使用者（如指标导出）可以直接调用 sample()，CPU占用率是距同一实例
+    上次调用的平均值。系统CPU占用率的基准保存在实例中（psutil.cpu_percent 的基准是
+    整个模块共用的），多个实例互不影响。
+    """
+
     dataUpdated = Signal(dict)
 
     def __init__(self, update_interval=1000):
@@ -16,31 +33,41 @@ class SystemMonitor(QObject):
         self.logger = get_logger("SystemMonitor")
         self._update_interval = update_interval
         self._start_time = datetime.now()
-        self._timer = QTimer()
-        self._timer.timeout.connect(self._update_data)
         self._running = False
+        self._stop_event = None
         self._data = {
             "cpu_percent": 0.0,
             "memory_percent": 0.0,
             "memory_used": 0,
             "memory_total": 0,
             "runtime": "00:00:00",
+            "runtime_seconds": 0.0,
             "process_memory": 0.0,
+            "process_rss": 0,
             "process_cpu": 0.0,
         }
         self._process = psutil.Process(os.getpid())
+        self._cpu_count = psutil.cpu_count() or 1
+        self._cpu_times = None
 
     def start(self):
         if not self._running:
             self._running = True
-            self._timer.start(self._update_interval)
+            self._stop_event = threading.Event()
+            thread = threading.Thread(
+                target=self._run, args=(self._stop_event,), name="SystemMonitor", daemon=True
+            )
+            thread.start()
+            self.logger.debug("系统监测已开始")
             return True
         return False
 
     def stop(self):
         if self._running:
             self._running = False
-            self._timer.stop()
+            self._stop_event.set()
+            self._stop_event = None
+            self.logger.debug("系统监测已暂停")
             return True
         return False
 
@@ -50,33 +77,64 @@ class SystemMonitor(QObject):
     def get_data(self):
         return self._data.copy()
 
-    def _update_data(self):
+    def _run(self, stop_event):
+        # 以开始时刻为CPU占用率的基准，避免第一次采样统计到暂停期间的平均值
+        try:
+            self._cpu_times = _cpu_busy_and_total(psutil.cpu_times())
+            self._process.cpu_percent(interval=None)
+        except Exception as e:
+            self.logger.error(f"初始化系统信息采样时发生错误: {e}")
+
+        while not stop_event.wait(self._update_interval / 1000):
+            data = self.sample()
+            if data is not None and not stop_event.is_set():
+                self._data = data
+                self.dataUpdated.emit(data)
+
+    def sample(self):
+        """采样一次系统和进程资源，失败时返回None"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=None)
+            cpu_percent = self._system_cpu_percent()
             memory = psutil.virtual_memory()
-            process_memory = self._process.memory_percent()
-            process_cpu = self._process.cpu_percent(interval=None) / psutil.cpu_count()
+            with self._process.oneshot():
+                process_rss = self._process.memory_info().rss
+                process_cpu = self._process.cpu_percent(interval=None) / self._cpu_count
             runtime = datetime.now() - self._start_time
             runtime_str = str(runtime).split(".")[0]
 
-            self._data.update({
+            return {
                 "cpu_percent": cpu_percent,
                 "memory_percent": memory.percent,
                 "memory_used": memory.used,
                 "memory_total": memory.total,
                 "runtime": runtime_str,
-                "process_memory": process_memory,
+                "runtime_seconds": runtime.total_seconds(),
+                "process_memory": process_rss / memory.total * 100 if memory.total else 0.0,
+                "process_rss": process_rss,
                 "process_cpu": process_cpu,
-            })
-            self.dataUpdated.emit(self._data)
+            }
         except Exception as e:
             self.logger.error(f"更新系统信息时发生错误: {e}")
+            return None
+
+    def _system_cpu_percent(self):
+        """距本实例上次采样的系统CPU占用率，第一次调用时只记录基准并返回0"""
+        busy, total = _cpu_busy_and_total(psutil.cpu_times())
+        previous = self._cpu_times
+        self._cpu_times = (busy, total)
+        if previous is None:
+            return 0.0
+        total_delta = total - previous[1]
+        if total_delta <= 0:
+            return 0.0
+        busy_delta = busy - previous[0]
+        return round(min(max(busy_delta / total_delta * 100, 0.0), 100.0), 1)
 
     def set_update_interval(self, interval):
         self._update_interval = interval
         if self._running:
-            self._timer.stop()
-            self._timer.start(self._update_interval)
+            self.stop()
+            self.start()
 
     def get_update_interval(self):
         return self._update_interval
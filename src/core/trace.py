@@ -0,0 +1,221 @@
+"""
+热路径事件追踪模块
+
+在预分配的环形缓冲区（NumPy结构化数组）中记录紧凑的二进制事件，用于诊断
+输入、绘制、识别和按键注入之间的延迟。写入只做一次计数和一次字节打包，
+不格式化字符串、不做IO，可以在鼠标移动和绘制等高频路径上常开。
+
+离线查看导出文件：
+    python -m core.trace <trace.npz> [--limit N]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# 环形缓冲区容量，必须是2的幂
+TRACE_CAPACITY = 1 << 16
+
+EVENT_INPUT_SAMPLE = 1
+EVENT_FRAME_PAINTED = 2
+EVENT_RECOGNITION_START = 3
+EVENT_RECOGNITION_END = 4
+EVENT_KEY_INJECTED = 5
+EVENT_STROKE_START = 6
+EVENT_STROKE_END = 7
+
+EVENT_NAMES = {
+    EVENT_INPUT_SAMPLE: "input_sample",
+    EVENT_FRAME_PAINTED: "frame_painted",
+    EVENT_RECOGNITION_START: "recognition_start",
+    EVENT_RECOGNITION_END: "recognition_end",
+    EVENT_KEY_INJECTED: "key_injected",
+    EVENT_STROKE_START: "stroke_start",
+    EVENT_STROKE_END: "stroke_end",
+}
+
+# 单条事件：时间戳(perf_counter_ns)、事件码、线程标识、两个事件相关的数值参数
+TRACE_DTYPE = np.dtype([
+    ("t_ns", "<i8"),
+    ("event", "<u2"),
+    ("thread", "<u8"),
+    ("a", "<f4"),
+    ("b", "<f4"),
+])
+_RECORD = struct.Struct("<qHQff")
+
+
+class TraceBuffer:
+    """固定大小的事件环形缓冲区，写满后覆盖最旧的事件"""
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        if capacity & (capacity - 1):
+            raise ValueError("追踪缓冲区容量必须是2的幂")
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self._buffer = np.zeros(capacity, dtype=TRACE_DTYPE)
+        self._raw = memoryview(self._buffer.view(np.uint8))
+        self._counter = itertools.count()
+        self._origin_wall_ns = time.time_ns()
+        self._origin_perf_ns = time.perf_counter_ns()
+
+    def record(self, event, a=0.0, b=0.0):
+        """记录一条事件，可在任意线程调用
+
+        直接把打包好的字节写入缓冲区，比按字段给结构化数组赋值快一倍以上。
+        """
+        offset = (next(self._counter) & self._mask) * _RECORD.size
+        _RECORD.pack_into(self._raw, offset, time.perf_counter_ns(), event, threading.get_ident(), a, b)
+
+    def snapshot(self):
+        """按时间顺序返回当前缓冲区中的全部事件副本"""
+        events = self._buffer.copy()
+        events = events[events["event"] != 0]
+        return np.sort(events, order="t_ns", kind="stable")
+
+    def clear(self):
+        self._buffer[:] = 0
+
+    def dump(self, path):
+        """导出缓冲区到 .npz 文件，返回写入的事件数"""
+        events = self.snapshot()
+        meta = {
+            "pid": os.getpid(),
+            "capacity": self.capacity,
+            "origin_wall_ns": self._origin_wall_ns,
+            "origin_perf_ns": self._origin_perf_ns,
+            "event_names": {str(code): name for code, name in EVENT_NAMES.items()},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, events=events, meta=np.array(json.dumps(meta)))
+        return len(events)
+
+
+_tracer = TraceBuffer()
+
+
+def get_tracer():
+    """获取全局追踪缓冲区"""
+    return _tracer
+
+
+def trace(event, a=0.0, b=0.0):
+    """向全局缓冲区记录一条事件"""
+    _tracer.record(event, a, b)
+
+
+def dump_to_log_dir():
+    """将全局缓冲区导出到日志目录，返回导出文件路径"""
+    from core.logger import get_log_dir
+
+    file_name = f"trace-{datetime.now().strftime('%Y%m%d-%H%M%S')}.npz"
+    path = os.path.join(get_log_dir(), file_name)
+    _tracer.dump(path)
+    return path
+
+
+def load_dump(path):
+    """读取导出文件，返回 (events, meta)"""
+    with np.load(path) as data:
+        events = data["events"]
+        meta = json.loads(str(data["meta"]))
+    return events, meta
+
+
+def _percentile_ms(values_ns, q):
+    if len(values_ns) == 0:
+        return 0.0
+    return float(np.percentile(values_ns, q)) / 1e6
+
+
+def format_timeline(events, meta, limit=None):
+    """把事件转换为可读的时间线文本和延迟摘要"""
+    names = {int(code): name for code, name in meta.get("event_names", {}).items()}
+    lines = []
+
+    if len(events) == 0:
+        return "追踪文件中没有事件"
+
+    t0 = int(events["t_ns"][0])
+    wall_start = meta["origin_wall_ns"] + (t0 - meta["origin_perf_ns"])
+    lines.append(f"开始时间: {datetime.fromtimestamp(wall_start / 1e9).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
+    lines.append(f"事件数: {len(events)}  (进程 {meta.get('pid')})")
+    lines.append("")
+    lines.append(f"{'时间(ms)':>12} {'间隔(ms)':>10} {'线程':>8}  {'事件':<20} 参数")
+
+    thread_numbers = {}
+    for thread_id in events["thread"]:
+        thread_numbers.setdefault(int(thread_id), len(thread_numbers) + 1)
+
+    shown = events if limit is None else events[-limit:]
+    previous = int(shown["t_ns"][0])
+    for row in shown:
+        t_ns = int(row["t_ns"])
+        name = names.get(int(row["event"]), str(int(row["event"])))
+        lines.append(
+            f"{(t_ns - t0) / 1e6:12.3f} {(t_ns - previous) / 1e6:10.3f} {thread_numbers[int(row['thread'])]:8d}  "
+            f"{name:<20} {float(row['a']):.3f}, {float(row['b']):.3f}"
+        )
+        previous = t_ns
+
+    lines.append("")
+    lines.append("延迟摘要:")
+
+    codes = events["event"]
+    times = events["t_ns"].astype(np.int64)
+
+    for code, label in ((EVENT_INPUT_SAMPLE, "输入采样间隔"), (EVENT_FRAME_PAINTED, "帧间隔")):
+        intervals = np.diff(times[codes == code])
+        if len(intervals):
+            lines.append(
+                f"  {label}: p50 {_percentile_ms(intervals, 50):.2f}ms, "
+                f"p99 {_percentile_ms(intervals, 99):.2f}ms, 共 {len(intervals) + 1} 次"
+            )
+
+    def _pair_latencies(start_code, end_code):
+        latencies = []
+        start = None
+        for t_ns, code in zip(times, codes):
+            if code == start_code:
+                start = t_ns
+            elif code == end_code and start is not None:
+                latencies.append(t_ns - start)
+                start = None
+        return np.array(latencies, dtype=np.int64)
+
+    for start_code, end_code, label in (
+        (EVENT_RECOGNITION_START, EVENT_RECOGNITION_END, "识别耗时"),
+        (EVENT_STROKE_END, EVENT_KEY_INJECTED, "抬笔到按键注入"),
+    ):
+        latencies = _pair_latencies(start_code, end_code)
+        if len(latencies):
+            lines.append(
+                f"  {label}: p50 {_percentile_ms(latencies, 50):.2f}ms, "
+                f"p99 {_percentile_ms(latencies, 99):.2f}ms, 最大 {latencies.max() / 1e6:.2f}ms, 共 {len(latencies)} 次"
+            )
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查看GestroKey追踪导出文件")
+    parser.add_argument("path", help="trace-*.npz 导出文件")
+    parser.add_argument("--limit", type=int, default=None, help="只显示最后N条事件")
+    args = parser.parse_args(argv)
+
+    events, meta = load_dump(args.path)
+    print(format_timeline(events, meta, args.limit))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,47 @@
 import argparse
 import ctypes
+import importlib
 import os
 import sys
+import time
 from ctypes import wintypes
 from datetime import datetime
 
 from version import QT_API
 os.environ['QT_API'] = QT_API
 
-from qtpy.QtCore import Qt, QTimer, QSize
-from qtpy.QtGui import QIcon, QAction
-from qtpy.QtWidgets import (
-    QApplication, QHBoxLayout, QLabel, QMainWindow, QMessageBox, QPushButton,
-    QSizePolicy, QStackedWidget, QVBoxLayout, QWidget, QSystemTrayIcon, QMenu,
-    QDialog, QCheckBox, QRadioButton, QButtonGroup
+# 启动分析需要在导入其他模块之前启用，才能记录全部导入耗时
+from core.startup_profiler import get_startup_profiler
+startup_profiler = get_startup_profiler()
+if __name__ == "__main__":
+    startup_profiler.configure_from_argv(sys.argv)
+
+with startup_profiler.phase("import_modules"):
+    from qtpy.QtCore import Qt, QTimer, QSize
+    from qtpy.QtGui import QIcon, QAction
+    from qtpy.QtWidgets import (
+        QApplication, QHBoxLayout, QLabel, QMainWindow, QMessageBox, QPushButton,
+        QSizePolicy, QStackedWidget, QVBoxLayout, QWidget, QSystemTrayIcon, QMenu,
+        QDialog, QCheckBox, QRadioButton, QButtonGroup
+    )
+
+    from core.logger import get_logger
+    from core.metrics_export import get_metrics_exporter
+    from core.persistence import get_writer
+    from core.self_check import SelfCheckRunner
+    from core.trace import dump_to_log_dir
+    from ui.gestures.gestures import get_gesture_library
+    from ui.settings.settings import get_settings
+    from version import APP_NAME, get_version_string
+
+# 页面定义：(属性名, 标题, 图标, 模块, 类名)
+# 页面模块在第一次显示时才导入和创建，静默启动时不会加载任何页面
+PAGES = (
+    ("console_page", "控制台", "console.svg", "ui.console", "ConsolePage"),
+    ("gestures_page", "手势管理", "gestures.svg", "ui.gestures.gestures_tab", "GesturesPage"),
+    ("settings_page", "设置", "settings.svg", "ui.settings.settings_tab", "SettingsPage"),
 )
 
-from core.logger import get_logger
-from core.self_check import run_self_check
-from ui.console import ConsolePage
-from ui.gestures.gestures import get_gesture_library
-from ui.gestures.gestures_tab import GesturesPage
-from ui.settings.settings import get_settings
-from ui.settings.settings_tab import SettingsPage
-from version import APP_NAME, get_version_string
-
 
 def show_dialog(parent, message_type="warning", title_text=None, message="", 
                 content_widget=None, custom_icon=None, custom_buttons=None, 
@@ -108,6 +125,11 @@ def get_system_tray(parent):
     _set_action_icon(settings_action, "settings.svg")
     settings_action.triggered.connect(parent.show_settings_page)
     menu.addAction(settings_action)
+
+    export_trace_action = QAction("导出性能追踪", parent)
+    export_trace_action.setToolTip("导出最近的输入、绘制、识别和按键事件，用于排查延迟问题")
+    export_trace_action.triggered.connect(parent.export_trace)
+    menu.addAction(export_trace_action)
     
     menu.addSeparator()
     
@@ -147,12 +169,16 @@ class GestroKeyApp(QMainWindow):
         self.logger = get_logger("MainApp")
         self.is_drawing_active = False
         self.silent_start = silent_start
+        self.drawing_manager = None
 
-        self.init_global_resources()
-        self.initUI()
-        self.init_system_tray()
-
+        with startup_profiler.phase("init_global_resources"):
+            self.init_global_resources()
+        with startup_profiler.phase("init_ui"):
+            self.initUI()
+        with startup_profiler.phase("init_system_tray"):
+            self.init_system_tray()
 
+        QTimer.singleShot(0, self._show_library_warnings)
 
         if self.silent_start:
             self.logger.info("GestroKey应用程序已静默启动")
@@ -162,25 +188,62 @@ class GestroKeyApp(QMainWindow):
 
     def init_global_resources(self):
         try:
-            self.logger.info("运行程序自检...")
-            
-            if not run_self_check():
-                self.logger.warning("自检发现问题，但程序继续启动")
-            else:
-                self.logger.info("程序自检通过")
-        except Exception as e:
-            self.logger.error(f"运行自检时发生异常: {e}")
-        
-        try:
-            settings = get_settings()
+            with startup_profiler.phase("load_settings"):
+                settings = get_settings()
             self.logger.info("设置管理器初始化完成")
 
-            gestures = get_gesture_library()
+            with startup_profiler.phase("load_gesture_library"):
+                gestures = get_gesture_library()
             self.logger.info("手势库管理器初始化完成")
         except Exception as e:
             self.logger.error(f"初始化全局资源失败: {e}")
             raise
 
+        try:
+            # 未在设置中开启导出时只订阅设置变更，不启动任何线程
+            with startup_profiler.phase("start_metrics_export"):
+                get_metrics_exporter().start(settings)
+        except Exception as e:
+            self.logger.error(f"启动指标导出失败: {e}")
+
+        try:
+            self.self_check_runner = SelfCheckRunner(self)
+            self.self_check_runner.finished.connect(self._on_self_check_finished)
+            with startup_profiler.phase("self_check_start"):
+                started = self.self_check_runner.start()
+            if started:
+                self.logger.info("程序自检已在后台运行")
+            else:
+                startup_profiler.mark("self_check_skipped")
+        except Exception as e:
+            self.logger.error(f"运行自检时发生异常: {e}")
+
+    def _on_self_check_finished(self, passed, repaired):
+        startup_profiler.mark("self_check_finished")
+        if passed:
+            self.logger.info("程序自检通过")
+        else:
+            self.logger.warning("自检发现问题，但程序继续运行")
+
+        if repaired:
+            # 修复后手势库和设置已重新加载，刷新已创建的页面
+            if hasattr(self, "gestures_page"):
+                self.gestures_page.refresh_list()
+            if hasattr(self, "settings_page"):
+                self.settings_page._reload_all()
+            self._show_library_warnings()
+
+    def _show_library_warnings(self):
+        """告知用户加载手势库时发现的问题，静默启动时使用托盘通知"""
+        warnings = get_gesture_library().take_load_warnings()
+        if not warnings:
+            return
+        message = "\n\n".join(warnings)
+        if self.silent_start and getattr(self, "tray_icon", None):
+            self.tray_icon.showMessage(APP_NAME, message, QSystemTrayIcon.MessageIcon.Warning, 10000)
+        else:
+            self.show_global_dialog(self, "warning", "手势库", message)
+
     def init_system_tray(self):
         try:
             self.tray_icon = get_system_tray(self)
@@ -195,41 +258,79 @@ class GestroKeyApp(QMainWindow):
 
     def toggle_drawing(self):
         self.logger.info("从托盘图标切换绘制状态")
-        if hasattr(self, "console_page"):
-            if self.is_drawing_active:
-                self.stop_drawing()
-            else:
-                self.start_drawing()
+        if self.is_drawing_active:
+            self.stop_drawing()
         else:
-            self.logger.warning("找不到控制台页面，无法切换绘制状态")
+            self.start_drawing()
 
     def _silent_start_drawing(self):
-        """静默启动时的绘制启动方法"""
-        if hasattr(self, "console_page"):
+        """静默启动时的绘制启动方法，只加载绘制覆盖层、识别器和执行器"""
+        with startup_profiler.phase("start_drawing"):
             self.start_drawing()
-        else:
-            # 如果console_page还未初始化，再延迟一点时间
-            self.logger.warning("console_page尚未初始化，延迟启动监听")
-            QTimer.singleShot(200, self._silent_start_drawing)
+
+        try:
+            with startup_profiler.phase("init_gesture_executor"):
+                from core.gesture_executor import get_gesture_executor
+                get_gesture_executor()
+        except Exception as e:
+            self.logger.error(f"初始化手势执行器失败: {e}")
+
+        self._finish_startup()
+
+    def _finish_startup(self):
+        """启动的最后一步完成后结束启动分析"""
+        startup_profiler.mark("startup_complete")
+        startup_profiler.finish()
+
+    def _get_drawing_manager(self):
+        """获取绘制管理器，第一次使用时才导入绘制模块"""
+        if self.drawing_manager is None:
+            with startup_profiler.phase("create_drawing_manager"):
+                from core.brush.manager import DrawingManager
+                self.drawing_manager = DrawingManager()
+        return self.drawing_manager
 
     def start_drawing(self):
-        if not self.is_drawing_active and hasattr(self, "console_page"):
+        if self.is_drawing_active:
+            return
+
+        if hasattr(self, "console_page"):
             self.console_page.start_drawing()
+            success = self.console_page.is_drawing_active
+        else:
+            try:
+                success = self._get_drawing_manager().start()
+            except Exception as e:
+                self.logger.exception(f"启动绘制功能时发生错误: {e}")
+                success = False
+
+        if success:
             self.is_drawing_active = True
             if hasattr(self, "tray_icon") and self.tray_icon:
                 self.tray_icon.update_drawing_state(True)
             self.logger.info("已启动绘制功能")
 
     def stop_drawing(self):
-        if self.is_drawing_active and hasattr(self, "console_page"):
+        if not self.is_drawing_active:
+            return
+
+        if hasattr(self, "console_page"):
             self.console_page.stop_drawing()
-            self.is_drawing_active = False
-            if hasattr(self, "tray_icon") and self.tray_icon:
-                self.tray_icon.update_drawing_state(False)
-            self.logger.info("已停止绘制功能")
+        elif self.drawing_manager:
+            try:
+                self.drawing_manager.stop()
+            except Exception as e:
+                self.logger.exception(f"停止绘制功能时发生错误: {e}")
+
+        self.is_drawing_active = False
+        if hasattr(self, "tray_icon") and self.tray_icon:
+            self.tray_icon.update_drawing_state(False)
+        self.logger.info("已停止绘制功能")
 
     def show_and_activate(self):
         self.show()
+        # 静默启动后第一次显示窗口时才创建当前页面
+        self.switch_page(self.stacked_widget.currentIndex())
 
         if sys.platform == "win32":
             if self.isMinimized():
@@ -344,12 +445,6 @@ class GestroKeyApp(QMainWindow):
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.setSpacing(0)
 
-        self.console_page = ConsolePage()
-        self.console_page.drawing_state_changed.connect(self.on_drawing_state_changed)
-
-        self.settings_page = SettingsPage()
-        self.gestures_page = GesturesPage()
-        
         tab_widget = QWidget()
         tab_layout = QHBoxLayout(tab_widget)
         
@@ -365,13 +460,14 @@ class GestroKeyApp(QMainWindow):
             button.setIconSize(QSize(20, 20))
             return button
         
-        self.console_btn = _create_tab_button("控制台", "console.svg", 0)
-        self.gestures_btn = _create_tab_button("手势管理", "gestures.svg", 1)
-        self.settings_btn = _create_tab_button("设置", "settings.svg", 2)
+        self.page_buttons = [
+            _create_tab_button(title, icon_name, index)
+            for index, (_attr, title, icon_name, _module, _cls) in enumerate(PAGES)
+        ]
+        self.console_btn, self.gestures_btn, self.settings_btn = self.page_buttons
         
-        tab_layout.addWidget(self.console_btn)
-        tab_layout.addWidget(self.gestures_btn)
-        tab_layout.addWidget(self.settings_btn)
+        for button in self.page_buttons:
+            tab_layout.addWidget(button)
         tab_layout.addStretch()
         
         main_layout.addWidget(tab_widget)
@@ -381,9 +477,9 @@ class GestroKeyApp(QMainWindow):
             QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding
         )
         
-        self.stacked_widget.addWidget(self.console_page)
-        self.stacked_widget.addWidget(self.gestures_page)
-        self.stacked_widget.addWidget(self.settings_page)
+        # 先放占位控件，页面在第一次切换到时由 _ensure_page 创建
+        for _page in PAGES:
+            self.stacked_widget.addWidget(QWidget())
         
         main_layout.addWidget(self.stacked_widget, 1)
 
@@ -422,17 +518,43 @@ class GestroKeyApp(QMainWindow):
 
         if not self.silent_start:
             self.show()
+            QApplication.processEvents()
+            QTimer.singleShot(100, lambda: self._select_initial_page())
+
+    def _ensure_page(self, index):
+        """确保页面已创建，返回页面实例"""
+        attr, title, _icon_name, module_name, class_name = PAGES[index]
+        page = getattr(self, attr, None)
+        if page is not None:
+            return page
+
+        start = time.perf_counter()
+        with startup_profiler.phase(f"create_{attr}"):
+            page_class = getattr(importlib.import_module(module_name), class_name)
+            if attr == "console_page":
+                page = page_class(drawing_manager=self.drawing_manager)
+                page.drawing_state_changed.connect(self.on_drawing_state_changed)
+            else:
+                page = page_class()
 
-        QApplication.processEvents()
-        QTimer.singleShot(100, lambda: self._select_initial_page())
+        placeholder = self.stacked_widget.widget(index)
+        current_index = self.stacked_widget.currentIndex()
+        self.stacked_widget.insertWidget(index, page)
+        self.stacked_widget.removeWidget(placeholder)
+        placeholder.deleteLater()
+        self.stacked_widget.setCurrentIndex(current_index)
+
+        setattr(self, attr, page)
+        self.logger.info(f"页面 {title} 已创建，耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        return page
 
     def switch_page(self, index):
         try:
+            self._ensure_page(index)
             self.stacked_widget.setCurrentIndex(index)
             self.onPageChanged(index)
             
-            buttons = [self.console_btn, self.gestures_btn, self.settings_btn]
-            for i, btn in enumerate(buttons):
+            for i, btn in enumerate(self.page_buttons):
                 btn.setStyleSheet("font-weight: bold;" if i == index else "")
         except Exception as e:
             self.logger.error(f"切换页面时出错: {e}")
@@ -445,16 +567,10 @@ class GestroKeyApp(QMainWindow):
         except Exception as e:
             self.logger.error(f"设置初始页面时出错: {e}")
 
+        self._finish_startup()
+
     def onPageChanged(self, index):
-        page_name = (
-            "控制台"
-            if index == 0
-            else "手势管理"
-            if index == 1
-            else "设置"
-            if index == 2
-            else f"未知({index})"
-        )
+        page_name = PAGES[index][1] if 0 <= index < len(PAGES) else f"未知({index})"
         self.logger.debug(f"切换到页面: {index} ({page_name})")
 
     def resizeEvent(self, event):
@@ -553,8 +669,7 @@ class GestroKeyApp(QMainWindow):
     
     def _prepare_for_close(self):
         """准备关闭：停止绘制和释放按键"""
-        if hasattr(self, "console_page"):
-            self.console_page.stop_drawing()
+        self.stop_drawing()
         
         from core.gesture_executor import get_gesture_executor
         try:
@@ -565,17 +680,23 @@ class GestroKeyApp(QMainWindow):
             self.logger.error(f"释放按键状态时出错: {e}")
 
     def _notify_settings_changed(self):
-        """通知设置已更改，需要更新内存和UI"""
-        # 重新加载设置到内存
-        settings = get_settings()
-        settings.load()
-        self.logger.info("已重新加载设置到内存")
-        
+        """通知设置已更改，刷新设置页面UI（运行中的模块通过订阅自动获得新设置）"""
         # 刷新设置页面UI
         if hasattr(self, "settings_page"):
             self.settings_page._load_settings()
             self.logger.info("已刷新设置页面UI")
 
+    def export_trace(self):
+        """导出性能追踪数据到日志目录"""
+        try:
+            path = dump_to_log_dir()
+            self.logger.info(f"性能追踪已导出: {path}")
+            if hasattr(self, "tray_icon") and self.tray_icon:
+                self.tray_icon.showMessage(APP_NAME, f"性能追踪已导出到: {path}", QSystemTrayIcon.MessageIcon.Information, 3000)
+        except Exception as e:
+            self.logger.error(f"导出性能追踪失败: {e}")
+            self.show_global_dialog(self, "error", "导出失败", f"导出性能追踪失败: {e}")
+
     def _minimize_to_tray(self):
         """最小化到托盘"""
         self.hide()
@@ -643,8 +764,14 @@ class GestroKeyApp(QMainWindow):
             self._force_exit()
     
     def _force_exit(self):
-        """强制退出程序"""
+        """强制退出程序，退出前写入全部等待中的保存请求，写入失败时告知用户"""
         self.logger.info("程序正常关闭")
+        get_metrics_exporter().stop()
+        if not get_writer().flush():
+            errors = get_writer().get_errors()
+            details = "\n".join(f"{path}: {error}" for path, error in errors.items()) or "写入超时"
+            self.logger.error(f"退出前写入文件失败: {details}")
+            QMessageBox.critical(self, "错误", f"以下文件写入失败，未保存的更改已丢失：\n{details}")
         import sys
         sys.exit(0)
 
@@ -656,11 +783,15 @@ class GestroKeyApp(QMainWindow):
 
         if button_text == "是":
             try:
-                # 保存设置（如果设置页面有未保存的更改）
+                # 保存设置（设置页面有未保存的更改，或上次保存尚未成功写入）
+                settings = get_settings()
+                need_save = settings.has_changes()
                 if hasattr(self, "settings_page") and self.settings_page.has_unsaved_changes():
-                    self.logger.info("正在保存设置...")
                     self.settings_page._apply_settings()
-                    if self.settings_page.settings.save():
+                    need_save = True
+                if need_save:
+                    self.logger.info("正在保存设置...")
+                    if settings.save(wait=True):
                         self.logger.info("设置已保存")
                     else:
                         self.logger.error("保存设置失败")
@@ -675,7 +806,7 @@ class GestroKeyApp(QMainWindow):
                 gesture_library = get_gesture_library()
                 if save_success and gesture_library.has_changes():
                     self.logger.info("正在保存手势库...")
-                    if gesture_library.save():
+                    if gesture_library.save(wait=True):
                         self.logger.info("手势库已保存")
                     else:
                         self.logger.error("保存手势库失败")
@@ -744,6 +875,8 @@ class GestroKeyApp(QMainWindow):
 
     def on_drawing_state_changed(self, is_active):
         self.is_drawing_active = is_active
+        # 控制台页面自己创建的绘制管理器也由主窗口持有
+        self.drawing_manager = self.console_page.drawing_manager
         if hasattr(self, "tray_icon") and self.tray_icon:
             self.tray_icon.update_drawing_state(is_active)
             self.logger.debug(f"托盘图标状态已更新: {'监听中' if is_active else '已停止'}")
@@ -755,9 +888,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='GestroKey - 手势控制应用程序')
     parser.add_argument('--silent', '-s', action='store_true', 
                        help='静默启动：自动开始监听并最小化到托盘')
+    parser.add_argument('--profile-startup', nargs='?', const='', default=None, metavar='PATH',
+                       help='记录启动各阶段耗时并写入JSON报告，未指定路径时写入日志目录')
+    parser.add_argument('--profile-imports', action='store_true',
+                       help='与 --profile-startup 一起使用，额外记录模块导入耗时')
     args = parser.parse_args()
 
-    app = QApplication(sys.argv)
+    with startup_profiler.phase("create_qapplication"):
+        app = QApplication(sys.argv)
 
     logger = get_logger("Main")
     if args.silent:
@@ -765,9 +903,11 @@ if __name__ == "__main__":
     else:
         logger.info("启动GestroKey应用程序")
 
-    window = GestroKeyApp(silent_start=args.silent)
+    with startup_profiler.phase("create_main_window"):
+        window = GestroKeyApp(silent_start=args.silent)
     
     if not args.silent:
         window.show()
 
+    QTimer.singleShot(0, lambda: startup_profiler.mark("event_loop_started"))
     sys.exit(app.exec())
\ No newline at end of file
@@ -9,8 +9,19 @@ from qtpy.QtWidgets import (
 
 from core.brush.manager import DrawingManager
 from core.logger import get_logger
+from core.metrics import (
+    EXECUTOR_QUEUE_DEPTH, GESTURES_RECOGNIZED, INPUT_EVENTS_DROPPED, INPUT_EVENTS_RECEIVED,
+    LOG_QUEUE_DEPTH, OVERLAY_FRAME_SECONDS, RECOGNITION_SECONDS, MetricsWindow, get_metrics
+)
 from core.system_monitor import SystemMonitor, format_bytes
 
+# 性能面板的统计窗口（秒），速率和分位数按最近这段时间计算
+PERFORMANCE_WINDOW = 60.0
+
+
+def _format_ms(seconds):
+    return "--" if seconds is None else f"{seconds * 1000:.1f}ms"
+
 
 def create_styled_progress_bar(color_theme="default"):
     progress_bar = QProgressBar()
@@ -37,20 +48,24 @@ def create_styled_progress_bar(color_theme="default"):
 class ConsolePage(QWidget):
     drawing_state_changed = Signal(bool)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, drawing_manager=None):
         super().__init__(parent)
         self.logger = get_logger("ConsolePage")
 
-        self.drawing_manager = None
-        self.is_drawing_active = False
+        # 静默启动时主窗口已经创建并启动了绘制管理器，页面创建后直接沿用
+        self.drawing_manager = drawing_manager
+        self.is_drawing_active = bool(drawing_manager and drawing_manager.is_active)
 
         self.system_monitor = SystemMonitor(update_interval=1500)
+        self.metrics = get_metrics()
+        self._metrics_window = MetricsWindow(PERFORMANCE_WINDOW)
         self._assets_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "images", "ui")
 
         self._setup_ui()
+        self._update_drawing_ui()
 
+        # 采样只在页面可见时进行，由 showEvent/hideEvent 控制
         self.system_monitor.dataUpdated.connect(self.update_system_info)
-        self.system_monitor.start()
 
     def _get_icon_path(self, icon_name):
         icon_path = os.path.join(self._assets_dir, icon_name)
@@ -106,6 +121,9 @@ class ConsolePage(QWidget):
 
         layout.addLayout(cards_layout)
 
+        layout.addSpacerItem(QSpacerItem(20, 15, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Fixed))
+        layout.addWidget(self._create_performance_panel())
+
         layout.addSpacerItem(QSpacerItem(20, 20, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding))
 
         self.setLayout(layout)
@@ -152,6 +170,73 @@ class ConsolePage(QWidget):
 
         return card
 
+    def _create_performance_panel(self):
+        panel = QFrame()
+        panel.setStyleSheet("""
+            QFrame {
+                background-color: rgb(52, 73, 94);
+                border-radius: 8px;
+                margin: 2px;
+            }
+            QLabel { color: white; }
+        """)
+
+        panel_layout = QGridLayout(panel)
+        panel_layout.setContentsMargins(12, 10, 12, 10)
+        panel_layout.setHorizontalSpacing(20)
+        panel_layout.setVerticalSpacing(6)
+
+        title_label = QLabel("性能")
+        title_label.setStyleSheet("font-size: 12pt; font-weight: bold;")
+        panel_layout.addWidget(title_label, 0, 0, 1, 4)
+
+        items = [
+            ("gestures", "每分钟手势", "最近一分钟识别成功并执行的手势数"),
+            ("recognition", "识别耗时 p50/p99", "最近一分钟手势识别耗时的中位数和99分位"),
+            ("input", "输入事件/秒", "绘制时每秒收到的鼠标移动事件数，括号内为丢弃数"),
+            ("frame", "绘制帧耗时 p50/p99", "最近一分钟绘制覆盖层每帧的绘制耗时"),
+            ("log_queue", "日志队列", "等待写入的日志条数"),
+            ("executor_queue", "执行器队列", "等待完成的快捷键执行数"),
+        ]
+        self._performance_labels = {}
+        for index, (key, title, tooltip) in enumerate(items):
+            row, column = 1 + index // 2, (index % 2) * 2
+            name_label = QLabel(title)
+            name_label.setToolTip(tooltip)
+            value_label = QLabel("--")
+            value_label.setStyleSheet("font-weight: bold;")
+            value_label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            panel_layout.addWidget(name_label, row, column)
+            panel_layout.addWidget(value_label, row, column + 1)
+            self._performance_labels[key] = value_label
+
+        return panel
+
+    def update_performance(self, snapshot):
+        """根据指标快照更新性能面板"""
+        window = self._metrics_window
+        window.add(snapshot)
+        labels = self._performance_labels
+
+        gesture_rate = window.rate(GESTURES_RECOGNIZED)
+        labels["gestures"].setText("--" if gesture_rate is None else f"{gesture_rate * 60:.1f}")
+
+        for key, name in (("recognition", RECOGNITION_SECONDS), ("frame", OVERLAY_FRAME_SECONDS)):
+            histogram = window.histogram(name)
+            if histogram is None or histogram.count == 0:
+                labels[key].setText("--")
+            else:
+                labels[key].setText(f"{_format_ms(histogram.percentile(50))} / {_format_ms(histogram.percentile(99))}")
+
+        received = window.rate(INPUT_EVENTS_RECEIVED)
+        dropped = window.rate(INPUT_EVENTS_DROPPED)
+        labels["input"].setText("--" if received is None else f"{received:.0f} ({dropped:.0f})")
+
+        log_depth = snapshot.get(LOG_QUEUE_DEPTH)
+        labels["log_queue"].setText("--" if log_depth is None else str(log_depth))
+        executor_depth = snapshot.get(EXECUTOR_QUEUE_DEPTH)
+        labels["executor_queue"].setText("--" if executor_depth is None else f"{executor_depth:.0f}")
+
     def update_system_info(self, data):
         cpu_percent = data["cpu_percent"]
         self.cpu_card._value_label.setText(f"{cpu_percent:.1f}%")
@@ -171,6 +256,19 @@ class ConsolePage(QWidget):
         process_memory = data["process_memory"]
         self.process_card._value_label.setText(f"CPU: {process_cpu:.1f}% | 内存: {process_memory:.1f}%")
 
+        # 性能面板与系统信息同步刷新，只在页面可见时进行
+        self.update_performance(self.metrics.snapshot())
+
+    def _update_drawing_ui(self):
+        if self.is_drawing_active:
+            self.status_label.setText("绘制中 - 使用鼠标右键进行绘制")
+            self.action_button.setText("停止绘制")
+            self._set_button_icon(self.action_button, "stop-drawing.svg")
+        else:
+            self.status_label.setText("准备就绪")
+            self.action_button.setText("开始绘制")
+            self._set_button_icon(self.action_button, "start-drawing.svg")
+
     def toggle_drawing(self):
         if self.is_drawing_active:
             self.stop_drawing()
@@ -185,10 +283,8 @@ class ConsolePage(QWidget):
             success = self.drawing_manager.start()
 
             if success:
-                self.status_label.setText("绘制中 - 使用鼠标右键进行绘制")
-                self.action_button.setText("停止绘制")
-                self._set_button_icon(self.action_button, "stop-drawing.svg")
                 self.is_drawing_active = True
+                self._update_drawing_ui()
                 self.drawing_state_changed.emit(True)
 
         except Exception as e:
@@ -201,16 +297,26 @@ class ConsolePage(QWidget):
                 success = self.drawing_manager.stop()
 
                 if success:
-                    self.status_label.setText("准备就绪")
-                    self.action_button.setText("开始绘制")
-                    self._set_button_icon(self.action_button, "start-drawing.svg")
                     self.is_drawing_active = False
+                    self._update_drawing_ui()
                     self.drawing_state_changed.emit(False)
 
             except Exception as e:
                 self.logger.exception(f"停止绘制功能时发生错误: {e}")
                 self.status_label.setText(f"停止失败: {str(e)}")
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        # 隐藏期间的数据不计入统计窗口
+        self._metrics_window.clear()
+        self._metrics_window.add(self.metrics.snapshot())
+        self.system_monitor.start()
+
+    def hideEvent(self, event):
+        # 切换到其他页面、最小化或隐藏到托盘时都会收到隐藏事件
+        super().hideEvent(event)
+        self.system_monitor.stop()
+
     def closeEvent(self, event):
         self.stop_drawing()
 
@@ -1,7 +1,6 @@
 import sys
 import os
 import math
-import copy
 from qtpy.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFrame, QToolButton
 from qtpy.QtCore import Qt, QPoint, Signal, QTimer, QSize
 from qtpy.QtGui import QPainter, QPen, QColor, QPolygon, QTransform, QIcon
@@ -9,6 +8,12 @@ from qtpy.QtSvgWidgets import QSvgWidget
 
 from core.logger import get_logger
 from core.path_analyzer import PathAnalyzer
+from ui.gestures.path_history import (
+    AddPointCommand, DeletePointCommand, MovePointCommand, PathHistory, ReplacePathsCommand
+)
+
+# 点索引的格子大小（视图坐标）
+POINT_INDEX_CELL_SIZE = 32
 
 
 class GestureDrawingWidget(QWidget):
@@ -25,8 +30,13 @@ class GestureDrawingWidget(QWidget):
         self.current_path = []
         self.completed_paths = []
         
-        self.path_history = []
-        self.history_index = -1
+        self.history = PathHistory()
+        self._stroke_base = None
+        self._drag_origin = None
+        
+        # 点的网格索引和连接的邻接表，路径变化后在下一次使用时重建
+        self._point_grid = None
+        self._point_neighbours = {}
         
         self.current_tool = "brush"
         self.selected_point_index = -1
@@ -200,24 +210,22 @@ class GestureDrawingWidget(QWidget):
         self.setCursor(Qt.CursorShape.PointingHandCursor)
         
     def undo_action(self):
-        if self.history_index > 0:
-            self.history_index -= 1
-            self.completed_paths = copy.deepcopy(self.path_history[self.history_index])
+        if self.history.undo(self.completed_paths) is not None:
+            self._invalidate_point_index()
             self.update()
             self.update_toolbar_buttons()
             self.pathUpdated.emit()
             
     def redo_action(self):
-        if self.history_index < len(self.path_history) - 1:
-            self.history_index += 1
-            self.completed_paths = copy.deepcopy(self.path_history[self.history_index])
+        if self.history.redo(self.completed_paths) is not None:
+            self._invalidate_point_index()
             self.update()
             self.update_toolbar_buttons()
             self.pathUpdated.emit()
             
     def update_toolbar_buttons(self):
-        self.undo_btn.setEnabled(self.history_index > 0)
-        self.redo_btn.setEnabled(self.history_index < len(self.path_history) - 1)
+        self.undo_btn.setEnabled(self.history.can_undo())
+        self.redo_btn.setEnabled(self.history.can_redo())
         self.test_btn.setEnabled(bool(self.completed_paths))
     
     def test_similarity(self):
@@ -232,18 +240,10 @@ class GestureDrawingWidget(QWidget):
         dialog = TestSimilarityDialog(reference_path, self)
         dialog.exec()
         
-    def save_to_history(self):
-        if self.history_index < len(self.path_history) - 1:
-            self.path_history = self.path_history[:self.history_index + 1]
-        
-        self.path_history.append(copy.deepcopy(self.completed_paths))
-        self.history_index = len(self.path_history) - 1
-        
-        max_history = 50
-        if len(self.path_history) > max_history:
-            self.path_history = self.path_history[-max_history:]
-            self.history_index = len(self.path_history) - 1
-            
+    def save_to_history(self, command):
+        """记录一次已经完成的编辑，command 只包含这次编辑改变的内容"""
+        self._invalidate_point_index()
+        self.history.push(command)
         self.update_toolbar_buttons()
         
     def keyPressEvent(self, event):
@@ -371,7 +371,9 @@ class GestureDrawingWidget(QWidget):
                     # 画笔工具 - 正常绘制，开始新笔画时清除之前的内容
                     if not self.drawing:  # 只在开始新笔画时清除
                         self.current_path = []
+                        self._stroke_base = self.completed_paths
                         self.completed_paths = []
+                        self._invalidate_point_index()
                     self.drawing = True
                     # 调整坐标为绘制区域坐标，然后转换为视图坐标
                     adjusted_pos = self._adjust_for_drawing_area(event.pos())
@@ -422,13 +424,17 @@ class GestureDrawingWidget(QWidget):
                 if formatted_path and formatted_path.get('points'):
                     self.completed_paths.append(formatted_path)
                     # 保存到历史记录
-                    self.save_to_history()
+                    self.save_to_history(ReplacePathsCommand(self._stroke_base or [], self.completed_paths))
                     # 绘制完成后重置视图以适应新路径
                     self._reset_view()
                     # 自动使用此路径
                     self.pathCompleted.emit(formatted_path)
                     self.logger.info(f"自动使用格式化路径：{len(formatted_path.get('points', []))}个关键点")
             
+            if not self.completed_paths and self._stroke_base:
+                # 笔画太短没有生成路径，但原有路径已被清除，同样记录以便撤回
+                self.save_to_history(ReplacePathsCommand(self._stroke_base, []))
+            self._stroke_base = None
             self.current_path = []
             self.update()
             
@@ -436,8 +442,13 @@ class GestureDrawingWidget(QWidget):
             # 点击工具 - 完成拖拽
             self.dragging_point = False
             self.setCursor(Qt.CursorShape.PointingHandCursor)
-            # 保存到历史记录
-            self.save_to_history()
+            # 保存到历史记录，只记录这个点的新旧坐标
+            path_index = self.selected_point_index // 1000
+            point_index = self.selected_point_index % 1000
+            new_point = self.completed_paths[path_index]['points'][point_index]
+            if self._drag_origin is not None and tuple(new_point) != tuple(self._drag_origin):
+                self.save_to_history(MovePointCommand(path_index, point_index, self._drag_origin, new_point))
+            self._drag_origin = None
             
             # 发送路径更新信号，通知父组件路径已修改
             self.pathUpdated.emit()
@@ -548,6 +559,7 @@ class GestureDrawingWidget(QWidget):
             if self.selected_point_index == clicked_point_index:
                 # 已经选中的点，开始拖拽
                 self.dragging_point = True
+                self._drag_origin = self.completed_paths[path_index]['points'][point_index]
                 self.setCursor(Qt.CursorShape.ClosedHandCursor)
                 self.logger.info(f"开始拖拽点 {clicked_point_index}")
             else:
@@ -562,30 +574,73 @@ class GestureDrawingWidget(QWidget):
             self.update()  # 重绘以清除选中状态
             
     def _find_point_at_position(self, screen_pos, tolerance=15):
-        """查找指定位置的点，返回点索引，如果没找到返回-1"""
+        """查找指定位置的点，返回点索引，如果没找到返回-1
+        
+        通过点的网格索引只检查附近格子中的点，多个点都在范围内时返回最近的一个。
+        """
         if not self.completed_paths:
             return -1
             
-        # 调整鼠标位置到绘制区域坐标
+        # 调整鼠标位置到绘制区域坐标，再转换为视图坐标（索引和容差都在视图坐标系中）
         adjusted_pos = self._adjust_for_drawing_area(screen_pos)
-        
-        # 将调整后的坐标转换为视图坐标
         view_pos = self._screen_to_view(adjusted_pos)
-        
-        # 遍历所有路径的所有点
-        for path_index, path in enumerate(self.completed_paths):
-            points = path.get('points', [])
-            if not points:
-                continue
+        x, y = view_pos.x(), view_pos.y()
+        
+        grid = self._get_point_grid()
+        best_index = -1
+        best_distance = tolerance * tolerance
+        for cell_x in range(int((x - tolerance) // POINT_INDEX_CELL_SIZE), int((x + tolerance) // POINT_INDEX_CELL_SIZE) + 1):
+            for cell_y in range(int((y - tolerance) // POINT_INDEX_CELL_SIZE), int((y + tolerance) // POINT_INDEX_CELL_SIZE) + 1):
+                for global_index, point_x, point_y in grid.get((cell_x, cell_y), ()):
+                    distance = (x - point_x) ** 2 + (y - point_y) ** 2
+                    if distance < best_distance or (distance == best_distance and
+                                                    (best_index < 0 or global_index < best_index)):
+                        best_index = global_index
+                        best_distance = distance
+        return best_index
+        
+    def _invalidate_point_index(self, structure=True):
+        """路径变化后丢弃点索引；只移动点时（structure=False）连接不变，保留邻接表"""
+        self._point_grid = None
+        if structure:
+            self._point_neighbours = {}
             
-            # 检查每个点的位置（在视图坐标系中）
-            for point_index, point in enumerate(points):
-                # 计算距离（在视图坐标系中）
-                distance = ((view_pos.x() - point[0]) ** 2 + (view_pos.y() - point[1]) ** 2) ** 0.5
-                if distance <= tolerance:
-                    # 返回全局点索引（路径索引 * 1000 + 点索引）
-                    return path_index * 1000 + point_index
-        return -1
+    def _get_point_grid(self):
+        """获取点的网格索引：格子坐标 -> [(全局点索引, x, y)]"""
+        if self._point_grid is None:
+            grid = {}
+            for path_index, path in enumerate(self.completed_paths):
+                for point_index, point in enumerate(path.get('points', [])):
+                    cell = (int(point[0] // POINT_INDEX_CELL_SIZE), int(point[1] // POINT_INDEX_CELL_SIZE))
+                    grid.setdefault(cell, []).append((path_index * 1000 + point_index, point[0], point[1]))
+            self._point_grid = grid
+        return self._point_grid
+        
+    def _get_point_neighbours(self, path_index):
+        """获取路径的邻接表 (前一个点, 后一个点, 任意相邻点)，每个都是 点索引 -> 相邻点索引
+        
+        与按连接顺序查找的结果相同：每个点取第一个符合条件的连接。
+        """
+        neighbours = self._point_neighbours.get(path_index)
+        if neighbours is None:
+            path = self.completed_paths[path_index]
+            point_count = len(path.get('points', []))
+            previous, following, adjacent = {}, {}, {}
+            for conn in path.get('connections', []):
+                from_idx = conn.get('from')
+                to_idx = conn.get('to')
+                from_valid = isinstance(from_idx, int) and 0 <= from_idx < point_count
+                to_valid = isinstance(to_idx, int) and 0 <= to_idx < point_count
+                if from_valid:
+                    previous.setdefault(to_idx, from_idx)
+                if to_valid:
+                    following.setdefault(from_idx, to_idx)
+                    adjacent.setdefault(from_idx, to_idx)
+                if from_valid and to_idx != from_idx:
+                    adjacent.setdefault(to_idx, from_idx)
+            neighbours = (previous, following, adjacent)
+            self._point_neighbours[path_index] = neighbours
+        return neighbours
         
 
     def _add_new_point(self, screen_pos):
@@ -601,6 +656,7 @@ class GestureDrawingWidget(QWidget):
                 'connections': []  # 单点没有连接
             }
             self.completed_paths.append(new_path)
+            command = ReplacePathsCommand([], self.completed_paths)
             updated_path = new_path
             should_emit = True  # 新路径需要发送信号
         else:
@@ -613,9 +669,11 @@ class GestureDrawingWidget(QWidget):
                 
             # 添加新点，使用视图坐标
             new_point_index = len(last_path['points'])
-            last_path['points'].append((view_pos.x(), view_pos.y()))
+            new_point = (view_pos.x(), view_pos.y())
+            last_path['points'].append(new_point)
             
             # 添加连接（如果不是第一个点）
+            new_connection = None
             if new_point_index > 0:
                 # 连接前一个点到新点
                 new_connection = {
@@ -624,11 +682,12 @@ class GestureDrawingWidget(QWidget):
                     'type': 'line'  # 添加连接类型
                 }
                 last_path['connections'].append(new_connection)
+            command = AddPointCommand(len(self.completed_paths) - 1, new_point, new_connection)
             
             updated_path = last_path
             should_emit = False  # 修改现有路径不发送信号，避免替换整个路径
             
-        self.save_to_history()
+        self.save_to_history(command)
         
         # 只在创建新路径时发送信号
         if should_emit:
@@ -665,6 +724,7 @@ class GestureDrawingWidget(QWidget):
             
             # 更新点位置，使用视图坐标
             self.completed_paths[path_index]['points'][point_index] = (view_pos.x(), view_pos.y())
+            self._invalidate_point_index(structure=False)
             self.update()
     
     def _apply_angle_snap(self, path_index, point_index, new_pos, use_left_shift):
@@ -674,41 +734,15 @@ class GestureDrawingWidget(QWidget):
             use_left_shift: True表示左Shift（参考前一个点），False表示右Shift（参考后一个点）
         """
         points = self.completed_paths[path_index]['points']
-        connections = self.completed_paths[path_index].get('connections', [])
-        
-        # 根据Shift键方向查找参考点
-        reference_point = None
+        previous, following, adjacent = self._get_point_neighbours(path_index)
         
-        if use_left_shift:
-            # 左Shift：查找指向当前点的连接（前一个点）
-            for conn in connections:
-                if conn.get('to') == point_index:
-                    from_idx = conn.get('from')
-                    if from_idx < len(points):
-                        reference_point = points[from_idx]
-                        break
-        else:
-            # 右Shift：查找从当前点出发的连接（后一个点）
-            for conn in connections:
-                if conn.get('from') == point_index:
-                    to_idx = conn.get('to')
-                    if to_idx < len(points):
-                        reference_point = points[to_idx]
-                        break
+        # 根据Shift键方向查找参考点：左Shift参考前一个点，右Shift参考后一个点
+        reference_index = (previous if use_left_shift else following).get(point_index)
         
         # 如果按照方向找不到参考点，尝试找另一个方向（处理开头/结尾情况）
-        if reference_point is None:
-            for conn in connections:
-                if conn.get('from') == point_index:
-                    to_idx = conn.get('to')
-                    if to_idx < len(points):
-                        reference_point = points[to_idx]
-                        break
-                elif conn.get('to') == point_index:
-                    from_idx = conn.get('from')
-                    if from_idx < len(points):
-                        reference_point = points[from_idx]
-                        break
+        if reference_index is None:
+            reference_index = adjacent.get(point_index)
+        reference_point = points[reference_index] if reference_index is not None else None
         
         # 如果仍然没有参考点，不进行约束
         if reference_point is None:
@@ -767,11 +801,14 @@ class GestureDrawingWidget(QWidget):
             connections = path.get('connections', [])
             
             # 删除点
+            deleted_point = points[point_index]
             del points[point_index]
             
             # 如果路径没有点了，删除整个路径
             if not points:
                 del self.completed_paths[path_index]
+                command = DeletePointCommand(path_index, point_index, deleted_point, connections, [],
+                                             removed_path=path)
             else:
                 # 更新连接关系：找到涉及被删除点的连接，建立新的桥接连接
                 new_connections = []
@@ -815,12 +852,13 @@ class GestureDrawingWidget(QWidget):
                             })
                 
                 path['connections'] = new_connections
+                command = DeletePointCommand(path_index, point_index, deleted_point, connections, new_connections)
             
             # 清除选择状态
             self.selected_point_index = -1
             
             # 保存到历史记录
-            self.save_to_history()
+            self.save_to_history(command)
             
             # 发送路径更新信号
             self.pathUpdated.emit()
@@ -1028,13 +1066,12 @@ class GestureDrawingWidget(QWidget):
         self.current_path = []
         self.completed_paths = []
         # 重置历史记录
-        self.path_history = []
-        self.history_index = -1
+        self.history.clear()
+        self._invalidate_point_index()
         # 重置到默认视图
         self.view_scale = 1.0
         self.view_offset = QPoint(0, 0)
-        # 保存初始空状态到历史记录
-        self.save_to_history()
+        self.update_toolbar_buttons()
         self.update()
         
 
@@ -1045,15 +1082,13 @@ class GestureDrawingWidget(QWidget):
             self.current_path = []
             self.completed_paths = []
             
-            # 重置历史记录
-            self.path_history = []
-            self.history_index = -1
+            # 重置历史记录，加载的路径是历史的起点
+            self.history.clear()
             
             # 加载新路径
             self.completed_paths = [path]
-            
-            # 将加载的路径保存为第一个历史记录
-            self.save_to_history()
+            self._invalidate_point_index()
+            self.update_toolbar_buttons()
             
             # 重置视图以适应新路径
             self._reset_view()
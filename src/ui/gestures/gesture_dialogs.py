@@ -1,11 +1,16 @@
 import copy
-from qtpy.QtCore import Qt, QTimer, Signal
+import threading
+
+import numpy as np
+from qtpy.QtCore import QObject, Qt, QTimer, Signal
 from qtpy.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit, 
-    QGroupBox, QMessageBox, QComboBox, QDialogButtonBox, QWidget, QProgressBar
+    QGroupBox, QMessageBox, QComboBox, QDialogButtonBox, QWidget, QProgressBar, QGridLayout,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
 )
 from qtpy.QtGui import QPainter, QPen, QColor
 
+from core.gesture_calibration import CALIBRATION_KEY, calibrated_threshold
 from core.logger import get_logger
 from ui.gestures.gestures import get_gesture_library
 from ui.gestures.drawing_widget import GestureDrawingWidget
@@ -105,10 +110,13 @@ class TriggerPathEditDialog(QDialog):
             
         try:
             if self.is_editing:
-                path_data = self.gesture_library.trigger_paths[self.path_key]
+                path_data = dict(self.gesture_library.trigger_paths[self.path_key])
                 path_data['name'] = name
                 if self.current_path:
                     path_data['path'] = self.current_path
+                    # 路径变化后原来的校准结果不再适用
+                    path_data.pop(CALIBRATION_KEY, None)
+                self.gesture_library.trigger_paths[self.path_key] = path_data
             else:
                 path_id = self.gesture_library._get_next_path_id()
                 path_key = str(path_id)
@@ -121,7 +129,7 @@ class TriggerPathEditDialog(QDialog):
                 self.gesture_library.trigger_paths[path_key] = new_path_data
                 self.path_key = path_key
                 
-            self.gesture_library.mark_data_changed("trigger_paths")
+            self.gesture_library.mark_data_changed("trigger_paths", self.path_key)
             
             self.accept()
             
@@ -221,10 +229,11 @@ class ExecuteActionEditDialog(QDialog):
             
         try:
             if self.is_editing:
-                action_data = self.gesture_library.execute_actions[self.action_key]
+                action_data = dict(self.gesture_library.execute_actions[self.action_key])
                 action_data['name'] = name
                 action_data['type'] = action_type
                 action_data['value'] = value
+                self.gesture_library.execute_actions[self.action_key] = action_data
             else:
                 action_id = self.gesture_library._get_next_action_id()
                 action_key = str(action_id)
@@ -238,7 +247,7 @@ class ExecuteActionEditDialog(QDialog):
                 self.gesture_library.execute_actions[action_key] = new_action_data
                 self.action_key = action_key
                 
-            self.gesture_library.mark_data_changed("execute_actions")
+            self.gesture_library.mark_data_changed("execute_actions", self.action_key)
             
             self.accept()
             
@@ -246,6 +255,121 @@ class ExecuteActionEditDialog(QDialog):
             self.logger.error(f"保存操作时出错: {e}")
             QMessageBox.critical(self, "错误", f"保存操作失败: {str(e)}")
 
+# 相似度排名显示的条数
+RANKING_SIZE = 5
+# 绘制过程中提交实时排名的最短间隔（毫秒）
+LIVE_RANKING_INTERVAL = 80
+
+
+class SimilarityRanker(QObject):
+    """相似度排名器
+    
+    在后台线程中把测试路径与参考路径和整个已保存的手势库比较。线程启动时一次性
+    取得全部触发路径的描述子，之后每次请求只计算测试路径的描述子并对全部模板做
+    一次向量化评分。请求会被合并，线程忙时只保留最新的一次。
+    """
+    
+    rankingReady = Signal(int, object)  # (请求序号, {"reference", "ranking", "total"})
+    
+    def __init__(self, reference_path, parent=None):
+        super().__init__(parent)
+        self.logger = get_logger("SimilarityRanker")
+        self.gesture_library = get_gesture_library()
+        self.path_analyzer = PathAnalyzer()
+        self.reference_path = copy.deepcopy(reference_path)
+        self.labels = self._collect_labels()
+        
+        self._condition = threading.Condition()
+        self._request = None
+        self._sequence = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="SimilarityRanker", daemon=True)
+        self._thread.start()
+        
+    def _collect_labels(self):
+        """收集各触发路径的名称和映射的操作名称：路径键 -> (路径名称, 操作名称或None)"""
+        library = self.gesture_library
+        action_names = {}
+        for mapping in library.saved_gesture_mappings.values():
+            action = library.saved_execute_actions.get(str(mapping.get("execute_action_id")))
+            path_id = str(mapping.get("trigger_path_id"))
+            if action and path_id not in action_names:
+                action_names[path_id] = action.get("name", "")
+        return {
+            key: (entry.get("name", f"路径{key}"), action_names.get(key))
+            for key, entry in library.saved_trigger_paths.items()
+        }
+        
+    def submit(self, path=None, raw_points=None):
+        """提交格式化路径或原始点（绘制过程中），返回请求序号"""
+        with self._condition:
+            self._sequence += 1
+            self._request = (self._sequence, path, raw_points)
+            self._condition.notify()
+            return self._sequence
+            
+    def cancel(self):
+        """丢弃等待中的请求，之前提交的请求的结果都应被忽略，返回新的序号"""
+        with self._condition:
+            self._sequence += 1
+            self._request = None
+            return self._sequence
+            
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._request = None
+            self._condition.notify()
+            
+    def _run(self):
+        keys, templates = self.gesture_library.get_trigger_templates()
+        reference = self.path_analyzer.compute_descriptor(self.reference_path)
+        self.logger.debug(f"已准备 {len(keys)} 个触发路径模板")
+        
+        while True:
+            with self._condition:
+                while self._request is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                (sequence, path, raw_points), self._request = self._request, None
+                
+            try:
+                result = self._rank(path, raw_points, keys, templates, reference)
+            except Exception as e:
+                self.logger.error(f"计算相似度排名失败: {e}")
+                continue
+            if result is None:
+                continue
+            try:
+                self.rankingReady.emit(sequence, result)
+            except RuntimeError:
+                return  # 对话框已关闭
+                
+    def _rank(self, path, raw_points, keys, templates, reference):
+        if path is None:
+            path = self.path_analyzer.format_raw_path(raw_points)
+        descriptor = self.path_analyzer.compute_descriptor(path)
+        if descriptor is None:
+            return None
+            
+        scores = self.path_analyzer.calculate_descriptor_similarities(descriptor, templates)
+        count = min(RANKING_SIZE, len(keys))
+        top = np.argsort(-scores, kind="stable")[:count]
+        ranking = []
+        for index in top:
+            name, action_name = self.labels.get(keys[index], (f"路径{keys[index]}", None))
+            ranking.append((keys[index], name, action_name, float(scores[index])))
+        return {
+            "reference": (
+                self.path_analyzer.calculate_descriptor_similarity(reference, descriptor)
+                if reference is not None else None
+            ),
+            "ranking": ranking,
+            "total": len(keys),
+        }
+
+
 class TestSimilarityDialog(QDialog):
     def __init__(self, reference_path, parent=None):
         super().__init__(parent)
@@ -253,19 +377,28 @@ class TestSimilarityDialog(QDialog):
         self.test_path = None
         self.similarity_score = 0.0
         self.threshold = 0.70
-        
-        self.path_analyzer = PathAnalyzer()
+        self.use_calibration = True
         
         try:
             settings = get_settings()
             self.threshold = settings.get("gesture.similarity_threshold", 0.70)
+            self.use_calibration = settings.get("gesture.calibrated_thresholds", True)
         except:
             self.threshold = 0.70
             
+        # 手势库的模板在对话框打开时由后台线程一次性准备好
+        self.ranker = SimilarityRanker(reference_path, self)
+        self.ranker.rankingReady.connect(self._on_ranking_ready)
+        self._ranking_sequence = 0
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(LIVE_RANKING_INTERVAL)
+        self.live_timer.timeout.connect(self._submit_live_path)
+            
         self.setWindowTitle("测试手势相似度")
         self.setModal(True)
-        self.resize(800, 600)
-        self.setMinimumSize(700, 500)
+        self.resize(800, 760)
+        self.setMinimumSize(700, 660)
         
         self._init_ui()
         
@@ -294,6 +427,9 @@ class TestSimilarityDialog(QDialog):
         similarity_panel = self._create_similarity_panel()
         layout.addWidget(similarity_panel)
         
+        ranking_panel = self._create_ranking_panel()
+        layout.addWidget(ranking_panel)
+        
         button_layout = QHBoxLayout()
         
         clear_btn = QPushButton("清除测试")
@@ -337,6 +473,7 @@ class TestSimilarityDialog(QDialog):
         
         self.test_drawing = TestDrawingWidget()
         self.test_drawing.pathCompleted.connect(self._on_test_path_completed)
+        self.test_drawing.strokeUpdated.connect(self._on_stroke_updated)
         layout.addWidget(self.test_drawing, 1)
         
         return panel
@@ -383,25 +520,93 @@ class TestSimilarityDialog(QDialog):
         
         return panel
         
+    def _create_ranking_panel(self):
+        panel = QWidget()
+        panel.setStyleSheet("background-color: #ffffff; border-radius: 8px;")
+        layout = QGridLayout(panel)
+        layout.setContentsMargins(20, 10, 20, 10)
+        layout.setHorizontalSpacing(15)
+        layout.setVerticalSpacing(4)
+        layout.setColumnStretch(1, 1)
+        layout.setColumnStretch(2, 1)
+        
+        self.ranking_title = QLabel("手势库排名（正在准备模板...）")
+        self.ranking_title.setStyleSheet("font-size: 13px; font-weight: bold; color: #495057;")
+        layout.addWidget(self.ranking_title, 0, 0, 1, 5)
+        
+        for column, text in enumerate(("排名", "触发路径", "映射操作", "相似度", "与阈值相比")):
+            header = QLabel(text)
+            header.setStyleSheet("font-size: 12px; color: #6c757d;")
+            layout.addWidget(header, 1, column)
+            
+        self.ranking_rows = []
+        for row in range(RANKING_SIZE):
+            labels = [QLabel("") for _ in range(5)]
+            labels[0].setText(f"{row + 1}")
+            for column, label in enumerate(labels):
+                label.setStyleSheet("font-size: 12px; color: #333;")
+                layout.addWidget(label, row + 2, column)
+            self.ranking_rows.append(labels)
+            
+        return panel
+        
     def _on_test_path_completed(self, path):
         self.test_path = path
-        self._calculate_similarity()
+        self.live_timer.stop()
+        self._ranking_sequence = self.ranker.submit(path=path)
         
-    def _calculate_similarity(self):
-        if not self.test_path or not self.reference_path:
-            return
-            
-        try:
-            similarity = self.path_analyzer.calculate_similarity(
-                self.reference_path, self.test_path
-            )
+    def _on_stroke_updated(self):
+        if not self.live_timer.isActive():
+            self.live_timer.start()
             
-            self.similarity_score = similarity
+    def _submit_live_path(self):
+        """绘制过程中按间隔提交当前笔画，排名随绘制实时更新"""
+        current_path = self.test_drawing.current_path
+        if not self.test_drawing.drawing or len(current_path) <= 5:
+            return
+        raw_points = [(p.x(), p.y(), 0.5, 0.0, 1) for p in current_path]
+        self._ranking_sequence = self.ranker.submit(raw_points=raw_points)
+        
+    def _on_ranking_ready(self, sequence, result):
+        if sequence != self._ranking_sequence:
+            return
+        if result["reference"] is not None:
+            self.similarity_score = result["reference"]
             self._update_similarity_display()
-            
-        except Exception as e:
-            self.similarity_title.setText(f"计算相似度失败: {str(e)}")
-            
+        self._update_ranking_display(result["ranking"], result["total"])
+        
+    def _update_ranking_display(self, ranking, total):
+        self.ranking_title.setText(f"手势库排名（共 {total} 个触发路径）")
+        for row, labels in enumerate(self.ranking_rows):
+            if row >= len(ranking):
+                for label in labels[1:]:
+                    label.setText("")
+                continue
+                
+            key, name, action_name, score = ranking[row]
+            threshold = self.threshold
+            if self.use_calibration:
+                # 已校准的路径与其校准的阈值比较，和识别时一致
+                entry = self.ranker.gesture_library.saved_trigger_paths.get(key)
+                threshold = calibrated_threshold(entry, threshold)
+            margin = score - threshold
+            labels[1].setText(name)
+            labels[2].setText(action_name or "未映射")
+            labels[3].setText(f"{score:.0%}")
+            labels[4].setText(f"{margin:+.0%}")
+            color = "#28a745" if margin >= 0 else "#dc3545"
+            labels[4].setStyleSheet(f"font-size: 12px; font-weight: bold; color: {color};")
+            
+    def _clear_ranking_display(self):
+        for labels in self.ranking_rows:
+            for label in labels[1:]:
+                label.setText("")
+                
+    def done(self, result):
+        self.live_timer.stop()
+        self.ranker.stop()
+        super().done(result)
+        
     def _update_similarity_display(self):
         percentage = int(self.similarity_score * 100)
         self.similarity_bar.setValue(percentage)
@@ -442,6 +647,9 @@ class TestSimilarityDialog(QDialog):
         
     def _clear_test(self):
         self.test_drawing.clear_drawing()
+        self.live_timer.stop()
+        self._ranking_sequence = self.ranker.cancel()
+        self._clear_ranking_display()
         self.test_path = None
         self.similarity_score = 0.0
         self.similarity_bar.setValue(0)
@@ -523,6 +731,7 @@ class ReferencePathDisplay(QWidget):
 
 class TestDrawingWidget(QWidget):
     pathCompleted = Signal(dict)
+    strokeUpdated = Signal()
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -548,6 +757,7 @@ class TestDrawingWidget(QWidget):
         if self.drawing:
             self.current_path.append(event.pos())
             self.update()
+            self.strokeUpdated.emit()
             
     def mouseReleaseEvent(self, event):
         if self.drawing and event.button() == Qt.MouseButton.LeftButton:
@@ -616,4 +826,186 @@ class TestDrawingWidget(QWidget):
         self.current_path = []
         self.completed_path = None
         self.drawing = False
-        self.update()
\ No newline at end of file
+        self.update()
+
+# 冲突检测中同时列出的接近阈值的范围，以及表格最多显示的路径对数量
+CONFLICT_DISPLAY_MARGIN = 0.10
+CONFLICT_DISPLAY_LIMIT = 500
+
+
+class GestureConflictDialog(QDialog):
+    """手势冲突检测对话框
+    
+    在后台线程中计算手势页面中全部触发路径（包含未保存的修改）两两之间的相似度，
+    列出在当前识别阈值下会被互相识别的路径对和接近阈值的路径对，并给出能区分
+    全部路径的最低阈值。启用校准阈值时，已校准的路径与识别时一样使用各自的阈值。
+    """
+    
+    _progress = Signal(int, int, int)  # (检测序号, 已完成行数, 总行数)
+    _finished = Signal(int, object)
+    _failed = Signal(int, str)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.logger = get_logger("GestureConflicts")
+        self.gesture_library = get_gesture_library()
+        try:
+            self.threshold = get_settings().get("gesture.similarity_threshold", 0.70)
+        except:
+            self.threshold = 0.70
+            
+        self._run_id = 0
+        self._cancel = None
+        self._progress.connect(self._on_progress)
+        self._finished.connect(self._on_finished)
+        self._failed.connect(self._on_failed)
+        
+        self.setWindowTitle("手势冲突检测")
+        self.setModal(True)
+        self.resize(720, 560)
+        
+        self._init_ui()
+        self._start_analysis()
+        
+    def _init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        self.summary_label = QLabel()
+        self.summary_label.setWordWrap(True)
+        self.summary_label.setStyleSheet("font-size: 13px; color: #333;")
+        layout.addWidget(self.summary_label)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setMaximumHeight(8)
+        layout.addWidget(self.progress_bar)
+        
+        self.pair_table = QTableWidget(0, 3)
+        self.pair_table.setHorizontalHeaderLabels(["触发路径", "触发路径", "相似度"])
+        self.pair_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.pair_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.pair_table.verticalHeader().setVisible(False)
+        header = self.pair_table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
+        layout.addWidget(self.pair_table, 1)
+        
+        button_layout = QHBoxLayout()
+        
+        self.rerun_btn = QPushButton("重新检测")
+        self.rerun_btn.clicked.connect(self._start_analysis)
+        button_layout.addWidget(self.rerun_btn)
+        
+        button_layout.addStretch()
+        
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(close_btn)
+        
+        layout.addLayout(button_layout)
+        
+    def _start_analysis(self):
+        if self._cancel is not None:
+            self._cancel.set()
+        self._run_id += 1
+        self._cancel = threading.Event()
+        self.rerun_btn.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.pair_table.setRowCount(0)
+        self.summary_label.setText(f"正在计算触发路径之间的相似度（识别阈值 {self.threshold:.2f}）...")
+        
+        thread = threading.Thread(
+            target=self._run, args=(self._run_id, self._cancel), name="GestureConflicts", daemon=True
+        )
+        thread.start()
+        
+    def _run(self, run_id, cancel):
+        from core.gesture_conflicts import AnalysisCancelled, analyze_library
+        
+        try:
+            report = analyze_library(
+                self.gesture_library, self.threshold, use_saved=False, margin=CONFLICT_DISPLAY_MARGIN,
+                progress=lambda done, total: self._progress.emit(run_id, done, total), cancel=cancel
+            )
+            self.logger.info(
+                f"冲突检测完成: {len(report.keys)} 个触发路径，{len(report.conflicts)} 对冲突，"
+                f"耗时 {report.elapsed:.2f}s"
+            )
+            self._finished.emit(run_id, report)
+        except AnalysisCancelled:
+            self.logger.debug("冲突检测已取消")
+        except RuntimeError:
+            pass  # 对话框已关闭
+        except Exception as e:
+            self.logger.error(f"冲突检测失败: {e}")
+            try:
+                self._failed.emit(run_id, str(e))
+            except RuntimeError:
+                pass
+                
+    def _on_progress(self, run_id, done, total):
+        if run_id == self._run_id and total:
+            self.progress_bar.setValue(int(done * 100 / total))
+            
+    def _on_failed(self, run_id, message):
+        if run_id != self._run_id:
+            return
+        self.progress_bar.setVisible(False)
+        self.rerun_btn.setEnabled(True)
+        self.summary_label.setText(f"冲突检测失败: {message}")
+        
+    def _on_finished(self, run_id, report):
+        if run_id != self._run_id:
+            return
+        self.progress_bar.setVisible(False)
+        self.rerun_btn.setEnabled(True)
+        
+        if report.closest is None:
+            self.summary_label.setText("触发路径少于两个，不存在冲突。")
+            return
+            
+        conflicts = len(report.conflicts)
+        safe = report.min_safe_threshold
+        threshold_text = f"当前识别阈值 {report.threshold:.2f}"
+        if report.calibrated:
+            threshold_text += f"（{report.calibrated} 个已校准的路径使用各自的阈值）"
+        lines = [
+            f"共 {len(report.keys)} 个触发路径，在{threshold_text}下有 "
+            f"<b>{conflicts}</b> 对路径会被互相识别。" if conflicts else
+            f"共 {len(report.keys)} 个触发路径，在{threshold_text}下没有冲突。",
+            f"最相似的路径：{report.closest.name_a} 与 {report.closest.name_b}"
+            f"（{report.closest.similarity:.1%}）。",
+        ]
+        if report.all_calibrated:
+            lines.append("全部路径都使用校准阈值，全局识别阈值不影响识别；出现冲突时请重新校准。")
+        elif safe is None:
+            lines.append("存在几乎完全相同的路径，提高阈值也无法区分，请修改或删除其中之一。")
+        elif report.calibrated:
+            lines.append(f"能区分未校准路径的最低识别阈值：<b>{safe:.2f}</b>")
+        else:
+            lines.append(f"能区分全部路径的最低阈值：<b>{safe:.2f}</b>")
+        self.summary_label.setText("<br>".join(lines))
+        
+        pairs = report.pairs[:CONFLICT_DISPLAY_LIMIT]
+        self.pair_table.setRowCount(len(pairs))
+        for row, pair in enumerate(pairs):
+            color = QColor(220, 53, 69) if pair.is_conflict else QColor(253, 126, 20)
+            items = (
+                QTableWidgetItem(f"{pair.name_a}（{pair.key_a}）"),
+                QTableWidgetItem(f"{pair.name_b}（{pair.key_b}）"),
+                QTableWidgetItem(f"{pair.similarity:.1%}"),
+            )
+            items[2].setForeground(color)
+            items[2].setToolTip(f"判断阈值 {pair.threshold:.2f}")
+            for column, item in enumerate(items):
+                self.pair_table.setItem(row, column, item)
+                
+    def done(self, result):
+        if self._cancel is not None:
+            self._cancel.set()
+        super().done(result)
\ No newline at end of file
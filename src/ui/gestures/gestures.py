@@ -2,33 +2,74 @@ import json
 import os
 import pathlib
 import sys
-import copy
+import threading
 import time
 
+import numpy as np
+
+from core.gesture_calibration import calibrated_threshold
+from core.gesture_pack import PACK_SUFFIX, GesturePackError, encode_pack, read_pack
 from core.logger import get_logger
-from core.path_analyzer import PathAnalyzer
+from core.persistence import get_documents, get_writer
+from core.path_analyzer import DESCRIPTOR_POINTS, PathAnalyzer
+from ui.settings.settings import get_settings
 from version import APP_NAME, AUTHOR
 
+SECTIONS = ("trigger_paths", "execute_actions", "gesture_mappings")
+LIBRARY_FORMATS = ("json", "pack")
+_MISSING = object()
+
 
 class GestureLibrary:
+    """手势库
+
+    变更追踪采用变更日志：修改数据的代码替换（而不是原地修改）条目，并通过
+    mark_data_changed(section, *keys) 记录被改动的键。保存状态只是各部分的浅拷贝，
+    has_changes 只比较日志中的键，并按版本号缓存结果。
+
+    手势库可以保存为JSON（gestures.json）或二进制格式（gestures.gkpack），由设置
+    gesture.library_format 决定。识别时使用按条目缓存的描述子，二进制格式直接
+    提供预先计算好的描述子。
+    """
+
     def __init__(self):
         self.logger = get_logger("GestureLibrary")
         
         self.path_analyzer = PathAnalyzer()
         self.gestures_file = self._get_gestures_file_path()
+        self.pack_file = os.path.splitext(self.gestures_file)[0] + PACK_SUFFIX
+
+        settings = get_settings()
+        self.library_format = self._normalize_format(settings.snapshot().get("gesture.library_format", "json"))
+        settings.subscribe("gesture.library_format", self._on_library_format_changed)
         
         default_gestures = self._load_default_gestures()
-        
-        if sys.platform != "win32":
-            self._convert_actions_for_current_platform()
 
         self.trigger_paths = default_gestures.get("trigger_paths", {}).copy()
         self.execute_actions = default_gestures.get("execute_actions", {}).copy()
         self.gesture_mappings = default_gestures.get("gesture_mappings", {}).copy()
 
+        if sys.platform != "win32":
+            self._convert_actions_for_current_platform()
+
         self.last_change_type = None
         self.change_timestamp = 0
 
+        self._dirty_keys = {section: set() for section in SECTIONS}
+        self._version = 0
+        self._checked_version = -1
+        self._has_changes = False
+        # 最近一次 save() 的写入请求，写入成功后清除；写入失败时保留，has_changes() 返回True
+        self._unwritten_save = None
+        self._fragments = {section: {} for section in SECTIONS}
+        self._fragments_lock = threading.Lock()
+        # 描述子缓存会被工作线程（相似度排名、冲突分析）写入，读写都要持有锁
+        self._descriptors = {}
+        self._descriptors_lock = threading.Lock()
+        self._load_warnings = []
+        # 最近一次读取的二进制文件：((修改时间, 大小), 解码结果)，供自检复用，避免再次解码
+        self._loaded_pack = None
+
         self._update_saved_state()
         self.load()
 
@@ -37,25 +78,26 @@ class GestureLibrary:
             os.path.dirname(os.path.abspath(__file__)), "default_gestures.json"
         )
         try:
-            if os.path.exists(default_gestures_path):
-                with open(default_gestures_path, "r", encoding="utf-8") as f:
-                    gestures = json.load(f)
-                return gestures
-            else:
+            document = get_documents().get(default_gestures_path)
+            if not document.exists:
                 raise FileNotFoundError(f"默认手势库文件不存在: {default_gestures_path}")
+            if document.error:
+                raise ValueError(document.error)
+            return document.data
         except Exception as e:
             self.logger.error(f"加载默认手势库失败: {e}")
             raise
 
     def _convert_actions_for_current_platform(self):
+        """转换快捷键格式；条目可能与文档缓存共用，所以替换而不是原地修改"""
         actions = self.execute_actions
-        for action_key, action_data in actions.items():
-            if action_data.get("type") == "shortcut":
+        for action_key, action_data in list(actions.items()):
+            if isinstance(action_data, dict) and action_data.get("type") == "shortcut":
                 action_value = action_data.get("value", "")
                 if action_value and "+" in action_value:
                     new_value = self._convert_shortcut_for_current_platform(action_value)
                     if new_value != action_value:
-                        action_data["value"] = new_value
+                        actions[action_key] = dict(action_data, value=new_value)
 
     def _convert_shortcut_for_current_platform(self, shortcut):
         if sys.platform == "darwin":
@@ -90,72 +132,294 @@ class GestureLibrary:
         os.makedirs(config_dir, exist_ok=True)
         return os.path.join(config_dir, "gestures.json")
 
+    @staticmethod
+    def _normalize_format(library_format):
+        return library_format if library_format in LIBRARY_FORMATS else "json"
+
+    def _current_file(self):
+        return self.pack_file if self.library_format == "pack" else self.gestures_file
+
+    def _other_file(self, path):
+        return self.gestures_file if path == self.pack_file else self.pack_file
+
+    def take_load_warnings(self):
+        """取出加载时需要告知用户的问题（如二进制文件损坏），取出后清空"""
+        warnings, self._load_warnings = self._load_warnings, []
+        return warnings
+
+    def _warn_user(self, message):
+        self.logger.error(message)
+        self._load_warnings.append(message)
+
+    def _retire_file(self, path, reason):
+        """把不再使用的另一种格式文件移动为 *.bak，避免之后被当作手势库读取"""
+        if not os.path.exists(path):
+            return None
+        backup_path = f"{path}.bak"
+        try:
+            os.replace(path, backup_path)
+        except OSError as e:
+            self.logger.warning(f"移动旧手势库文件失败: {path}, {e}")
+            return None
+        self.logger.info(f"{reason}，已移动到 {backup_path}")
+        return backup_path
+
     def load(self):
         try:
-            if os.path.exists(self.gestures_file):
-                with open(self.gestures_file, "r", encoding="utf-8") as f:
-                    loaded_data = json.load(f)
+            get_writer().flush(self.gestures_file)
+            get_writer().flush(self.pack_file)
+            loaded = self._read_library_file()
+            if loaded is not None:
+                loaded_data, descriptors, source_file = loaded
 
-                if sys.platform != "win32":
-                    self._convert_loaded_actions_for_current_platform(loaded_data)
+                # 解析结果与自检共用，各部分复制一层后再修改
+                self.trigger_paths = dict(loaded_data.get("trigger_paths", {}) or {})
+                self.execute_actions = dict(loaded_data.get("execute_actions", {}) or {})
+                self.gesture_mappings = dict(loaded_data.get("gesture_mappings", {}) or {})
 
-                self.trigger_paths = loaded_data.get("trigger_paths", {}) or {}
-                self.execute_actions = loaded_data.get("execute_actions", {}) or {}
-                self.gesture_mappings = loaded_data.get("gesture_mappings", {}) or {}
+                if sys.platform != "win32":
+                    self._convert_actions_for_current_platform()
+                with self._descriptors_lock:
+                    self._descriptors = {
+                        key: (self.trigger_paths[key], descriptor)
+                        for key, descriptor in descriptors.items()
+                        if key in self.trigger_paths and descriptor.shape == (DESCRIPTOR_POINTS, 2)
+                    }
 
                 self._update_saved_state()
                 self.clear_change_marker()
+
+                if source_file != self._current_file():
+                    self.logger.info("手势库已从 %s 转换为 %s 格式", source_file, self.library_format)
+                    self._submit_save(self._section_data())
             else:
                 self.save()
         except Exception as e:
             self.logger.error(f"加载手势库失败: {e}")
             raise
 
-    def _convert_loaded_actions_for_current_platform(self, loaded_data):
-        actions = loaded_data.get("execute_actions", {})
-        format_converted = False
-        for action_key, action_data in actions.items():
-            if action_data.get("type") == "shortcut":
-                action_value = action_data.get("value", "")
-                if action_value and "+" in action_value:
-                    new_value = self._convert_shortcut_for_current_platform(action_value)
-                    if new_value != action_value:
-                        action_data["value"] = new_value
-                        format_converted = True
-
-    def _update_saved_state(self):
-        self.saved_trigger_paths = copy.deepcopy(self.trigger_paths)
-        self.saved_execute_actions = copy.deepcopy(self.execute_actions)
-        self.saved_gesture_mappings = copy.deepcopy(self.gesture_mappings)
+    def _read_library_file(self):
+        """读取手势库文件，返回 (数据, {路径键: 描述子}, 文件路径)
+
+        优先读取当前格式的文件，不存在时读取另一种格式（格式转换），都不存在时返回None。
+        二进制文件损坏时移动为 *.corrupted，只有JSON文件不比它旧时才改用JSON文件，
+        否则JSON文件是切换格式前留下的旧版本，移动为 *.bak 后使用默认手势库；
+        这两种情况都会记录到 take_load_warnings() 中告知用户。
+        """
+        current_file = self._current_file()
+        other_file = self._other_file(current_file)
+        if os.path.exists(current_file):
+            return self._read_file(current_file)
+        if os.path.exists(other_file):
+            return self._read_file(other_file)
+        return None
+
+    def _read_file(self, path):
+        if path == self.gestures_file:
+            document = get_documents().get(path)
+            if document.error:
+                # 文件损坏时保留当前数据且不覆盖文件，由自检备份并重置后重新加载
+                self.logger.error(f"手势库文件格式错误，暂时使用默认手势库: {document.error}")
+                return self._section_data(prefix=""), {}, path
+            return document.data, {}, path
 
-    def save(self):
         try:
-            os.makedirs(os.path.dirname(self.gestures_file), exist_ok=True)
+            stat = os.stat(path)
+            data, descriptors = read_pack(path)
+            self._loaded_pack = ((stat.st_mtime_ns, stat.st_size), data)
+            return data, descriptors, path
+        except GesturePackError as e:
+            pack_mtime = os.stat(path).st_mtime_ns
+            corrupted_path = f"{path}.corrupted"
+            os.replace(path, corrupted_path)
+            message = f"二进制手势库文件损坏（{e}），已移动到 {corrupted_path}"
+
+        if not os.path.exists(self.gestures_file):
+            self._warn_user(f"{message}，已使用默认手势库")
+            return None
+        if os.stat(self.gestures_file).st_mtime_ns >= pack_mtime:
+            self._warn_user(f"{message}，已改用JSON手势库 {self.gestures_file}")
+            return self._read_file(self.gestures_file)
+
+        backup_path = self._retire_file(self.gestures_file, "JSON手势库早于损坏的二进制文件，不再使用")
+        self._warn_user(
+            f"{message}。JSON手势库 {self.gestures_file} 早于该文件，是切换格式前的旧版本，"
+            f"未使用（已移动到 {backup_path}），已使用默认手势库"
+        )
+        return None
+
+    def take_loaded_pack(self):
+        """取出加载时解码的二进制手势库数据，返回 ((修改时间, 大小), 数据)，没有时返回None
+
+        数据与手势库共用条目，不能原地修改。调用方应比较文件当前的修改时间和大小，
+        不一致时说明文件已被重新写入，需要自己读取。
+        """
+        loaded, self._loaded_pack = self._loaded_pack, None
+        return loaded
 
-            data = {
-                "trigger_paths": self.trigger_paths,
-                "execute_actions": self.execute_actions,
-                "gesture_mappings": self.gesture_mappings
+    def _update_saved_state(self):
+        """记录当前数据为保存状态
+
+        条目只会被替换而不会被原地修改，所以浅拷贝即可保留保存时的内容。
+        """
+        self.saved_trigger_paths = dict(self.trigger_paths)
+        self.saved_execute_actions = dict(self.execute_actions)
+        self.saved_gesture_mappings = dict(self.gesture_mappings)
+
+        for keys in self._dirty_keys.values():
+            keys.clear()
+        self._version += 1
+
+        with self._descriptors_lock:
+            self._descriptors = {
+                key: cached for key, cached in self._descriptors.items()
+                if self.saved_trigger_paths.get(key) is cached[0]
             }
 
-            with open(self.gestures_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+    def _section_data(self, prefix="saved_"):
+        return {section: dict(getattr(self, prefix + section)) for section in SECTIONS}
+
+    def save(self, wait=False):
+        """交给后台写入器保存手势库并更新保存状态
+
+        保存状态立即更新（识别使用已保存的数据），但写入成功之前 has_changes() 仍返回True。
+
+        Args:
+            wait: 为True时等待写入完成，写入失败或超时返回False；保存按钮和退出时使用
+        """
+        try:
+            request = object()
+            self._unwritten_save = request
+            self._loaded_pack = None
+            self._submit_save(self._section_data(prefix=""), lambda: self._mark_written(request))
             
             self._update_saved_state()
             self.clear_change_marker()
+
+            target_file = self._current_file()
+            if wait and not get_writer().flush(target_file):
+                error = get_writer().get_errors(target_file).get(target_file, "写入超时")
+                self.logger.error(f"保存手势库失败: {error}")
+                return False
             return True
         except Exception as e:
             self.logger.error(f"保存手势库失败: {e}")
             return False
 
+    def _mark_written(self, request):
+        """在后台写入线程中调用；只有最近一次 save() 的请求写入后才清除标记"""
+        if self._unwritten_save is request:
+            self._unwritten_save = None
+
+    def _submit_save(self, data, on_written=None):
+        """按当前格式把 data 交给后台写入器，二进制格式的编码也在后台线程完成
+
+        写入成功后把另一种格式的文件移动为 *.bak，避免旧文件之后被当作手势库读取，
+        然后调用 on_written。
+        """
+        library_format = self.library_format
+        target_file = self._current_file()
+        other_file = self._other_file(target_file)
+
+        def written():
+            if self.library_format == library_format:
+                self._retire_file(other_file, f"手势库已保存为 {library_format} 格式，另一种格式的文件不再使用")
+            if on_written is not None:
+                on_written()
+
+        if library_format == "pack":
+            with self._descriptors_lock:
+                descriptors = {
+                    key: cached[1] for key, cached in self._descriptors.items()
+                    if cached[1] is not None and data["trigger_paths"].get(key) is cached[0]
+                }
+            compute_descriptor = self.path_analyzer.compute_descriptor
+            get_writer().submit(
+                target_file,
+                lambda: encode_pack(data, compute_descriptor, descriptors, DESCRIPTOR_POINTS),
+                written,
+            )
+        else:
+            # data 中的条目只会被替换而不会被原地修改，可以直接交给后台线程序列化
+            get_writer().submit(target_file, lambda: self._render_json(data), written)
+
+    def _on_library_format_changed(self, snapshot, changed_keys):
+        library_format = self._normalize_format(snapshot.get("gesture.library_format", "json"))
+        if library_format == self.library_format:
+            return
+        self.library_format = library_format
+        self._submit_save(self._section_data())
+        self.logger.info("手势库存储格式已切换为: %s", library_format)
+
+    def _render_json(self, data):
+        """生成与 json.dump(indent=4, ensure_ascii=False) 相同的文本
+
+        每个条目的序列化结果按条目对象缓存，条目被替换后才重新序列化，
+        保存时只有改动过的条目需要重新编码。在后台写入线程中调用，缓存由锁保护。
+        """
+        section_texts = []
+        with self._fragments_lock:
+            for section in SECTIONS:
+                entries = data[section]
+                cache = self._fragments[section]
+                new_cache = {}
+                entry_texts = []
+                for key, entry in entries.items():
+                    cached = cache.get(key)
+                    if cached is not None and cached[0] is entry:
+                        fragment = cached[1]
+                    else:
+                        fragment = json.dumps(entry, indent=4, ensure_ascii=False).replace("\n", "\n        ")
+                    new_cache[key] = (entry, fragment)
+                    entry_texts.append(f"        {json.dumps(key, ensure_ascii=False)}: {fragment}")
+                self._fragments[section] = new_cache
+
+                if entry_texts:
+                    body = "{\n" + ",\n".join(entry_texts) + "\n    }"
+                else:
+                    body = "{}"
+                section_texts.append(f"    {json.dumps(section)}: {body}")
+
+        return "{\n" + ",\n".join(section_texts) + "\n}"
+
     def has_changes(self):
-        return (
-            self.trigger_paths != self.saved_trigger_paths or
-            self.execute_actions != self.saved_execute_actions or
-            self.gesture_mappings != self.saved_gesture_mappings
-        )
-    
-    def mark_data_changed(self, change_type):
+        """检查是否有未保存的更改，只比较变更日志中的键，无新变更时直接返回缓存结果
+
+        最近一次保存尚未写入文件（或写入失败）时也返回True。
+        """
+        if self._unwritten_save is not None:
+            return True
+        if self._checked_version != self._version:
+            self._has_changes = self._compare_dirty_entries()
+            self._checked_version = self._version
+        return self._has_changes
+
+    def _compare_dirty_entries(self):
+        for section, keys in self._dirty_keys.items():
+            current = getattr(self, section)
+            saved = getattr(self, f"saved_{section}")
+            if not keys:
+                continue
+            if any(current.get(key, _MISSING) != saved.get(key, _MISSING) for key in keys):
+                return True
+            if list(current) != list(saved):
+                return True
+        return False
+
+    def mark_data_changed(self, change_type, *keys):
+        """记录数据变更
+
+        Args:
+            change_type: 变更的部分，trigger_paths / execute_actions / gesture_mappings
+            keys: 被新增、替换或删除的条目键；省略时视为整个部分都已变化
+        """
+        if change_type in self._dirty_keys:
+            if keys:
+                self._dirty_keys[change_type].update(str(key) for key in keys)
+            else:
+                self._dirty_keys[change_type].update(getattr(self, change_type))
+                self._dirty_keys[change_type].update(getattr(self, f"saved_{change_type}"))
+        self._version += 1
         self.last_change_type = change_type
         self.change_timestamp = time.time()
         
@@ -166,29 +430,40 @@ class GestureLibrary:
         self.last_change_type = None
         self.change_timestamp = 0
 
-    def get_gesture_by_path(self, drawn_path, similarity_threshold=0.70):
+    def get_gesture_by_path(self, drawn_path, similarity_threshold=0.70, use_calibration=True):
+        """查找与绘制路径最匹配的手势，返回 (手势名称, 执行操作, 相似度)
+
+        最匹配的触发路径有校准结果（core.gesture_calibration）且 use_calibration 为True时，
+        使用该路径校准的阈值代替 similarity_threshold。
+
+        自检在手势库加载之后于后台运行，修复写入前识别可能遇到结构错误的条目，
+        这些条目（不是字典的路径、映射和操作）直接跳过。
+        """
         if not drawn_path or not drawn_path.get('points'):
             return None, None, 0.0
         
-        normalized_drawn = self.path_analyzer.normalize_path_scale(drawn_path)
+        drawn_descriptor = self.path_analyzer.compute_descriptor(drawn_path)
+        if drawn_descriptor is None:
+            return None, None, 0.0
         
         best_match_path_key = None
         best_similarity = 0.0
         best_trigger_path = None
         
         for path_key, path_data in self.saved_trigger_paths.items():
-            trigger_path = path_data.get("path")
-            if not trigger_path:
+            trigger_descriptor = self._get_descriptor(path_key, path_data)
+            if trigger_descriptor is None:
                 continue
             
-            normalized_trigger = self.path_analyzer.normalize_path_scale(trigger_path)
-            similarity = self.path_analyzer.calculate_similarity(normalized_drawn, normalized_trigger)
+            similarity = self.path_analyzer.calculate_descriptor_similarity(drawn_descriptor, trigger_descriptor)
             
             if similarity > best_similarity:
                 best_similarity = similarity
                 best_match_path_key = path_key
                 best_trigger_path = path_data
         
+        if use_calibration:
+            similarity_threshold = calibrated_threshold(best_trigger_path, similarity_threshold)
         if best_similarity < similarity_threshold:
             return None, None, best_similarity
 
@@ -196,7 +471,7 @@ class GestureLibrary:
         best_match_path_id = int(best_match_path_key) if best_match_path_key and best_match_path_key.isdigit() else None
         
         for mapping_key, mapping_data in self.saved_gesture_mappings.items():
-            if mapping_data.get("trigger_path_id") == best_match_path_id:
+            if isinstance(mapping_data, dict) and mapping_data.get("trigger_path_id") == best_match_path_id:
                 matched_gesture = mapping_data
                 break
         
@@ -210,12 +485,46 @@ class GestureLibrary:
         if execute_action_key and execute_action_key in self.saved_execute_actions:
             execute_action = self.saved_execute_actions[execute_action_key]
         
-        if not execute_action:
+        if not execute_action or not isinstance(execute_action, dict):
             return None, None, best_similarity
         
         gesture_name = matched_gesture.get("name", f"手势{mapping_key}")
         return gesture_name, execute_action, best_similarity
 
+    def _get_descriptor(self, path_key, path_data):
+        """获取触发路径的识别描述子，按条目对象缓存，条目被替换后重新计算
+
+        计算描述子时不持有锁，多个线程同时计算同一条目时结果相同，后写入的覆盖先写入的。
+        """
+        with self._descriptors_lock:
+            cached = self._descriptors.get(path_key)
+        if cached is not None and cached[0] is path_data:
+            return cached[1]
+        path = path_data.get("path") if isinstance(path_data, dict) else None
+        descriptor = self.path_analyzer.compute_descriptor(path)
+        with self._descriptors_lock:
+            self._descriptors[path_key] = (path_data, descriptor)
+        return descriptor
+
+    def get_trigger_templates(self, use_saved=True):
+        """获取触发路径的识别描述子，返回 (路径键列表, N×点数×2 数组)
+
+        默认使用已保存的触发路径，use_saved=False 时使用包含未保存修改的路径。
+        无法计算描述子的路径不包含在内。描述子缓存由锁保护，可以在工作线程中调用；
+        路径字典在调用开始时复制一份，之后界面线程替换条目不影响本次结果。
+        """
+        paths = self.saved_trigger_paths if use_saved else self.trigger_paths
+        keys = []
+        descriptors = []
+        for path_key, path_data in list(paths.items()):
+            descriptor = self._get_descriptor(path_key, path_data)
+            if descriptor is not None:
+                keys.append(path_key)
+                descriptors.append(descriptor)
+        if not descriptors:
+            return keys, np.empty((0, DESCRIPTOR_POINTS, 2))
+        return keys, np.stack(descriptors)
+
     def get_gesture_count(self, use_saved=False):
         if use_saved:
             return len(self.saved_gesture_mappings)
@@ -250,22 +559,14 @@ class GestureLibrary:
         try:
             default_gestures = self._load_default_gestures()
 
+            self.trigger_paths = default_gestures.get("trigger_paths", {}).copy()
+            self.execute_actions = default_gestures.get("execute_actions", {}).copy()
+            self.gesture_mappings = default_gestures.get("gesture_mappings", {}).copy()
+
             if sys.platform != "win32":
                 self._convert_actions_for_current_platform()
 
-            if (self.trigger_paths != default_gestures.get("trigger_paths", {}) or
-                self.execute_actions != default_gestures.get("execute_actions", {}) or
-                self.gesture_mappings != default_gestures.get("gesture_mappings", {})):
-                
-                self.trigger_paths = default_gestures.get("trigger_paths", {}).copy()
-                self.execute_actions = default_gestures.get("execute_actions", {}).copy()
-                self.gesture_mappings = default_gestures.get("gesture_mappings", {}).copy()
-
-            success = self.save()
-            if success:
-                self._update_saved_state()
-
-            return success
+            return self.save(wait=True)
         except Exception as e:
             self.logger.error(f"重置为默认手势库失败: {e}")
         return False
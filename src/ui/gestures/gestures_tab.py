@@ -1,90 +1,173 @@
+import bisect
+import math
 import os
-from qtpy.QtCore import Qt, QTimer, QPoint, Signal, QSize
-from qtpy.QtGui import QPainter, QPen, QColor, QFont, QBrush, QIcon
+from functools import lru_cache
+
+from qtpy.QtCore import Qt, QTimer, QPoint, Signal, QSize, QRect, QEvent, QAbstractListModel, QModelIndex
+from qtpy.QtGui import QPainter, QPen, QColor, QFont, QBrush, QIcon, QFontMetrics, QPixmap, QRegion
 from qtpy.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QLabel, QGroupBox, QMessageBox, QScrollArea, QDialog
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QGroupBox, QMessageBox,
+    QDialog, QListView, QStyledItemDelegate, QStyle, QToolTip, QAbstractItemView, QFrame
 )
 
 from core.logger import get_logger
 from ui.gestures.gestures import get_gesture_library
+from ui.gestures.path_thumbnails import THUMBNAIL_SIZE, get_thumbnail_cache, path_fingerprint
 
+_ASSETS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "assets", "images", "ui"
+)
 
-def _find_parent_with_refresh(widget):
-    """查找带有refresh_list方法的父组件"""
-    parent = widget.parent()
-    while parent:
-        if hasattr(parent, "refresh_list"):
-            return parent
-        parent = parent.parent()
-    return None
+CARD_SIZE = QSize(200, 120)
+CARD_SPACING = 10
+CARD_BUTTON_SIZE = 20
 
+# 点击连线的判定距离（像素）和连线索引的网格大小
+HIT_TOLERANCE = 10
+INDEX_CELL_SIZE = 32
 
-def _create_card_button(text, tooltip, style_extra="", size=(20, 20), icon_name=None):
-    """创建卡片上的小按钮"""
-    btn = QPushButton(text)
-    btn.setFixedSize(*size)
-    btn.setToolTip(tooltip)
-    btn.setStyleSheet(f"font-size: 10px; padding: 0px; {style_extra}")
-    
-    # 设置图标
-    if icon_name:
-        assets_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 
-            "assets", "images", "ui"
-        )
-        icon_path = os.path.join(assets_dir, f"{icon_name}.svg")
-        if os.path.exists(icon_path):
-            btn.setIcon(QIcon(icon_path))
-            btn.setIconSize(QSize(16, 16))
-            btn.setText("")  # 隐藏文本，只显示图标
-    
-    return btn
+# 结构变化超过这个数量时直接重置模型，不再逐行插入和删除
+_MAX_INCREMENTAL_CHANGES = 32
+
+
+@lru_cache(maxsize=None)
+def _ui_icon(icon_name):
+    """加载界面图标，不存在时返回None"""
+    icon_path = os.path.join(_ASSETS_DIR, f"{icon_name}.svg")
+    return QIcon(icon_path) if os.path.exists(icon_path) else None
+
+
+def _set_button_icon(button, icon_name, size):
+    icon = _ui_icon(icon_name)
+    if icon is not None:
+        button.setIcon(icon)
+        button.setIconSize(QSize(size, size))
+
+
+def _entry_id(key):
+    return int(key) if key.isdigit() else 0
+
+
+def _sort_key(key):
+    return (_entry_id(key), key)
+
+
+def _clip_segment(x0, y0, x1, y1, left, top, right, bottom):
+    """把线段裁剪到矩形内（Liang-Barsky），完全在矩形外时返回None"""
+    dx = x1 - x0
+    dy = y1 - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - left), (dx, right - x0), (-dy, y0 - top), (dy, bottom - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        t = q / p
+        if p < 0:
+            if t > t1:
+                return None
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return None
+            t1 = min(t1, t)
+    return x0 + t0 * dx, y0 + t0 * dy, x0 + t1 * dx, y0 + t1 * dy
 
 
 class ConnectionWidget(QWidget):
-    """连线绘制组件"""
+    """连线绘制组件
+    
+    全部连线绘制在缓存的背景图层中，选中的连线单独画在背景之上，切换选中只重绘新旧
+    两条连线所在的区域；连线变化时只重绘变化连线的新旧区域。点击时通过均匀网格索引
+    只对点击位置附近的连线计算距离。
+    """
     
     def __init__(self, parent=None):
         super().__init__(parent)
         self.connections = []
         self.selected_connection = None
+        self._background = None
+        self._dirty_region = QRegion()
+        self._index = None
         self.setMinimumHeight(400)
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
         
     def add_connection(self, action_id, path_id, start_point, end_point):
         """添加连线"""
-        self.connections = [conn for conn in self.connections if conn[1] != path_id]
-        self.connections.append((action_id, path_id, start_point, end_point))
-        self.update()
+        self.set_connections(
+            [conn for conn in self.connections if conn[1] != path_id]
+            + [(action_id, path_id, start_point, end_point)]
+        )
         
+    def set_connections(self, connections):
+        """一次替换全部连线，选中的连线按路径ID保留，只重绘发生变化的连线"""
+        selected_path_id = None
+        if self.selected_connection is not None and self.selected_connection < len(self.connections):
+            selected_path_id = self.connections[self.selected_connection][1]
+            
+        old_connections = {conn[1]: conn for conn in self.connections}
+        self.connections = list(connections)
+        self.selected_connection = next(
+            (i for i, conn in enumerate(self.connections) if conn[1] == selected_path_id), None
+        )
+        
+        changed = []
+        for conn in self.connections:
+            old = old_connections.pop(conn[1], None)
+            if old != conn:
+                changed.append(conn)
+                if old is not None:
+                    changed.append(old)
+        changed.extend(old_connections.values())
+        if not changed:
+            return
+            
+        self._index = None
+        if len(changed) > len(self.connections):
+            self._background = None
+            self.update()
+            return
+            
+        for conn in changed:
+            rect = self._connection_rect(conn)
+            self._dirty_region += rect
+            self.update(rect)
+            
     def remove_connection(self, path_id):
         """移除连线"""
-        self.connections = [conn for conn in self.connections if conn[1] != path_id]
-        if self.selected_connection is not None:
-            if self.selected_connection >= len(self.connections):
-                self.selected_connection = None
-        self.update()
+        self.set_connections([conn for conn in self.connections if conn[1] != path_id])
         
     def clear_connections(self):
         """清空所有连线"""
         self.connections = []
         self.selected_connection = None
+        self._index = None
+        self._background = None
         self.update()
         
+    def _connection_rect(self, connection):
+        """连线（含箭头和选中时的粗线）占据的区域"""
+        _, _, start_point, end_point = connection
+        return QRect(start_point, end_point).normalized().adjusted(-12, -12, 12, 12)
+        
+    def _set_selected_connection(self, index):
+        if index == self.selected_connection:
+            return
+        for i in (self.selected_connection, index):
+            if i is not None and 0 <= i < len(self.connections):
+                self.update(self._connection_rect(self.connections[i]))
+        self.selected_connection = index
+        
     def mousePressEvent(self, event):
         """鼠标点击事件 - 选择连线"""
         if event.button() == Qt.MouseButton.LeftButton:
             click_pos = event.pos()
             selected_index = self._get_connection_at_point(click_pos)
             
+            self._set_selected_connection(selected_index)
             if selected_index is not None:
-                self.selected_connection = selected_index
                 self.setFocus()
-                self.update()
-            else:
-                self.selected_connection = None
-                self.update()
                 
         super().mousePressEvent(event)
         
@@ -103,12 +186,52 @@ class ConnectionWidget(QWidget):
                     
         super().keyPressEvent(event)
         
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._background = None
+        self._index = None
+        
+    def _build_index(self):
+        """建立均匀网格索引：{(列, 行): [连线索引]}
+        
+        只索引裁剪到控件范围内的部分，沿线段每半个格子取一个点，把该点所在格子及
+        周围一圈格子记为候选，保证距离连线 HIT_TOLERANCE 以内的点都能查到这条连线。
+        """
+        index = {}
+        rect = self.rect().adjusted(-HIT_TOLERANCE, -HIT_TOLERANCE, HIT_TOLERANCE, HIT_TOLERANCE)
+        step = INDEX_CELL_SIZE / 2
+        for i, (_, _, start_point, end_point) in enumerate(self.connections):
+            clipped = _clip_segment(start_point.x(), start_point.y(), end_point.x(), end_point.y(),
+                                    rect.left(), rect.top(), rect.right(), rect.bottom())
+            if clipped is None:
+                continue
+            x0, y0, x1, y1 = clipped
+            steps = max(1, int(math.hypot(x1 - x0, y1 - y0) / step) + 1)
+            cells = set()
+            for k in range(steps + 1):
+                t = k / steps
+                column = int((x0 + (x1 - x0) * t) // INDEX_CELL_SIZE)
+                row = int((y0 + (y1 - y0) * t) // INDEX_CELL_SIZE)
+                for dc in (-1, 0, 1):
+                    for dr in (-1, 0, 1):
+                        cells.add((column + dc, row + dr))
+            for cell in cells:
+                index.setdefault(cell, []).append(i)
+        self._index = index
+        
     def _get_connection_at_point(self, point):
-        """获取指定点位置的连线索引"""
-        for i, (action_id, path_id, start_point, end_point) in enumerate(self.connections):
-            if self._point_to_line_distance(point, start_point, end_point) < 10:
-                return i
-        return None
+        """获取指定点位置的连线索引，多条连线都在范围内时取最近的一条"""
+        if self._index is None:
+            self._build_index()
+            
+        cell = (point.x() // INDEX_CELL_SIZE, point.y() // INDEX_CELL_SIZE)
+        best_index, best_distance = None, HIT_TOLERANCE
+        for i in self._index.get(cell, ()):
+            _, _, start_point, end_point = self.connections[i]
+            distance = self._point_to_line_distance(point, start_point, end_point)
+            if distance < best_distance:
+                best_index, best_distance = i, distance
+        return best_index
         
     def _point_to_line_distance(self, point, line_start, line_end):
         """计算点到线段的距离"""
@@ -126,21 +249,56 @@ class ConnectionWidget(QWidget):
         
         return ((point.x() - closest_x) ** 2 + (point.y() - closest_y) ** 2) ** 0.5
         
+    def _draw_connection(self, painter, connection, is_selected=False):
+        _, _, start_point, end_point = connection
+        if is_selected:
+            pen = QPen(QColor(220, 53, 69), 3)
+        else:
+            pen = QPen(QColor(0, 120, 215), 2)
+            
+        painter.setPen(pen)
+        painter.drawLine(start_point, end_point)
+        
+        self._draw_arrow(painter, start_point, end_point, is_selected)
+        
+    def _update_background(self):
+        """重建背景图层，或只重绘其中被标记为变化的区域"""
+        ratio = self.devicePixelRatioF()
+        size = QSize(max(1, round(self.width() * ratio)), max(1, round(self.height() * ratio)))
+        if self._background is None or self._background.size() != size:
+            self._background = QPixmap(size)
+            self._background.setDevicePixelRatio(ratio)
+            self._background.fill(Qt.GlobalColor.transparent)
+            region = QRegion(self.rect())
+        elif not self._dirty_region.isEmpty():
+            region = self._dirty_region.intersected(QRegion(self.rect()))
+        else:
+            return
+        self._dirty_region = QRegion()
+        
+        painter = QPainter(self._background)
+        painter.setClipRegion(region)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        painter.fillRect(region.boundingRect(), Qt.GlobalColor.transparent)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        
+        bounds = region.boundingRect()
+        for connection in self.connections:
+            if self._connection_rect(connection).intersects(bounds):
+                self._draw_connection(painter, connection)
+        painter.end()
+        
     def paintEvent(self, event):
-        """绘制连线"""
+        """绘制连线：先画缓存的背景图层，再在其上画选中的连线"""
+        self._update_background()
+        
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.drawPixmap(0, 0, self._background)
         
-        for i, (action_id, path_id, start_point, end_point) in enumerate(self.connections):
-            if i == self.selected_connection:
-                pen = QPen(QColor(220, 53, 69), 3)
-            else:
-                pen = QPen(QColor(0, 120, 215), 2)
-                
-            painter.setPen(pen)
-            painter.drawLine(start_point, end_point)
-            
-            self._draw_arrow(painter, start_point, end_point, i == self.selected_connection)
+        if self.selected_connection is not None and 0 <= self.selected_connection < len(self.connections):
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            self._draw_connection(painter, self.connections[self.selected_connection], True)
             
     def _draw_arrow(self, painter, start_point, end_point, is_selected=False):
         """绘制箭头"""
@@ -167,482 +325,378 @@ class ConnectionWidget(QWidget):
         
         color = QColor(220, 53, 69) if is_selected else QColor(0, 120, 215)
         painter.setBrush(QBrush(color))
-        points = [QPoint(int(tip_x), int(tip_y)), 
-                 QPoint(int(base1_x), int(base1_y)), 
+        points = [QPoint(int(tip_x), int(tip_y)),
+                 QPoint(int(base1_x), int(base1_y)),
                  QPoint(int(base2_x), int(base2_y))]
         painter.drawPolygon(points)
 
 
-class ActionCardWidget(QWidget):
-    """操作卡片组件"""
-    action_clicked = Signal(int, QPoint)
+class GestureCardModel(QAbstractListModel):
+    """手势卡片列表模型
+    
+    每行对应手势库某一部分（执行操作或触发路径）的一个条目，按ID排序。手势库的条目
+    只会被替换而不会被原地修改，sync() 按对象是否相同找出变化的行，只通知这些行；
+    映射状态和选中状态也只通知值发生变化的行。
+    """
     
-    def __init__(self, action_id, action_name, action_value, parent=None):
+    KeyRole = Qt.ItemDataRole.UserRole + 1
+    ValueRole = Qt.ItemDataRole.UserRole + 2
+    StatusRole = Qt.ItemDataRole.UserRole + 3
+    SelectedRole = Qt.ItemDataRole.UserRole + 4
+    
+    def __init__(self, default_name, parent=None):
         super().__init__(parent)
-        self.action_id = action_id
-        self.action_name = action_name
-        self.action_value = action_value
-        self.is_selected = False
-        self.mapped_paths_count = 0
-        
-        self.setFixedSize(200, 120)
-        self.setStyleSheet("""
-            ActionCardWidget {
-                border: 2px solid #ddd;
-                border-radius: 8px;
-                background-color: white;
-            }
-            ActionCardWidget:hover {
-                border-color: #0078d4;
-                background-color: #f3f9ff;
-            }
-        """)
-        
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(10, 8, 10, 8)
-        
-        # 顶部布局：标题和按钮
-        top_layout = QHBoxLayout()
-        
-        name_label = QLabel(action_name)
-        name_label.setFont(QFont("", 10, QFont.Weight.Bold))
-        name_label.setWordWrap(True)
-        top_layout.addWidget(name_label)
-        
-        top_layout.addStretch()
-        
-        # 右上角按钮
-        buttons_layout = QHBoxLayout()
-        buttons_layout.setSpacing(3)
-        
-        self.btn_edit = _create_card_button("✏", "编辑操作", icon_name="edit")
-        self.btn_edit.clicked.connect(lambda: self._edit_action())
-        buttons_layout.addWidget(self.btn_edit)
-        
-        self.btn_delete = _create_card_button("✕", "删除操作", "color: red;", icon_name="delete")
-        self.btn_delete.clicked.connect(lambda: self._delete_action())
-        buttons_layout.addWidget(self.btn_delete)
-        
-        top_layout.addLayout(buttons_layout)
-        layout.addLayout(top_layout)
-        
-        display_value = action_value if len(action_value) <= 30 else action_value[:30] + "..."
-        value_label = QLabel(f"内容: {display_value}")
-        value_label.setFont(QFont("", 9))
-        value_label.setStyleSheet("color: #666;")
-        value_label.setWordWrap(True)
-        value_label.setToolTip(action_value)
-        layout.addWidget(value_label)
-        
-        self.status_label = QLabel("可连接")
-        self.status_label.setFont(QFont("", 9))
-        self.status_label.setStyleSheet("color: #999;")
-        layout.addWidget(self.status_label)
+        self.default_name = default_name
+        self._keys = []
+        self._sort_keys = []
+        self._rows = {}
+        self._entries = {}
+        self._status = {}
+        self._selected_key = None
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._keys)
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._keys):
+            return None
+        key = self._keys[index.row()]
+        entry = self._entries[key]
+        
+        if role == Qt.ItemDataRole.DisplayRole:
+            return entry.get("name", f"{self.default_name}{_entry_id(key)}")
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return entry.get("value") or None
+        if role == self.KeyRole:
+            return key
+        if role == self.ValueRole:
+            return entry.get("value", "")
+        if role == self.StatusRole:
+            return self._status.get(key)
+        if role == self.SelectedRole:
+            return key == self._selected_key
+        return None
         
-        layout.addStretch()
+    def keys(self):
+        return list(self._keys)
         
-    def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
-            global_pos = self.mapToGlobal(event.pos())
-            self.action_clicked.emit(self.action_id, global_pos)
-        super().mousePressEvent(event)
+    def row_of(self, key):
+        """返回条目所在的行，不存在时返回None"""
+        return self._rows.get(key)
         
-    def set_selected(self, is_selected):
-        """设置选中状态"""
-        self.is_selected = is_selected
+    def index_of(self, key):
+        row = self._rows.get(key)
+        return self.index(row, 0) if row is not None else QModelIndex()
         
-        if is_selected:
-            self.setStyleSheet("""
-                ActionCardWidget {
-                    border: 3px solid #0078d4;
-                    border-radius: 8px;
-                    background-color: #e6f3ff;
-                }
-                ActionCardWidget:hover {
-                    border-color: #106ebe;
-                    background-color: #d1e9ff;
-                }
-            """)
-            self.status_label.setText("已选中 - 请选择路径")
-            self.status_label.setStyleSheet("color: #0078d4; font-weight: bold;")
-        else:
-            self.setStyleSheet("""
-                ActionCardWidget {
-                    border: 2px solid #ddd;
-                    border-radius: 8px;
-                    background-color: white;
-                }
-                ActionCardWidget:hover {
-                    border-color: #0078d4;
-                    background-color: #f3f9ff;
-                }
-            """)
-            if self.mapped_paths_count > 0:
-                self.status_label.setText(f"已连接 {self.mapped_paths_count} 个路径")
-                self.status_label.setStyleSheet("color: #28a745; font-weight: bold;")
-            else:
-                self.status_label.setText("可连接")
-                self.status_label.setStyleSheet("color: #999;")
-                
-    def set_mapped_count(self, count):
-        """设置映射的路径数量"""
-        self.mapped_paths_count = count
-        if not self.is_selected:
-            if count > 0:
-                self.status_label.setText(f"已连接 {count} 个路径")
-                self.status_label.setStyleSheet("color: #28a745; font-weight: bold;")
-            else:
-                self.status_label.setText("可连接")
-                self.status_label.setStyleSheet("color: #999;")
+    def _emit_row_changed(self, key):
+        row = self._rows.get(key)
+        if row is not None:
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index)
+            
+    def _rebuild_rows(self):
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        
+    def sync(self, entries):
+        """与手势库的某一部分同步，返回结构是否发生变化"""
+        removed = [key for key in self._keys if key not in entries]
+        added = [key for key in entries if key not in self._entries]
+        
+        if len(removed) + len(added) > _MAX_INCREMENTAL_CHANGES:
+            for key, old_entry in self._entries.items():
+                if entries.get(key) is not old_entry:
+                    self._entry_replaced(key, old_entry)
+            self.beginResetModel()
+            self._keys = sorted(entries, key=_sort_key)
+            self._sort_keys = [_sort_key(key) for key in self._keys]
+            self._entries = dict(entries)
+            self._rebuild_rows()
+            self.endResetModel()
+            self._drop_missing_state()
+            return True
+            
+        for key in removed:
+            row = self._rows[key]
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._keys[row]
+            del self._sort_keys[row]
+            self._entry_replaced(key, self._entries.pop(key))
+            self._rebuild_rows()
+            self.endRemoveRows()
+            
+        for key in added:
+            sort_key = _sort_key(key)
+            row = bisect.bisect_right(self._sort_keys, sort_key)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._keys.insert(row, key)
+            self._sort_keys.insert(row, sort_key)
+            self._entries[key] = entries[key]
+            self._rebuild_rows()
+            self.endInsertRows()
+            
+        for key, entry in entries.items():
+            if self._entries[key] is not entry:
+                self._entry_replaced(key, self._entries[key])
+                self._entries[key] = entry
+                self._emit_row_changed(key)
                 
-    def _edit_action(self):
-        """编辑操作"""
-        from ui.gestures.gesture_dialogs import ExecuteActionEditDialog
-        
-        gesture_library = get_gesture_library()
-        action_key = str(self.action_id)
+        if removed:
+            self._drop_missing_state()
+        return bool(removed or added)
         
-        if action_key in gesture_library.execute_actions:
-            dialog = ExecuteActionEditDialog(action_key, self.parent())
-            if dialog.exec() == QDialog.DialogCode.Accepted:
-                parent = _find_parent_with_refresh(self)
-                if parent:
-                    parent.refresh_list()
-                    
-    def _delete_action(self):
-        """删除操作"""
-        reply = QMessageBox.question(
-            self, "确认删除",
-            f"确定要删除操作 '{self.action_name}' 吗？\\n\\n注意：删除操作可能会影响使用此操作的手势映射。",
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-        )
+    def _entry_replaced(self, key, old_entry):
+        """条目被替换或删除时调用，子类用于丢弃按条目缓存的数据"""
         
-        if reply == QMessageBox.StandardButton.Yes:
-            try:
-                gesture_library = get_gesture_library()
-                action_key = str(self.action_id)
+    def _drop_missing_state(self):
+        self._status = {key: value for key, value in self._status.items() if key in self._entries}
+        if self._selected_key not in self._entries:
+            self._selected_key = None
+            
+    def set_status(self, status):
+        """设置各条目的映射状态，只通知值发生变化的行"""
+        old_status = self._status
+        self._status = {key: value for key, value in status.items() if key in self._entries}
+        for key in set(old_status) | set(self._status):
+            if old_status.get(key) != self._status.get(key):
+                self._emit_row_changed(key)
                 
-                if action_key in gesture_library.execute_actions:
-                    del gesture_library.execute_actions[action_key]
-                    gesture_library.mark_data_changed("execute_actions")
-                    
-                    parent = _find_parent_with_refresh(self)
-                    if parent:
-                        parent.refresh_list()
-                        
-                    QMessageBox.information(self, "成功", "操作已删除")
-                    
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"删除操作失败: {str(e)}")
+    def selected_key(self):
+        return self._selected_key
+        
+    def set_selected_key(self, key):
+        if key is not None and key not in self._entries:
+            key = None
+        if key == self._selected_key:
+            return
+        old_key, self._selected_key = self._selected_key, key
+        self._emit_row_changed(old_key)
+        self._emit_row_changed(key)
 
 
-class PathCardWidget(QWidget):
-    """路径卡片组件"""
-    path_clicked = Signal(int, QPoint)
+class PathCardModel(GestureCardModel):
+    """路径卡片模型，额外提供路径数据和用于缩略图缓存的路径哈希"""
     
-    def __init__(self, path_id, path_name, parent=None):
-        super().__init__(parent)
-        self.path_id = path_id
-        self.path_name = path_name
-        self.is_mapped = False
-        self.mapped_action_name = ""
-        
-        self.setFixedSize(200, 120)
-        self.setStyleSheet("""
-            PathCardWidget {
-                border: 2px solid #ddd;
-                border-radius: 8px;
-                background-color: white;
-            }
-            PathCardWidget:hover {
-                border-color: #0078d4;
-                background-color: #f3f9ff;
-            }
-        """)
-        
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(10, 8, 10, 8)
-        
-        # 顶部布局：标题和按钮
-        top_layout = QHBoxLayout()
-        
-        name_label = QLabel(path_name)
-        name_label.setFont(QFont("", 10, QFont.Weight.Bold))
-        name_label.setWordWrap(True)
-        top_layout.addWidget(name_label)
-        
-        top_layout.addStretch()
-        
-        # 右上角按钮
-        buttons_layout = QHBoxLayout()
-        buttons_layout.setSpacing(3)
-        
-        self.btn_edit = _create_card_button("✏", "编辑路径", icon_name="edit")
-        self.btn_edit.clicked.connect(lambda: self._edit_path())
-        buttons_layout.addWidget(self.btn_edit)
-        
-        self.btn_delete = _create_card_button("✕", "删除路径", "color: red;", icon_name="delete")
-        self.btn_delete.clicked.connect(lambda: self._delete_path())
-        buttons_layout.addWidget(self.btn_delete)
-        
-        top_layout.addLayout(buttons_layout)
-        layout.addLayout(top_layout)
-        
-        self.status_label = QLabel("未映射")
-        self.status_label.setFont(QFont("", 9))
-        self.status_label.setStyleSheet("color: #999;")
-        layout.addWidget(self.status_label)
-        
-        layout.addStretch()
-        
-    def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
-            global_pos = self.mapToGlobal(event.pos())
-            self.path_clicked.emit(self.path_id, global_pos)
-        super().mousePressEvent(event)
-        
-    def set_mapped(self, is_mapped, action_name=""):
-        """设置映射状态"""
-        self.is_mapped = is_mapped
-        self.mapped_action_name = action_name
-        
-        if is_mapped:
-            self.status_label.setText(f"→ {action_name}")
-            self.status_label.setStyleSheet("color: #0078d4; font-weight: bold;")
-            self.setStyleSheet("""
-                PathCardWidget {
-                    border: 2px solid #0078d4;
-                    border-radius: 8px;
-                    background-color: #f3f9ff;
-                }
-                PathCardWidget:hover {
-                    border-color: #106ebe;
-                    background-color: #e6f3ff;
-                }
-            """)
-        else:
-            self.status_label.setText("未映射")
-            self.status_label.setStyleSheet("color: #999;")
-            self.setStyleSheet("""
-                PathCardWidget {
-                    border: 2px solid #ddd;
-                    border-radius: 8px;
-                    background-color: white;
-                }
-                PathCardWidget:hover {
-                    border-color: #0078d4;
-                    background-color: #f3f9ff;
-                }
-            """)
+    PathRole = Qt.ItemDataRole.UserRole + 5
+    FingerprintRole = Qt.ItemDataRole.UserRole + 6
+    
+    def __init__(self, default_name, parent=None):
+        super().__init__(default_name, parent)
+        self._fingerprints = {}
+        self.thumbnails = get_thumbnail_cache()
+        self.thumbnails.thumbnailReady.connect(self._on_thumbnail_ready)
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role in (self.PathRole, self.FingerprintRole) and index.isValid() and index.row() < len(self._keys):
+            key = self._keys[index.row()]
+            path = self._entries[key].get("path")
+            if role == self.PathRole:
+                return path
+            fingerprint = self._fingerprints.get(key)
+            if fingerprint is None:
+                fingerprint = self._fingerprints[key] = path_fingerprint(path)
+            return fingerprint
+        return super().data(index, role)
+        
+    def _entry_replaced(self, key, old_entry):
+        # 路径被编辑或删除后丢弃旧的缩略图，其他条目仍在使用同一形状时保留
+        fingerprint = self._fingerprints.pop(key, None)
+        if fingerprint is not None and fingerprint not in self._fingerprints.values():
+            self.thumbnails.discard(fingerprint)
             
-    def _edit_path(self):
-        """编辑路径"""
-        from ui.gestures.gesture_dialogs import TriggerPathEditDialog
-        
-        gesture_library = get_gesture_library()
-        path_key = str(self.path_id)
-        
-        if path_key in gesture_library.trigger_paths:
-            dialog = TriggerPathEditDialog(path_key, self.parent())
-            if dialog.exec() == QDialog.DialogCode.Accepted:
-                parent = _find_parent_with_refresh(self)
-                if parent:
-                    parent.refresh_list()
-                    
-    def _delete_path(self):
-        """删除路径"""
-        reply = QMessageBox.question(
-            self, "确认删除",
-            f"确定要删除路径 '{self.path_name}' 吗？\\n\\n注意：删除路径可能会影响使用此路径的手势映射。",
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-        )
-        
-        if reply == QMessageBox.StandardButton.Yes:
-            try:
-                gesture_library = get_gesture_library()
-                path_key = str(self.path_id)
-                
-                if path_key in gesture_library.trigger_paths:
-                    del gesture_library.trigger_paths[path_key]
-                    gesture_library.mark_data_changed("trigger_paths")
-                    
-                    parent = _find_parent_with_refresh(self)
-                    if parent:
-                        parent.refresh_list()
-                        
-                    QMessageBox.information(self, "成功", "路径已删除")
-                    
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"删除路径失败: {str(e)}")
+    def _on_thumbnail_ready(self, fingerprint):
+        for key, key_fingerprint in self._fingerprints.items():
+            if key_fingerprint == fingerprint:
+                self._emit_row_changed(key)
 
 
-class ActionCardsWidget(QWidget):
-    """操作卡片容器组件"""
+class GestureCardDelegate(QStyledItemDelegate):
+    """手势卡片委托
     
-    def __init__(self, parent=None):
+    直接绘制卡片（名称、内容、状态和右上角的编辑/删除按钮），不为每个条目创建控件，
+    列表只绘制可见的卡片。点击通过信号通知页面，参数为条目键。
+    """
+    
+    cardClicked = Signal(str)
+    editRequested = Signal(str)
+    deleteRequested = Signal(str)
+    
+    def __init__(self, kind, parent=None):
         super().__init__(parent)
-        self.action_cards = {}
-        
-        self.cards_layout = QVBoxLayout(self)
-        self.cards_layout.setSpacing(10)
-        self.cards_layout.setContentsMargins(10, 10, 10, 10)
-        
-        # 添加弹性空间，用于在底部放置添加按钮
-        self.cards_layout.addStretch()
-        
-        # 添加"添加操作"按钮
-        self.btn_add = QPushButton("添加操作")
-        self.btn_add.setMinimumSize(180, 40)
-        self.btn_add.setStyleSheet("""
-            QPushButton {
-                border: 2px dashed #ccc;
-                border-radius: 8px;
-                background-color: #f9f9f9;
-                color: #666;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                border-color: #0078d4;
-                background-color: #f3f9ff;
-                color: #0078d4;
-            }
-        """)
-        # 设置添加图标
-        assets_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 
-            "assets", "images", "ui"
+        self.kind = kind
+        self.edit_tooltip = "编辑操作" if kind == "action" else "编辑路径"
+        self.delete_tooltip = "删除操作" if kind == "action" else "删除路径"
+        self._name_font = QFont("", 10, QFont.Weight.Bold)
+        self._text_font = QFont("", 9)
+        self._bold_text_font = QFont("", 9, QFont.Weight.Bold)
+        
+    def sizeHint(self, option, index):
+        return QSize(CARD_SIZE.width(), CARD_SIZE.height() + CARD_SPACING)
+        
+    def _card_rect(self, item_rect):
+        x = item_rect.x() + max((item_rect.width() - CARD_SIZE.width()) // 2, 0)
+        y = item_rect.y() + CARD_SPACING // 2
+        return QRect(x, y, CARD_SIZE.width(), CARD_SIZE.height())
+        
+    def _button_rects(self, card_rect):
+        top = card_rect.top() + 8
+        delete_rect = QRect(card_rect.right() - 10 - CARD_BUTTON_SIZE + 1, top, CARD_BUTTON_SIZE, CARD_BUTTON_SIZE)
+        edit_rect = delete_rect.translated(-(CARD_BUTTON_SIZE + 3), 0)
+        return edit_rect, delete_rect
+        
+    def _card_style(self, selected, status, hovered):
+        """返回 (边框宽度, 边框颜色, 背景颜色, 状态文本, 状态颜色, 状态是否加粗)"""
+        if self.kind == "action":
+            if selected:
+                border, background = ("#106ebe", "#d1e9ff") if hovered else ("#0078d4", "#e6f3ff")
+                return 3, border, background, "已选中 - 请选择路径", "#0078d4", True
+            border, background = ("#0078d4", "#f3f9ff") if hovered else ("#ddd", "white")
+            if status:
+                return 2, border, background, f"已连接 {status} 个路径", "#28a745", True
+            return 2, border, background, "可连接", "#999", False
+            
+        if status:
+            border, background = ("#106ebe", "#e6f3ff") if hovered else ("#0078d4", "#f3f9ff")
+            return 2, border, background, f"→ {status}", "#0078d4", True
+        border, background = ("#0078d4", "#f3f9ff") if hovered else ("#ddd", "white")
+        return 2, border, background, "未映射", "#999", False
+        
+    def paint(self, painter, option, index):
+        card = self._card_rect(option.rect)
+        hovered = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        border_width, border, background, status_text, status_color, status_bold = self._card_style(
+            index.data(GestureCardModel.SelectedRole), index.data(GestureCardModel.StatusRole), hovered
         )
-        add_icon_path = os.path.join(assets_dir, "add.svg")
-        if os.path.exists(add_icon_path):
-            self.btn_add.setIcon(QIcon(add_icon_path))
-            self.btn_add.setIconSize(QSize(20, 20))
-        
-        self.btn_add.clicked.connect(self._add_new_action)
-        self.cards_layout.addWidget(self.btn_add)
         
-    def _add_new_action(self):
-        """添加新操作"""
-        from ui.gestures.gesture_dialogs import ExecuteActionEditDialog
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         
-        dialog = ExecuteActionEditDialog(None, self.parent())
-        if dialog.exec() == QDialog.DialogCode.Accepted:
-            parent = _find_parent_with_refresh(self)
-            if parent:
-                parent.refresh_list()
-        
-    def add_action_card(self, action_id, action_name, action_value):
-        """添加操作卡片"""
-        card = ActionCardWidget(action_id, action_name, action_value)
-        self.action_cards[action_id] = card
-        # 插入到添加按钮之前（倒数第二个位置）
-        self.cards_layout.insertWidget(self.cards_layout.count() - 1, card)
-        return card
-        
-    def remove_action_card(self, action_id):
-        """移除操作卡片"""
-        if action_id in self.action_cards:
-            card = self.action_cards[action_id]
-            self.cards_layout.removeWidget(card)
-            card.deleteLater()
-            del self.action_cards[action_id]
+        inset = border_width / 2
+        painter.setPen(QPen(QColor(border), border_width))
+        painter.setBrush(QColor(background))
+        painter.drawRoundedRect(card.toRectF().adjusted(inset, inset, -inset, -inset), 8, 8)
+        
+        edit_rect, delete_rect = self._button_rects(card)
+        for rect, icon_name, fallback, color in (
+            (edit_rect, "edit", "✏", "#333"), (delete_rect, "delete", "✕", "red"),
+        ):
+            icon = _ui_icon(icon_name)
+            if icon is not None:
+                icon.paint(painter, rect.adjusted(2, 2, -2, -2))
+            else:
+                painter.setPen(QColor(color))
+                painter.setFont(self._text_font)
+                painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, fallback)
+                
+        left = card.left() + 10
+        width = card.width() - 20
+        painter.setPen(QColor("black"))
+        painter.setFont(self._name_font)
+        name = QFontMetrics(self._name_font).elidedText(
+            index.data(Qt.ItemDataRole.DisplayRole), Qt.TextElideMode.ElideRight, edit_rect.left() - 6 - left
+        )
+        painter.drawText(QRect(left, card.top() + 8, edit_rect.left() - 6 - left, CARD_BUTTON_SIZE),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, name)
+                         
+        status_top = card.top() + 34
+        if self.kind == "action":
+            value = index.data(GestureCardModel.ValueRole) or ""
+            display_value = value if len(value) <= 30 else value[:30] + "..."
+            painter.setPen(QColor("#666"))
+            painter.setFont(self._text_font)
+            painter.drawText(QRect(left, status_top, width, 38),
+                             Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop | Qt.TextFlag.TextWrapAnywhere,
+                             f"内容: {display_value}")
+            status_top += 42
+        else:
+            thumbnail_rect = self._thumbnail_rect(card)
+            width = thumbnail_rect.left() - 6 - left
+            self._draw_thumbnail(painter, option, index, thumbnail_rect)
             
-    def clear_action_cards(self):
-        """清空所有操作卡片"""
-        for card in self.action_cards.values():
-            self.cards_layout.removeWidget(card)
-            card.deleteLater()
-        self.action_cards.clear()
-        
-    def get_action_card(self, action_id):
-        """获取操作卡片"""
-        return self.action_cards.get(action_id)
-        
-    def clear_all_selections(self):
-        """清除所有选中状态"""
-        for card in self.action_cards.values():
-            card.set_selected(False)
-
-
-class PathCardsWidget(QWidget):
-    """路径卡片容器组件"""
-    
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.path_cards = {}
-        
-        self.cards_layout = QVBoxLayout(self)
-        self.cards_layout.setSpacing(10)
-        self.cards_layout.setContentsMargins(10, 10, 10, 10)
-        
-        # 添加弹性空间，用于在底部放置添加按钮
-        self.cards_layout.addStretch()
-        
-        # 添加"添加路径"按钮
-        self.btn_add = QPushButton("添加路径")
-        self.btn_add.setMinimumSize(180, 40)
-        self.btn_add.setStyleSheet("""
-            QPushButton {
-                border: 2px dashed #ccc;
-                border-radius: 8px;
-                background-color: #f9f9f9;
-                color: #666;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                border-color: #0078d4;
-                background-color: #f3f9ff;
-                color: #0078d4;
-            }
-        """)
-        # 设置添加图标
-        assets_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 
-            "assets", "images", "ui"
+        painter.setPen(QColor(status_color))
+        painter.setFont(self._bold_text_font if status_bold else self._text_font)
+        status_text = QFontMetrics(painter.font()).elidedText(status_text, Qt.TextElideMode.ElideRight, width)
+        painter.drawText(QRect(left, status_top, width, 18), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         status_text)
+        painter.restore()
+        
+    def _thumbnail_rect(self, card_rect):
+        return QRect(card_rect.right() - 10 - THUMBNAIL_SIZE.width() + 1, card_rect.top() + 38,
+                     THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height())
+                     
+    def _draw_thumbnail(self, painter, option, index, rect):
+        """绘制路径缩略图，尚未渲染完成时绘制占位框"""
+        ratio = option.widget.devicePixelRatioF() if option.widget is not None else 1.0
+        pixmap = get_thumbnail_cache().get(
+            index.data(PathCardModel.FingerprintRole), index.data(PathCardModel.PathRole), THUMBNAIL_SIZE, ratio
         )
-        add_icon_path = os.path.join(assets_dir, "add.svg")
-        if os.path.exists(add_icon_path):
-            self.btn_add.setIcon(QIcon(add_icon_path))
-            self.btn_add.setIconSize(QSize(20, 20))
-        
-        self.btn_add.clicked.connect(self._add_new_path)
-        self.cards_layout.addWidget(self.btn_add)
-        
-    def _add_new_path(self):
-        """添加新路径"""
-        from ui.gestures.gesture_dialogs import TriggerPathEditDialog
-        
-        dialog = TriggerPathEditDialog(None, self.parent())
-        if dialog.exec() == QDialog.DialogCode.Accepted:
-            parent = _find_parent_with_refresh(self)
-            if parent:
-                parent.refresh_list()
-        
-    def add_path_card(self, path_id, path_name):
-        """添加路径卡片"""
-        card = PathCardWidget(path_id, path_name)
-        self.path_cards[path_id] = card
-        # 插入到添加按钮之前（倒数第二个位置）
-        self.cards_layout.insertWidget(self.cards_layout.count() - 1, card)
-        return card
-        
-    def remove_path_card(self, path_id):
-        """移除路径卡片"""
-        if path_id in self.path_cards:
-            card = self.path_cards[path_id]
-            self.cards_layout.removeWidget(card)
-            card.deleteLater()
-            del self.path_cards[path_id]
+        if pixmap is not None:
+            painter.drawPixmap(rect.topLeft(), pixmap)
+        else:
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(0, 0, 0, 12))
+            painter.drawRoundedRect(rect.toRectF(), 4, 4)
             
-    def clear_path_cards(self):
-        """清空所有路径卡片"""
-        for card in self.path_cards.values():
-            self.cards_layout.removeWidget(card)
-            card.deleteLater()
-        self.path_cards.clear()
-        
-    def get_path_card(self, path_id):
-        """获取路径卡片"""
-        return self.path_cards.get(path_id)
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            key = index.data(GestureCardModel.KeyRole)
+            pos = event.position().toPoint()
+            card = self._card_rect(option.rect)
+            edit_rect, delete_rect = self._button_rects(card)
+            if edit_rect.contains(pos):
+                self.editRequested.emit(key)
+            elif delete_rect.contains(pos):
+                self.deleteRequested.emit(key)
+            elif card.contains(pos):
+                self.cardClicked.emit(key)
+            return True
+        return super().editorEvent(event, model, option, index)
+        
+    def helpEvent(self, event, view, option, index):
+        if event.type() == QEvent.Type.ToolTip:
+            edit_rect, delete_rect = self._button_rects(self._card_rect(option.rect))
+            for rect, text in ((edit_rect, self.edit_tooltip), (delete_rect, self.delete_tooltip)):
+                if rect.contains(event.pos()):
+                    QToolTip.showText(event.globalPos(), text, view, rect)
+                    return True
+        return super().helpEvent(event, view, option, index)
+
+
+def _create_card_view(model, delegate):
+    """创建卡片列表视图，卡片大小固定，滚动时只绘制可见的卡片"""
+    view = QListView()
+    view.setModel(model)
+    view.setItemDelegate(delegate)
+    view.setUniformItemSizes(True)
+    view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+    view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+    view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+    view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+    view.setFrameShape(QFrame.Shape.NoFrame)
+    view.setMouseTracking(True)
+    view.viewport().setAttribute(Qt.WidgetAttribute.WA_Hover, True)
+    view.setStyleSheet("QListView { background: transparent; }")
+    return view
+
+
+def _create_add_button(text):
+    btn_add = QPushButton(text)
+    btn_add.setMinimumSize(180, 40)
+    btn_add.setStyleSheet("""
+        QPushButton {
+            border: 2px dashed #ccc;
+            border-radius: 8px;
+            background-color: #f9f9f9;
+            color: #666;
+            font-weight: bold;
+        }
+        QPushButton:hover {
+            border-color: #0078d4;
+            background-color: #f3f9ff;
+            color: #0078d4;
+        }
+    """)
+    _set_button_icon(btn_add, "add", 20)
+    return btn_add
 
 
 class GesturesPage(QWidget):
@@ -654,6 +708,13 @@ class GesturesPage(QWidget):
         self.gesture_library = get_gesture_library()
         
         self.selected_action_id = None
+        self._mapped_pairs = []
+        
+        # 滚动、增删行和窗口大小变化时合并为一次连线更新
+        self._connections_timer = QTimer(self)
+        self._connections_timer.setSingleShot(True)
+        self._connections_timer.setInterval(0)
+        self._connections_timer.timeout.connect(self._update_connections)
         
         self.initUI()
         self._load_data()
@@ -676,20 +737,10 @@ class GesturesPage(QWidget):
         title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(title)
         
-        # 创建滚动区域用于核心内容
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
-        self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
-        
-        # 滚动区域内容
-        scroll_content = QWidget()
-        scroll_layout = QVBoxLayout(scroll_content)
-        scroll_layout.setContentsMargins(10, 10, 10, 10)
-                
-        # 核心内容布局
+        # 核心内容布局，两侧的卡片列表各自滚动
         content_layout = QHBoxLayout()
         content_layout.setSpacing(20)
+        content_layout.setContentsMargins(10, 10, 10, 10)
         
         # 左侧操作面板
         left_panel = self._create_actions_panel()
@@ -715,11 +766,16 @@ class GesturesPage(QWidget):
         right_panel = self._create_paths_panel()
         content_layout.addWidget(right_panel)
         
-        scroll_layout.addLayout(content_layout, 1)
-        
-        self.scroll_area.setWidget(scroll_content)
-        layout.addWidget(self.scroll_area)
+        layout.addLayout(content_layout, 1)
         
+        for view in (self.action_view, self.path_view):
+            view.verticalScrollBar().valueChanged.connect(self._schedule_connections_update)
+            view.verticalScrollBar().rangeChanged.connect(self._schedule_connections_update)
+            model = view.model()
+            model.rowsInserted.connect(self._schedule_connections_update)
+            model.rowsRemoved.connect(self._schedule_connections_update)
+            model.modelReset.connect(self._schedule_connections_update)
+            
         # 底部统一操作按钮 - 与设置页面保持完全一致
         bottom_layout = QHBoxLayout()
         bottom_layout.setSpacing(10)
@@ -728,17 +784,17 @@ class GesturesPage(QWidget):
         self.btn_reset = QPushButton("重置为默认")
         self.btn_reset.setMinimumSize(120, 35)
         self.btn_reset.clicked.connect(self._reset_to_default)
-        # 设置重置图标
-        assets_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 
-            "assets", "images", "ui"
-        )
-        reset_icon_path = os.path.join(assets_dir, "reset.svg")
-        if os.path.exists(reset_icon_path):
-            self.btn_reset.setIcon(QIcon(reset_icon_path))
-            self.btn_reset.setIconSize(QSize(18, 18))
+        _set_button_icon(self.btn_reset, "reset", 18)
         bottom_layout.addWidget(self.btn_reset)
         
+        # 冲突检测按钮
+        self.btn_conflicts = QPushButton("冲突检测")
+        self.btn_conflicts.setMinimumSize(100, 35)
+        self.btn_conflicts.setToolTip("检查哪些触发路径在当前识别阈值下会被互相识别")
+        self.btn_conflicts.clicked.connect(self._show_conflicts)
+        _set_button_icon(self.btn_conflicts, "recognizer-settings", 18)
+        bottom_layout.addWidget(self.btn_conflicts)
+        
         bottom_layout.addStretch()
         
         # 放弃修改按钮
@@ -746,11 +802,7 @@ class GesturesPage(QWidget):
         self.btn_discard.setMinimumSize(100, 35)
         self.btn_discard.clicked.connect(self._discard_changes)
         self.btn_discard.setEnabled(False)
-        # 设置取消图标
-        cancel_icon_path = os.path.join(assets_dir, "cancel.svg")
-        if os.path.exists(cancel_icon_path):
-            self.btn_discard.setIcon(QIcon(cancel_icon_path))
-            self.btn_discard.setIconSize(QSize(18, 18))
+        _set_button_icon(self.btn_discard, "cancel", 18)
         bottom_layout.addWidget(self.btn_discard)
         
         # 保存设置按钮
@@ -758,11 +810,7 @@ class GesturesPage(QWidget):
         self.btn_save_library.setMinimumSize(100, 35)
         self.btn_save_library.clicked.connect(self._save_gesture_library)
         self.btn_save_library.setEnabled(False)
-        # 设置保存图标
-        save_icon_path = os.path.join(assets_dir, "save.svg")
-        if os.path.exists(save_icon_path):
-            self.btn_save_library.setIcon(QIcon(save_icon_path))
-            self.btn_save_library.setIconSize(QSize(18, 18))
+        _set_button_icon(self.btn_save_library, "save", 18)
         bottom_layout.addWidget(self.btn_save_library)
         
         layout.addLayout(bottom_layout)
@@ -775,10 +823,17 @@ class GesturesPage(QWidget):
         layout = QVBoxLayout(panel)
         layout.setContentsMargins(5, 10, 5, 10)
         
-        self.action_cards_widget = ActionCardsWidget()
-        layout.addWidget(self.action_cards_widget)
+        self.action_model = GestureCardModel("操作", self)
+        self.action_delegate = GestureCardDelegate("action", self)
+        self.action_delegate.cardClicked.connect(self._on_action_clicked, Qt.ConnectionType.QueuedConnection)
+        self.action_delegate.editRequested.connect(self._edit_action, Qt.ConnectionType.QueuedConnection)
+        self.action_delegate.deleteRequested.connect(self._delete_action, Qt.ConnectionType.QueuedConnection)
+        self.action_view = _create_card_view(self.action_model, self.action_delegate)
+        layout.addWidget(self.action_view, 1)
         
-        layout.addStretch()
+        self.btn_add_action = _create_add_button("添加操作")
+        self.btn_add_action.clicked.connect(self._add_new_action)
+        layout.addWidget(self.btn_add_action, 0, Qt.AlignmentFlag.AlignHCenter)
         
         return panel
         
@@ -790,80 +845,48 @@ class GesturesPage(QWidget):
         layout = QVBoxLayout(panel)
         layout.setContentsMargins(5, 10, 5, 10)
         
-        self.path_cards_widget = PathCardsWidget()
-        layout.addWidget(self.path_cards_widget)
+        self.path_model = PathCardModel("路径", self)
+        self.path_delegate = GestureCardDelegate("path", self)
+        self.path_delegate.cardClicked.connect(self._on_path_clicked, Qt.ConnectionType.QueuedConnection)
+        self.path_delegate.editRequested.connect(self._edit_path, Qt.ConnectionType.QueuedConnection)
+        self.path_delegate.deleteRequested.connect(self._delete_path, Qt.ConnectionType.QueuedConnection)
+        self.path_view = _create_card_view(self.path_model, self.path_delegate)
+        layout.addWidget(self.path_view, 1)
         
-        layout.addStretch()
+        self.btn_add_path = _create_add_button("添加路径")
+        self.btn_add_path.clicked.connect(self._add_new_path)
+        layout.addWidget(self.btn_add_path, 0, Qt.AlignmentFlag.AlignHCenter)
         
         return panel
         
     def _load_data(self):
-        """加载数据"""
-        self._load_actions()
-        self._load_paths()
+        """与手势库同步，只更新发生变化的卡片"""
+        self.action_model.sync(self.gesture_library.execute_actions)
+        self.path_model.sync(self.gesture_library.trigger_paths)
+        if self.action_model.selected_key() is None:
+            self.selected_action_id = None
         self._load_existing_mappings()
         
-    def _load_actions(self):
-        """加载操作卡片"""
-        self.action_cards_widget.clear_action_cards()
-        
-        execute_actions = self.gesture_library.execute_actions
-        sorted_actions = sorted(execute_actions.items(), key=lambda x: int(x[0]) if x[0].isdigit() else 0)
-        
-        for action_key, action_data in sorted_actions:
-            action_id = int(action_key) if action_key.isdigit() else 0
-            action_name = action_data.get('name', f'操作{action_id}')
-            action_value = action_data.get('value', '')
-            
-            card = self.action_cards_widget.add_action_card(action_id, action_name, action_value)
-            card.action_clicked.connect(self._on_action_clicked)
-            
-        self.logger.debug(f"已加载 {len(execute_actions)} 个执行操作")
-        
-    def _load_paths(self):
-        """加载路径卡片"""
-        self.path_cards_widget.clear_path_cards()
-        
-        trigger_paths = self.gesture_library.trigger_paths
-        sorted_paths = sorted(trigger_paths.items(), key=lambda x: int(x[0]) if x[0].isdigit() else 0)
-        
-        for path_key, path_data in sorted_paths:
-            path_id = int(path_key) if path_key.isdigit() else 0
-            path_name = path_data.get('name', f'路径{path_id}')
-            
-            card = self.path_cards_widget.add_path_card(path_id, path_name)
-            card.path_clicked.connect(self._on_path_clicked)
-            
-        self.logger.debug(f"已加载 {len(trigger_paths)} 个触发路径")
-        
     def _load_existing_mappings(self):
-        """加载现有映射"""
-        self.connection_widget.clear_connections()
-        
+        """根据手势库的映射更新卡片状态和连线"""
         action_path_counts = {}
+        path_action_names = {}
+        mapped_pairs = []
         
-        gesture_mappings = self.gesture_library.gesture_mappings
-        
-        for mapping_key, mapping_data in gesture_mappings.items():
+        for mapping_data in self.gesture_library.gesture_mappings.values():
             trigger_path_id = mapping_data.get('trigger_path_id')
             execute_action_id = mapping_data.get('execute_action_id')
             
             if trigger_path_id and execute_action_id:
-                action_path_counts[execute_action_id] = action_path_counts.get(execute_action_id, 0) + 1
-                
-                path_card = self.path_cards_widget.get_path_card(trigger_path_id)
-                if path_card:
-                    action_name = self._get_action_name_by_id(execute_action_id)
-                    path_card.set_mapped(True, action_name)
-                    
-        for action_id, count in action_path_counts.items():
-            action_card = self.action_cards_widget.get_action_card(action_id)
-            if action_card:
-                action_card.set_mapped_count(count)
+                action_key = str(execute_action_id)
+                action_path_counts[action_key] = action_path_counts.get(action_key, 0) + 1
+                path_action_names[str(trigger_path_id)] = self._get_action_name_by_id(execute_action_id)
+                mapped_pairs.append((execute_action_id, trigger_path_id))
                 
-        QTimer.singleShot(100, lambda: self._update_connections())
-                
-        self.logger.debug(f"已加载 {len(gesture_mappings)} 个手势映射")
+        self.action_model.set_status(action_path_counts)
+        self.path_model.set_status(path_action_names)
+        self._mapped_pairs = mapped_pairs
+        self._schedule_connections_update()
         
     def _get_action_name_by_id(self, action_id):
         """根据ID获取操作名称"""
@@ -873,28 +896,98 @@ class GesturesPage(QWidget):
             return action_data.get('name', f'操作{action_id}')
         return f'操作{action_id}(未找到)'
         
-    def _on_action_clicked(self, action_id, global_pos):
+    def _on_action_clicked(self, action_key):
         """操作被点击"""
-        self.action_cards_widget.clear_all_selections()
-        
-        self.selected_action_id = action_id
-        action_card = self.action_cards_widget.get_action_card(action_id)
-        if action_card:
-            action_card.set_selected(True)
+        self.action_model.set_selected_key(action_key)
+        self.selected_action_id = _entry_id(action_key)
         
-        self.logger.debug(f"选中操作: {action_id}")
+        self.logger.debug(f"选中操作: {self.selected_action_id}")
         
-    def _on_path_clicked(self, path_id, global_pos):
+    def _on_path_clicked(self, path_key):
         """路径被点击"""
         if self.selected_action_id is None:
             QMessageBox.information(self, "提示", "请先选择一个执行操作")
             return
             
-        self._create_mapping(self.selected_action_id, path_id)
+        self._create_mapping(self.selected_action_id, _entry_id(path_key))
         
         self.selected_action_id = None
-        self.action_cards_widget.clear_all_selections()
+        self.action_model.set_selected_key(None)
+        
+    def _add_new_action(self):
+        """添加新操作"""
+        from ui.gestures.gesture_dialogs import ExecuteActionEditDialog
+        
+        dialog = ExecuteActionEditDialog(None, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.refresh_list()
+            
+    def _edit_action(self, action_key):
+        """编辑操作"""
+        from ui.gestures.gesture_dialogs import ExecuteActionEditDialog
+        
+        if action_key in self.gesture_library.execute_actions:
+            dialog = ExecuteActionEditDialog(action_key, self)
+            if dialog.exec() == QDialog.DialogCode.Accepted:
+                self.refresh_list()
+                
+    def _delete_action(self, action_key):
+        """删除操作"""
+        action_name = self._get_action_name_by_id(action_key)
+        reply = QMessageBox.question(
+            self, "确认删除",
+            f"确定要删除操作 '{action_name}' 吗？\\n\\n注意：删除操作可能会影响使用此操作的手势映射。",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        
+        if reply == QMessageBox.StandardButton.Yes:
+            try:
+                if action_key in self.gesture_library.execute_actions:
+                    del self.gesture_library.execute_actions[action_key]
+                    self.gesture_library.mark_data_changed("execute_actions", action_key)
+                    self.refresh_list()
+                    QMessageBox.information(self, "成功", "操作已删除")
+                    
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"删除操作失败: {str(e)}")
+                
+    def _add_new_path(self):
+        """添加新路径"""
+        from ui.gestures.gesture_dialogs import TriggerPathEditDialog
+        
+        dialog = TriggerPathEditDialog(None, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.refresh_list()
+            
+    def _edit_path(self, path_key):
+        """编辑路径"""
+        from ui.gestures.gesture_dialogs import TriggerPathEditDialog
+        
+        if path_key in self.gesture_library.trigger_paths:
+            dialog = TriggerPathEditDialog(path_key, self)
+            if dialog.exec() == QDialog.DialogCode.Accepted:
+                self.refresh_list()
+                
+    def _delete_path(self, path_key):
+        """删除路径"""
+        path_name = self._get_path_name_by_id(path_key)
+        reply = QMessageBox.question(
+            self, "确认删除",
+            f"确定要删除路径 '{path_name}' 吗？\\n\\n注意：删除路径可能会影响使用此路径的手势映射。",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
         
+        if reply == QMessageBox.StandardButton.Yes:
+            try:
+                if path_key in self.gesture_library.trigger_paths:
+                    del self.gesture_library.trigger_paths[path_key]
+                    self.gesture_library.mark_data_changed("trigger_paths", path_key)
+                    self.refresh_list()
+                    QMessageBox.information(self, "成功", "路径已删除")
+                    
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"删除路径失败: {str(e)}")
+                
     def _create_mapping(self, action_id, path_id):
         """创建映射"""
         try:
@@ -908,7 +1001,7 @@ class GesturesPage(QWidget):
                     
             for old_key in old_mapping_keys:
                 del self.gesture_library.gesture_mappings[old_key]
-            
+                
             mapping_key = str(new_id)
             action_name = self._get_action_name_by_id(action_id)
             path_name = self._get_path_name_by_id(path_id)
@@ -919,15 +1012,9 @@ class GesturesPage(QWidget):
                 'execute_action_id': action_id
             }
             
-            self.gesture_library.mark_data_changed("gesture_mappings")
+            self.gesture_library.mark_data_changed("gesture_mappings", *old_mapping_keys, mapping_key)
             
-            path_card = self.path_cards_widget.get_path_card(path_id)
-            if path_card:
-                path_card.set_mapped(True, action_name)
-                
-            self._update_action_mapped_counts()
-                
-            self._update_connections()
+            self._load_existing_mappings()
             
             self.logger.info(f"创建映射: 操作{action_id} → 路径{path_id}")
             
@@ -943,71 +1030,59 @@ class GesturesPage(QWidget):
             return path_data.get('name', f'路径{path_id}')
         return f'路径{path_id}(未找到)'
         
-    def _update_action_mapped_counts(self):
-        """更新操作卡片的映射数量"""
-        action_path_counts = {}
-        
-        gesture_mappings = self.gesture_library.gesture_mappings
-        for mapping_data in gesture_mappings.values():
-            execute_action_id = mapping_data.get('execute_action_id')
-            if execute_action_id:
-                action_path_counts[execute_action_id] = action_path_counts.get(execute_action_id, 0) + 1
-        
-        for action_id, card in self.action_cards_widget.action_cards.items():
-            count = action_path_counts.get(action_id, 0)
-            card.set_mapped_count(count)
+    def _schedule_connections_update(self, *args):
+        self._connections_timer.start()
         
     def _update_connections(self):
-        """更新连线显示"""
-        self.connection_widget.clear_connections()
-        
-        gesture_mappings = self.gesture_library.gesture_mappings
-        
-        for mapping_data in gesture_mappings.values():
-            trigger_path_id = mapping_data.get('trigger_path_id')
-            execute_action_id = mapping_data.get('execute_action_id')
-            
-            if trigger_path_id and execute_action_id:
-                action_card = self.action_cards_widget.get_action_card(execute_action_id)
-                path_card = self.path_cards_widget.get_path_card(trigger_path_id)
+        """更新连线显示，端点为两侧列表中卡片的中心（包括滚出可见区域的卡片）"""
+        action_offset = self.action_view.viewport().mapTo(self, QPoint(0, 0)) - self.connection_widget.mapTo(self, QPoint(0, 0))
+        path_offset = self.path_view.viewport().mapTo(self, QPoint(0, 0)) - self.connection_widget.mapTo(self, QPoint(0, 0))
+        
+        connections = []
+        for execute_action_id, trigger_path_id in self._mapped_pairs:
+            action_index = self.action_model.index_of(str(execute_action_id))
+            path_index = self.path_model.index_of(str(trigger_path_id))
+            if action_index.isValid() and path_index.isValid():
+                action_local = self.action_view.visualRect(action_index).center() + action_offset
+                path_local = self.path_view.visualRect(path_index).center() + path_offset
+                connections.append((execute_action_id, trigger_path_id, action_local, path_local))
                 
-                if action_card and path_card:
-                    action_global = action_card.mapToGlobal(action_card.rect().center())
-                    action_local = self.connection_widget.mapFromGlobal(action_global)
-                    
-                    path_global = path_card.mapToGlobal(path_card.rect().center())
-                    path_local = self.connection_widget.mapFromGlobal(path_global)
-                    
-                    self.connection_widget.add_connection(
-                        execute_action_id, trigger_path_id, action_local, path_local
-                    )
-                    
+        self.connection_widget.set_connections(connections)
+        
     def _save_gesture_library(self):
         """保存手势库"""
         try:
-            success = self.gesture_library.save()
+            success = self.gesture_library.save(wait=True)
             if success:
                 QMessageBox.information(self, "成功", "设置已保存")
                 self.logger.info("手势库已保存")
             else:
                 QMessageBox.critical(self, "错误", "保存设置失败")
-                    
+                
         except Exception as e:
             self.logger.error(f"保存手势库时出错: {e}")
             QMessageBox.critical(self, "错误", f"保存设置失败: {str(e)}")
             
+    def _show_conflicts(self):
+        """检测触发路径之间的冲突"""
+        from ui.gestures.gesture_dialogs import GestureConflictDialog
+        
+        dialog = GestureConflictDialog(self)
+        dialog.exec()
+        
     def _reset_to_default(self):
         """重置为默认手势库"""
         reply = QMessageBox.question(
-            self, "确认重置", 
+            self, "确认重置",
             "确定要重置为默认手势库吗？这将丢失所有自定义的手势设置。",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
-
+        
         if reply == QMessageBox.StandardButton.Yes:
             try:
                 success = self.gesture_library.reset_to_default()
                 if success:
+                    self.refresh_list()
                     QMessageBox.information(self, "成功", "已重置为默认手势库")
                     self.logger.info("手势库已重置为默认")
                 else:
@@ -1020,21 +1095,22 @@ class GesturesPage(QWidget):
     def _discard_changes(self):
         """放弃修改"""
         reply = QMessageBox.question(
-            self, "确认放弃", 
+            self, "确认放弃",
             "确定要放弃所有修改吗？这将丢失所有未保存的更改。",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
-
+        
         if reply == QMessageBox.StandardButton.Yes:
             try:
                 # 重新加载手势库数据，放弃内存中的修改
                 self.gesture_library.load()
+                self.refresh_list()
                 QMessageBox.information(self, "成功", "所有未保存的更改已放弃")
                 self.logger.info("已放弃所有修改")
             except Exception as e:
                 self.logger.error(f"放弃修改时出错: {e}")
                 QMessageBox.critical(self, "错误", f"放弃修改失败: {str(e)}")
-            
+                
     def _delete_mapping_by_path_id(self, path_id):
         """根据路径ID删除映射"""
         try:
@@ -1047,22 +1123,16 @@ class GesturesPage(QWidget):
                 del self.gesture_library.gesture_mappings[mapping_key]
                 
             if mapping_keys_to_delete:
-                self.gesture_library.mark_data_changed("gesture_mappings")
+                self.gesture_library.mark_data_changed("gesture_mappings", *mapping_keys_to_delete)
                 
-                path_card = self.path_cards_widget.get_path_card(path_id)
-                if path_card:
-                    path_card.set_mapped(False)
-                    
-                self._update_action_mapped_counts()
-                    
                 self.connection_widget.selected_connection = None
-                self._update_connections()
+                self._load_existing_mappings()
                 
                 self.logger.info(f"已删除路径{path_id}的映射")
-            
+                
         except Exception as e:
             self.logger.error(f"删除映射时出错: {e}")
-        
+            
     def _check_library_changes(self):
         """检查手势库是否有变更"""
         has_changes = self.gesture_library.has_changes()
@@ -1083,4 +1153,4 @@ class GesturesPage(QWidget):
     def resizeEvent(self, event):
         """窗口大小改变事件"""
         super().resizeEvent(event)
-        QTimer.singleShot(50, self._update_connections)
\ No newline at end of file
+        self._schedule_connections_update()
@@ -0,0 +1,138 @@
+"""
+路径编辑历史模块
+
+绘制组件的撤回/还原历史。每次编辑记录为一个命令，只保存这次编辑改变的内容
+（移动的点的新旧坐标、添加或删除的点、被替换的连接列表），不复制整个路径，
+撤回和还原的开销只与这次编辑的大小有关。
+
+命令都在编辑已经完成后创建并压入历史，undo()/redo() 直接修改传入的路径列表。
+路径中的点坐标是不可变的元组或只会被整体替换的列表，命令之间共享这些对象而不复制。
+"""
+
+from collections import deque
+
+# 最多保留的撤回步数
+HISTORY_LIMIT = 50
+
+
+class ReplacePathsCommand:
+    """替换全部路径（画笔绘制新路径时会清空原有路径）"""
+
+    def __init__(self, old_paths, new_paths):
+        self.old_paths = list(old_paths)
+        self.new_paths = list(new_paths)
+
+    def undo(self, paths):
+        paths[:] = self.old_paths
+
+    def redo(self, paths):
+        paths[:] = self.new_paths
+
+
+class MovePointCommand:
+    """移动一个点"""
+
+    def __init__(self, path_index, point_index, old_point, new_point):
+        self.path_index = path_index
+        self.point_index = point_index
+        self.old_point = old_point
+        self.new_point = new_point
+
+    def undo(self, paths):
+        paths[self.path_index]['points'][self.point_index] = self.old_point
+
+    def redo(self, paths):
+        paths[self.path_index]['points'][self.point_index] = self.new_point
+
+
+class AddPointCommand:
+    """在路径末尾添加一个点，connection 是同时添加的连接（第一个点没有连接）"""
+
+    def __init__(self, path_index, point, connection=None):
+        self.path_index = path_index
+        self.point = point
+        self.connection = connection
+
+    def undo(self, paths):
+        path = paths[self.path_index]
+        path['points'].pop()
+        if self.connection is not None:
+            path['connections'].pop()
+
+    def redo(self, paths):
+        path = paths[self.path_index]
+        path['points'].append(self.point)
+        if self.connection is not None:
+            path['connections'].append(self.connection)
+
+
+class DeletePointCommand:
+    """删除一个点
+
+    删除点需要重新编号连接，这里直接保存删除前后的连接列表，撤回时换回原列表。
+    删除的是路径的最后一个点时，整个路径也被删除（removed_path）。
+    """
+
+    def __init__(self, path_index, point_index, point, old_connections, new_connections, removed_path=None):
+        self.path_index = path_index
+        self.point_index = point_index
+        self.point = point
+        self.old_connections = old_connections
+        self.new_connections = new_connections
+        self.removed_path = removed_path
+
+    def undo(self, paths):
+        if self.removed_path is not None:
+            paths.insert(self.path_index, self.removed_path)
+        path = paths[self.path_index]
+        path['points'].insert(self.point_index, self.point)
+        path['connections'] = self.old_connections
+
+    def redo(self, paths):
+        path = paths[self.path_index]
+        del path['points'][self.point_index]
+        if self.removed_path is not None:
+            del paths[self.path_index]
+        else:
+            path['connections'] = self.new_connections
+
+
+class PathHistory:
+    """命令式撤回/还原历史，最多保留 limit 步，超出时丢弃最早的命令"""
+
+    def __init__(self, limit=HISTORY_LIMIT):
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+
+    def push(self, command):
+        """记录一个已经执行的命令，同时丢弃可还原的命令"""
+        self._undo.append(command)
+        self._redo.clear()
+
+    def undo(self, paths):
+        """撤回最近一个命令，没有可撤回的命令时返回None"""
+        if not self._undo:
+            return None
+        command = self._undo.pop()
+        command.undo(paths)
+        self._redo.append(command)
+        return command
+
+    def redo(self, paths):
+        """还原最近撤回的命令，没有可还原的命令时返回None"""
+        if not self._redo:
+            return None
+        command = self._redo.pop()
+        command.redo(paths)
+        self._undo.append(command)
+        return command
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
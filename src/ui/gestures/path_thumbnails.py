@@ -0,0 +1,187 @@
+"""
+触发路径缩略图模块
+
+把触发路径渲染为小图用于路径卡片预览。渲染使用 QImage，在后台线程池中进行，
+完成后回到界面线程转换为 QPixmap 并放入按内存大小限制的LRU缓存。缓存键是路径
+点和连接的哈希，路径被编辑后哈希随之变化，旧的缩略图由使用者丢弃或被LRU淘汰。
+"""
+
+import hashlib
+from collections import OrderedDict
+
+from qtpy.QtCore import QObject, QPointF, QRectF, QRunnable, QSize, QThreadPool, Qt, Signal
+from qtpy.QtGui import QColor, QImage, QPainter, QPen, QPixmap
+
+from core.logger import get_logger
+
+THUMBNAIL_SIZE = QSize(72, 72)
+# 缩略图缓存的内存上限（字节），按 宽 × 高 × 4 计算
+THUMBNAIL_CACHE_BYTES = 8 * 1024 * 1024
+THUMBNAIL_PADDING = 6
+THUMBNAIL_THREADS = 2
+
+
+def path_fingerprint(path):
+    """计算路径的哈希，只与点坐标和连接有关"""
+    points = path.get("points", []) if path else []
+    connections = path.get("connections", []) if path else []
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(repr([(round(float(p[0]), 2), round(float(p[1]), 2)) for p in points if len(p) >= 2]).encode())
+    digest.update(repr([(c.get("from"), c.get("to"), c.get("type")) for c in connections]).encode())
+    return digest.hexdigest()
+
+
+def render_path_image(path, size=THUMBNAIL_SIZE, ratio=1.0):
+    """把路径渲染为透明背景的 QImage，可以在任意线程调用"""
+    image = QImage(max(1, round(size.width() * ratio)), max(1, round(size.height() * ratio)),
+                   QImage.Format.Format_ARGB32_Premultiplied)
+    image.setDevicePixelRatio(ratio)
+    image.fill(Qt.GlobalColor.transparent)
+
+    points = [(float(p[0]), float(p[1])) for p in (path or {}).get("points", []) if len(p) >= 2]
+    if not points:
+        return image
+
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    span_x = max(max(xs) - min(xs), 1.0)
+    span_y = max(max(ys) - min(ys), 1.0)
+    width = size.width() - 2 * THUMBNAIL_PADDING
+    height = size.height() - 2 * THUMBNAIL_PADDING
+    scale = min(width / span_x, height / span_y)
+    offset_x = THUMBNAIL_PADDING + (width - (max(xs) - min(xs)) * scale) / 2 - min(xs) * scale
+    offset_y = THUMBNAIL_PADDING + (height - (max(ys) - min(ys)) * scale) / 2 - min(ys) * scale
+    mapped = [QPointF(x * scale + offset_x, y * scale + offset_y) for x, y in points]
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    pen = QPen(QColor(0, 120, 255), 2)
+    pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+    pen.setJoinStyle(Qt.PenJoinStyle.RoundJoin)
+    painter.setPen(pen)
+
+    connections = path.get("connections", [])
+    if connections:
+        for conn in connections:
+            from_idx = conn.get("from", 0)
+            to_idx = conn.get("to", 0)
+            if 0 <= from_idx < len(mapped) and 0 <= to_idx < len(mapped):
+                painter.drawLine(mapped[from_idx], mapped[to_idx])
+    else:
+        painter.drawPolyline(mapped)
+
+    painter.setPen(Qt.PenStyle.NoPen)
+    painter.setBrush(QColor(0, 200, 0))
+    painter.drawEllipse(mapped[0], 3.5, 3.5)
+    if len(mapped) > 1:
+        painter.setBrush(QColor(255, 0, 0))
+        painter.drawEllipse(mapped[-1], 2.5, 2.5)
+    painter.end()
+    return image
+
+
+class _RenderJob(QRunnable):
+    def __init__(self, cache, key, path, size, ratio):
+        super().__init__()
+        self.cache = cache
+        self.key = key
+        self.path = path
+        self.size = QSize(size)
+        self.ratio = ratio
+
+    def run(self):
+        try:
+            image = render_path_image(self.path, self.size, self.ratio)
+        except Exception as e:
+            self.cache.logger.error(f"渲染路径缩略图失败: {e}")
+            image = None
+        self.cache._rendered.emit(self.key, image)
+
+
+class ThumbnailCache(QObject):
+    """路径缩略图缓存
+
+    get() 命中时直接返回 QPixmap；未命中时返回None并在后台渲染，完成后发出
+    thumbnailReady(哈希)，使用者收到后重绘对应的卡片。只能在界面线程中使用。
+    """
+
+    thumbnailReady = Signal(str)
+    _rendered = Signal(object, object)
+
+    def __init__(self, max_bytes=THUMBNAIL_CACHE_BYTES, parent=None):
+        super().__init__(parent)
+        self.logger = get_logger("PathThumbnails")
+        self.max_bytes = max_bytes
+        self._pixmaps = OrderedDict()
+        self._bytes = 0
+        self._pending = set()
+        self._discarded = set()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(THUMBNAIL_THREADS)
+        self._rendered.connect(self._on_rendered)
+
+    def get(self, fingerprint, path, size=THUMBNAIL_SIZE, ratio=1.0):
+        """获取缩略图，未缓存时安排后台渲染并返回None"""
+        key = (fingerprint, size.width(), size.height(), ratio)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            return pixmap
+
+        if key not in self._pending:
+            self._pending.add(key)
+            self._discarded.discard(fingerprint)
+            self._pool.start(_RenderJob(self, key, path, size, ratio))
+        return None
+
+    def discard(self, fingerprint):
+        """丢弃某个路径的全部缩略图，路径被编辑或删除时调用"""
+        for key in [key for key in self._pixmaps if key[0] == fingerprint]:
+            self._remove(key)
+        if any(key[0] == fingerprint for key in self._pending):
+            self._discarded.add(fingerprint)
+
+    def clear(self):
+        self._pixmaps.clear()
+        self._bytes = 0
+        self._discarded.update(key[0] for key in self._pending)
+
+    def memory_usage(self):
+        return self._bytes
+
+    def _remove(self, key):
+        pixmap = self._pixmaps.pop(key)
+        self._bytes -= self._pixmap_bytes(pixmap)
+
+    @staticmethod
+    def _pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * 4
+
+    def _on_rendered(self, key, image):
+        self._pending.discard(key)
+        if image is None:
+            return
+        if key[0] in self._discarded:
+            if not any(pending[0] == key[0] for pending in self._pending):
+                self._discarded.discard(key[0])
+            return
+
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(image.devicePixelRatio())
+        self._pixmaps[key] = pixmap
+        self._bytes += self._pixmap_bytes(pixmap)
+        while self._bytes > self.max_bytes and len(self._pixmaps) > 1:
+            self._remove(next(iter(self._pixmaps)))
+
+        self.thumbnailReady.emit(key[0])
+
+
+_thumbnail_cache = None
+
+
+def get_thumbnail_cache():
+    """获取全局路径缩略图缓存，需要在界面线程中第一次调用"""
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        _thumbnail_cache = ThumbnailCache()
+    return _thumbnail_cache
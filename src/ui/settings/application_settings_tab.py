@@ -67,6 +67,11 @@ class ApplicationSettingsTab(QWidget):
         
         form_layout.addRow("默认关闭行为:", close_behavior_widget)
 
+        self.verbose_logging_checkbox = QCheckBox("详细日志")
+        self.verbose_logging_checkbox.setToolTip("所有模块输出调试级别日志，仅在排查问题时开启，会增加磁盘和性能开销")
+        self.verbose_logging_checkbox.stateChanged.connect(self._on_verbose_logging_changed)
+        form_layout.addRow("故障排查:", self.verbose_logging_checkbox)
+
         layout.addLayout(form_layout)
         layout.addStretch()
     
@@ -84,6 +89,9 @@ class ApplicationSettingsTab(QWidget):
                 self.minimize_radio.setChecked(True)
             else:
                 self.exit_radio.setChecked(True)
+
+            verbose_logging = self.settings.get("logging.verbose", False)
+            self.verbose_logging_checkbox.setChecked(verbose_logging)
                 
         except Exception as e:
             self.logger.error(f"加载应用设置失败: {e}")
@@ -102,6 +110,10 @@ class ApplicationSettingsTab(QWidget):
         if not self.is_loading:
             self._mark_changed()
     
+    def _on_verbose_logging_changed(self, state):
+        if not self.is_loading:
+            self._mark_changed()
+    
     def _mark_changed(self):
         parent = self.parent()
         if parent and hasattr(parent, 'parent') and hasattr(parent.parent(), '_mark_changed'):
@@ -123,6 +135,11 @@ class ApplicationSettingsTab(QWidget):
             saved_close_action = self.settings.get("app.default_close_action", "minimize")
             if current_close_action != saved_close_action:
                 return True
+
+            current_verbose = self.verbose_logging_checkbox.isChecked()
+            saved_verbose = self.settings.get("logging.verbose", False)
+            if current_verbose != saved_verbose:
+                return True
             
             return False
         except:
@@ -143,6 +160,9 @@ class ApplicationSettingsTab(QWidget):
             
             default_close_action = "minimize" if self.minimize_radio.isChecked() else "exit"
             self.settings.set("app.default_close_action", default_close_action)
+
+            verbose_logging = self.verbose_logging_checkbox.isChecked()
+            self.settings.set("logging.verbose", verbose_logging)
             
             return True
         except Exception as e:
@@ -261,28 +261,7 @@ class BrushSettingsTab(QWidget):
             self.settings.set("brush.brush_type", brush_type)
             self.settings.set("brush.force_topmost", force_topmost)
             
-            self._apply_pen_settings_to_drawing_module(thickness, color)
-            
             return True
         except Exception as e:
             self.logger.error(f"应用画笔设置失败: {e}")
-            return False
-    
-    def _apply_pen_settings_to_drawing_module(self, width, color):
-        try:
-            main_window = self._find_main_window()
-            if main_window and hasattr(main_window, 'console_page'):
-                console_page = main_window.console_page
-                if hasattr(console_page, 'drawing_manager') and console_page.drawing_manager:
-                    console_page.drawing_manager.update_settings()
-                    self.logger.debug(f"已实时更新画笔设置: 粗细={width}, 颜色={color}")
-        except Exception as e:
-            self.logger.error(f"应用画笔设置失败: {e}")
-
-    def _find_main_window(self):
-        widget = self
-        while widget:
-            if hasattr(widget, 'console_page'):
-                return widget
-            widget = widget.parent()
-        return None
\ No newline at end of file
+            return False
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 判断器设置选项卡
 
-处理手势识别相似度阈值等设置
+处理手势识别相似度阈值、校准阈值、手势库存储格式等设置
 """
 
 from qtpy.QtCore import Qt
@@ -11,6 +11,8 @@ from qtpy.QtWidgets import (
     QWidget,
     QFormLayout,
     QDoubleSpinBox,
+    QComboBox,
+    QCheckBox,
 )
 
 from core.logger import get_logger
@@ -54,6 +56,23 @@ class RecognizerSettingsTab(QWidget):
         
         form_layout.addRow("相似度阈值:", threshold_widget)
 
+        self.calibrated_checkbox = QCheckBox("使用校准的阈值")
+        self.calibrated_checkbox.setToolTip(
+            "已校准的触发路径使用各自的阈值，未校准的路径使用上面的相似度阈值；"
+            "可用 python -m core.gesture_calibration 校准手势库"
+        )
+        self.calibrated_checkbox.stateChanged.connect(self._on_calibrated_changed)
+
+        form_layout.addRow("", self.calibrated_checkbox)
+
+        self.library_format_combo = QComboBox()
+        self.library_format_combo.addItem("JSON", "json")
+        self.library_format_combo.addItem("二进制（适合大型手势库）", "pack")
+        self.library_format_combo.setToolTip("二进制格式加载更快，并保存预先计算的识别数据；可用 core.gesture_pack 与JSON互相转换")
+        self.library_format_combo.currentIndexChanged.connect(self._on_library_format_changed)
+
+        form_layout.addRow("手势库存储格式:", self.library_format_combo)
+
         layout.addLayout(form_layout)
         layout.addStretch()
     
@@ -62,6 +81,11 @@ class RecognizerSettingsTab(QWidget):
         try:
             threshold = self.settings.get("gesture.similarity_threshold", 0.70)
             self.threshold_spinbox.setValue(threshold)
+            self.calibrated_checkbox.setChecked(self.settings.get("gesture.calibrated_thresholds", True))
+
+            library_format = self.settings.get("gesture.library_format", "json")
+            index = self.library_format_combo.findData(library_format)
+            self.library_format_combo.setCurrentIndex(max(index, 0))
         except Exception as e:
             self.logger.error(f"加载判断器设置失败: {e}")
         finally:
@@ -71,6 +95,14 @@ class RecognizerSettingsTab(QWidget):
         if not self.is_loading:
             self._mark_changed()
     
+    def _on_calibrated_changed(self, state):
+        if not self.is_loading:
+            self._mark_changed()
+    
+    def _on_library_format_changed(self, index):
+        if not self.is_loading:
+            self._mark_changed()
+    
     def _mark_changed(self):
         parent = self.parent()
         if parent and hasattr(parent, 'parent') and hasattr(parent.parent(), '_mark_changed'):
@@ -80,7 +112,11 @@ class RecognizerSettingsTab(QWidget):
         try:
             current_threshold = self.threshold_spinbox.value()
             saved_threshold = self.settings.get("gesture.similarity_threshold", 0.70)
-            return current_threshold != saved_threshold
+            if current_threshold != saved_threshold:
+                return True
+            if self.calibrated_checkbox.isChecked() != self.settings.get("gesture.calibrated_thresholds", True):
+                return True
+            return self.library_format_combo.currentData() != self.settings.get("gesture.library_format", "json")
         except:
             return False
     
@@ -88,6 +124,8 @@ class RecognizerSettingsTab(QWidget):
         try:
             threshold = self.threshold_spinbox.value()
             self.settings.set("gesture.similarity_threshold", threshold)
+            self.settings.set("gesture.calibrated_thresholds", self.calibrated_checkbox.isChecked())
+            self.settings.set("gesture.library_format", self.library_format_combo.currentData())
             return True
         except Exception as e:
             self.logger.error(f"应用判断器设置失败: {e}")
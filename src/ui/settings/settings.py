@@ -1,16 +1,97 @@
+import copy
 import getpass
-import json
 import logging
 import os
 import sys
+from collections.abc import Mapping
 
-from core.logger import get_logger
+from core.logger import apply_log_levels, get_logger
+from core.persistence import get_documents, get_writer
 from version import APP_NAME, AUTHOR
 
 if sys.platform.startswith("win"):
     import winreg
 
 _settings_instance = None
+_MISSING = object()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def _coerce(value, default):
+    """按默认值的类型转换设置值，无法转换时使用默认值"""
+    if default is _MISSING or default is None:
+        return _freeze(value)
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else default
+    if isinstance(default, (int, float)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return default
+        return type(default)(value)
+    if isinstance(default, str):
+        return value if isinstance(value, str) else default
+    if isinstance(default, (list, tuple)):
+        if not isinstance(value, (list, tuple)):
+            return _freeze(default)
+        if default:
+            return tuple(_coerce(item, default[0]) for item in value)
+        return _freeze(value)
+    return _freeze(value)
+
+
+def _flatten(data, prefix=""):
+    for key, value in data.items():
+        full_key = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _flatten(value, full_key)
+        else:
+            yield full_key, value
+
+
+class SettingsSnapshot(Mapping):
+    """不可变的设置快照
+
+    以完整的点分隔键（如 "brush.pen_width"）保存全部叶子设置，值已按默认设置的类型
+    转换，列表保存为元组。设置变更时整体重建，读取时无需逐级查找嵌套字典。
+    """
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values=None):
+        self._values = dict(values or {})
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"SettingsSnapshot({self._values!r})"
+
+    def section(self, prefix):
+        """获取某个前缀下的全部设置，返回去掉前缀的字典"""
+        start = prefix + "."
+        return {key[len(start):]: value for key, value in self._values.items() if key.startswith(start)}
+
+    def diff(self, other):
+        """返回与另一个快照相比值不同的键集合"""
+        changed = {key for key, value in self._values.items() if other.get(key, _MISSING) != value}
+        changed.update(key for key in other if key not in self._values)
+        return changed
 
 
 class Settings:
@@ -18,20 +99,25 @@ class Settings:
         self.logger = get_logger("Settings")
         self.settings = self._load_default_settings()
         self.settings_file = self._get_settings_file_path()
-        self.saved_settings = None
+        self._default_values = dict(_flatten(self.settings))
+        self._snapshot = SettingsSnapshot()
+        self._saved_snapshot = None
+        self._subscribers = []
 
+        self.subscribe("logging", self._on_logging_changed)
         self.load()
 
     def _load_default_settings(self):
         try:
             default_settings_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "default_settings.json")
 
-            if os.path.exists(default_settings_path):
-                with open(default_settings_path, "r", encoding="utf-8") as f:
-                    settings = json.load(f)
-                return settings
-            else:
+            document = get_documents().get(default_settings_path)
+            if not document.exists:
                 raise FileNotFoundError(f"默认设置文件不存在: {default_settings_path}")
+            if document.error:
+                raise ValueError(document.error)
+            # 文档由自检共用，设置会原地修改嵌套字典，所以使用副本
+            return copy.deepcopy(document.data)
         except Exception as e:
             self.logger.error(f"加载默认设置失败: {e}")
             raise
@@ -52,46 +138,104 @@ class Settings:
 
     def load(self):
         try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, "r", encoding="utf-8") as f:
-                    loaded_settings = json.load(f)
+            get_writer().flush(self.settings_file)
+            document = get_documents().get(self.settings_file)
+            if document.exists:
+                loaded_settings = document.data
+                if document.error:
+                    # 文件损坏时先使用当前值，由自检备份并重置文件后重新加载
+                    self.logger.error(f"设置文件格式错误，暂时使用默认设置: {document.error}")
+                    loaded_settings = {}
 
                 for key, value in loaded_settings.items():
                     if key in self.settings:
-                        self.settings[key] = value
+                        self.settings[key] = copy.deepcopy(value)
 
-                self.saved_settings = self.settings.copy()
+                self._rebuild_snapshot()
+                self._saved_snapshot = self._snapshot
             else:
+                self._rebuild_snapshot()
                 self.save()
         except Exception as e:
             self.logger.error(f"加载设置失败: {e}")
             raise
 
-    def save(self):
-        try:
-            os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
+    def save(self, wait=False):
+        """交给后台写入器保存设置，写入成功后才记为已保存
 
-            with open(self.settings_file, "w", encoding="utf-8") as f:
-                json.dump(self.settings, f, indent=4, ensure_ascii=False)
-            
-            self.saved_settings = self.settings.copy()
+        Args:
+            wait: 为True时等待写入完成，写入失败或超时返回False；保存按钮和退出时使用
+        """
+        try:
+            snapshot = self._snapshot
+            get_writer().submit_json(self.settings_file, self.settings, lambda: self._mark_saved(snapshot))
+            if wait and not get_writer().flush(self.settings_file):
+                error = get_writer().get_errors(self.settings_file).get(self.settings_file, "写入超时")
+                self.logger.error(f"保存设置失败: {error}")
+                return False
             return True
         except Exception as e:
             self.logger.error(f"保存设置失败: {e}")
             return False
 
+    def _mark_saved(self, snapshot):
+        """在后台写入线程中调用，记录已写入文件的快照"""
+        self._saved_snapshot = snapshot
+
+    def snapshot(self):
+        """获取当前设置的不可变快照，设置变更前始终返回同一个对象"""
+        return self._snapshot
+
+    def subscribe(self, keys, callback):
+        """订阅设置变更
+
+        Args:
+            keys: 单个键或键列表，可以是完整键（"brush.pen_width"）或前缀（"brush"）
+            callback: 变更时调用 callback(snapshot, changed_keys)，changed_keys 为匹配的已变更键集合
+        """
+        prefixes = (keys,) if isinstance(keys, str) else tuple(keys)
+        self._subscribers.append((prefixes, callback))
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(prefixes, cb) for prefixes, cb in self._subscribers if cb != callback]
+
+    def _rebuild_snapshot(self):
+        """设置变更后重建快照，并通知订阅了已变更键的回调"""
+        values = {
+            key: _coerce(value, self._default_values.get(key, _MISSING))
+            for key, value in _flatten(self.settings)
+        }
+        snapshot = SettingsSnapshot(values)
+        changed = snapshot.diff(self._snapshot)
+        self._snapshot = snapshot
+        if not changed:
+            return
+
+        for prefixes, callback in list(self._subscribers):
+            matched = {
+                key for key in changed
+                if any(key == prefix or key.startswith(prefix + ".") for prefix in prefixes)
+            }
+            if matched:
+                try:
+                    callback(snapshot, matched)
+                except Exception as e:
+                    self.logger.error(f"设置变更回调执行失败: {e}")
+
     def get(self, key, default=None):
-        if "." in key:
-            keys = key.split(".")
-            value = self.settings
-            for k in keys:
-                if isinstance(value, dict) and k in value:
-                    value = value[k]
-                else:
-                    return default
-            return value
-        else:
-            return self.settings.get(key, default)
+        value = self._snapshot.get(key, _MISSING)
+        if value is not _MISSING:
+            return _thaw(value)
+
+        # 非叶子键返回嵌套字典的副本，调用方修改返回值不会绕过 set() 的变更检测
+        value = self.settings
+        for k in key.split("."):
+            if isinstance(value, dict) and k in value:
+                value = value[k]
+            else:
+                return default
+        return copy.deepcopy(value)
 
     def set(self, key, value):
         if "." in key:
@@ -104,36 +248,29 @@ class Settings:
             
             old_value = current.get(keys[-1])
             if old_value != value:
-                current[keys[-1]] = value
-                
-                saved_value = None
-                if self.saved_settings:
-                    saved_current = self.saved_settings
-                    for k in keys[:-1]:
-                        if isinstance(saved_current, dict) and k in saved_current:
-                            saved_current = saved_current[k]
-                        else:
-                            saved_current = None
-                            break
-                    if saved_current and keys[-1] in saved_current:
-                        saved_value = saved_current[keys[-1]]
+                current[keys[-1]] = copy.deepcopy(value)
+                self._rebuild_snapshot()
             return True
         else:
             old_value = self.settings.get(key)
             if old_value != value:
-                self.settings[key] = value
+                self.settings[key] = copy.deepcopy(value)
+                self._rebuild_snapshot()
             return True
 
+    def _on_logging_changed(self, snapshot, changed_keys):
+        """将 logging 设置应用到日志模块，无需重启即可生效"""
+        apply_log_levels(snapshot.section("logging.levels"), snapshot.get("logging.verbose", False))
+
     def reset_to_default(self):
         try:
             default_settings = self._load_default_settings()
             if self.settings != default_settings:
                 self.settings = default_settings
+                self._rebuild_snapshot()
 
-            success = self.save()
+            success = self.save(wait=True)
             if success:
-                self.saved_settings = self.settings.copy()
-
                 if self.is_autostart_enabled():
                     self.set_autostart(False)
 
@@ -143,28 +280,9 @@ class Settings:
             return False
 
     def has_changes(self):
-        self.logger.debug(f"设置库检查变更开始: 当前设置数量={len(self.settings) if self.settings else 0}, 已保存设置数量={len(self.saved_settings) if self.saved_settings else 0}")
-        
-        if not self.saved_settings:
-            result = True if self.settings else False
-            self.logger.debug(f"设置库检查变更: 没有已保存设置记录, 结果={result}")
-            return result
-
-        for key, value in self.settings.items():
-            saved_value = self.saved_settings.get(key, '不存在')
-            if key not in self.saved_settings or self.saved_settings[key] != value:
-                self.logger.debug(f"设置库检查变更: 发现差异 - 键={key}")
-                self.logger.debug(f"  当前值: {value} (类型: {type(value)})")
-                self.logger.debug(f"  已保存值: {saved_value} (类型: {type(saved_value)})")
-                return True
-
-        for key in self.saved_settings:
-            if key not in self.settings:
-                self.logger.debug(f"设置库检查变更: 已保存的键在当前设置中不存在 - 键={key}")
-                return True
-
-        self.logger.debug("设置库检查变更: 没有发现差异")
-        return False
+        if self._saved_snapshot is None:
+            return bool(self._snapshot)
+        return self._snapshot != self._saved_snapshot
 
     def get_app_path(self):
         def _quote_if_needed(path):
@@ -432,8 +550,8 @@ Hidden=false
         return True
 
 
-settings_manager = Settings()
-
-
 def get_settings():
-    return settings_manager
\ No newline at end of file
+    global _settings_instance
+    if _settings_instance is None:
+        _settings_instance = Settings()
+    return _settings_instance
\ No newline at end of file
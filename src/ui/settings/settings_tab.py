@@ -155,7 +155,7 @@ class SettingsPage(QWidget):
                 QMessageBox.critical(self, "错误", "判断器设置失败")
                 return
             
-            success = self.settings.save()
+            success = self.settings.save(wait=True)
             if success:
                 QMessageBox.information(self, "成功", "设置已保存")
                 self.logger.info("设置已保存")